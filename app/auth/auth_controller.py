@@ -1,8 +1,8 @@
 import sqlite3
 from datetime import datetime, timedelta
-from passlib.hash import bcrypt
 import jwt
-from app.database.db import get_connection
+from app.database.connection import get_connection
+from app.auth.password_pool import password_hasher
 
 JWT_SECRET = "change_this_to_a_strong_secret"
 JWT_EXP_DAYS = 7  # صلاحية التوكن 7 أيام
@@ -11,9 +11,10 @@ JWT_EXP_DAYS = 7  # صلاحية التوكن 7 أيام
 # تسجيل مستخدم جديد
 # -------------------------
 def register_user(name, email, password):
+    # الهاش يتم في مجموعة العمليات الخاصة بكلمات المرور (قد يرفع PasswordPoolBusy)
+    password_hash = password_hasher.hash(password)
     conn = get_connection()
     cursor = conn.cursor()
-    password_hash = bcrypt.hash(password)
     try:
         cursor.execute('''
             INSERT INTO users (name, email, password_hash, created_at)
@@ -23,9 +24,8 @@ def register_user(name, email, password):
         user_id = cursor.lastrowid
         return {"id": user_id, "name": name, "email": email}
     except sqlite3.IntegrityError:
+        conn.rollback()
         return {"error": "Email already registered"}
-    finally:
-        conn.close()
 
 # -------------------------
 # تسجيل الدخول
@@ -35,13 +35,18 @@ def login_user(email, password):
     cursor = conn.cursor()
     cursor.execute('SELECT * FROM users WHERE email=?', (email,))
     user = cursor.fetchone()
-    conn.close()
     if not user:
         return {"error": "Invalid credentials"}
 
-    if not bcrypt.verify(password, user["password_hash"]):
+    valid, new_hash = password_hasher.verify(password, user["password_hash"])
+    if not valid:
         return {"error": "Invalid credentials"}
 
+    # إعادة الهاش بتكلفة BCRYPT_ROUNDS الحالية إذا تغيّرت منذ التسجيل
+    if new_hash:
+        conn.execute('UPDATE users SET password_hash=? WHERE id=?', (new_hash, user["id"]))
+        conn.commit()
+
     payload = {
         "id": user["id"],
         "email": user["email"],
@@ -127,7 +132,7 @@ def login_user():
     }
     token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return jsonify({"token": token, "user": {"id": row["id"], "username": row["username"]}})
-from app.models.user import create_user, get_user_by_username, hash_password
+from app.models.user import create_user, get_user_by_username, update_password_hash, verify_password
 import jwt
 from datetime import datetime, timedelta
 
@@ -143,8 +148,12 @@ def login_user(username, password):
     user = get_user_by_username(username)
     if not user:
         return {"error": "invalid credentials"}
-    if hash_password(password) != user[2]:
+    valid, new_hash = verify_password(password, user[2])
+    if not valid:
         return {"error": "invalid credentials"}
+    # ترقية الهاش (sha256 القديم أو تكلفة bcrypt مختلفة) بعد الدخول الناجح
+    if new_hash:
+        update_password_hash(user[0], new_hash)
     # إنشاء JWT
     payload = {
         "user_id": user[0],
@@ -1,8 +1,15 @@
 from flask import Flask, request, jsonify
 from app.auth.auth_controller import register_user, login_user
+from app.auth.password_pool import PasswordPoolBusy
 
 auth_app = Flask(__name__)
 
+# -------------------------
+# مجموعة هاش كلمات المرور ممتلئة
+# -------------------------
+def password_pool_busy(error):
+    return jsonify({"error": "Server busy, please retry"}), 503, {"Retry-After": "1"}
+
 # -------------------------
 # تسجيل مستخدم
 # -------------------------
@@ -63,8 +70,11 @@ auth_app = Blueprint("auth_app", __name__)
 auth_app.add_url_rule("/register", "register", register_user, methods=["POST"])
 # تسجيل الدخول
 auth_app.add_url_rule("/login", "login", login_user, methods=["POST"])
+import io
 from flask import Blueprint, request, jsonify
 from .auth_controller import register_user, login_user
+from .bulk_import import detect_format, import_users
+from app.security import admin_required
 
 auth_app = Blueprint('auth', __name__)
 
@@ -77,3 +87,31 @@ def register():
 def login():
     data = request.json
     return jsonify(login_user(data['username'], data['password']))
+
+auth_app.register_error_handler(PasswordPoolBusy, password_pool_busy)
+
+# -------------------------
+# استيراد جماعي للمستخدمين (للأدمن فقط)
+# -------------------------
+MAX_REPORTED_CONFLICTS = 1000
+
+@auth_app.route('/admin/import-users', methods=['POST'])
+@admin_required
+def import_users_endpoint():
+    upload = request.files.get('file')
+    if upload:
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8', newline='')
+        fmt = request.args.get('format') or detect_format(upload.filename)
+    else:
+        stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        fmt = request.args.get('format', 'csv')
+
+    conflicts = []
+
+    def on_conflict(line_no, email):
+        if len(conflicts) < MAX_REPORTED_CONFLICTS:
+            conflicts.append({"line": line_no, "email": email})
+
+    summary = import_users(stream, fmt=fmt, on_conflict=on_conflict)
+    summary["conflict_rows"] = conflicts
+    return jsonify(summary), 200
@@ -0,0 +1,118 @@
+# app/auth/bulk_import.py
+# استيراد جماعي للمستخدمين من ملف CSV أو JSONL بذاكرة ثابتة:
+# قراءة الملف كتيار، هاش كلمات المرور على كل الأنوية، ثم executemany داخل معاملة لكل دفعة
+import csv
+import json
+import sqlite3
+from datetime import datetime
+from itertools import islice
+
+from app.auth.password_pool import password_hasher
+from app.database.connection import get_connection
+
+IMPORT_BATCH_SIZE = 2000
+REQUIRED_FIELDS = ("name", "email", "password")
+INSERT_SQL = "INSERT INTO users (name, email, password_hash, created_at) VALUES (?, ?, ?, ?)"
+
+
+def detect_format(filename):
+    return "jsonl" if filename and filename.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+def iter_records(stream, fmt="csv"):
+    """يرجع (رقم السطر، السجل) واحدًا تلو الآخر دون تحميل الملف كاملًا"""
+    if fmt == "jsonl":
+        for line_no, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except ValueError:
+                yield line_no, None
+    else:
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+
+
+def _existing_emails(conn, emails, chunk=500):
+    found = set()
+    emails = list(emails)
+    for i in range(0, len(emails), chunk):
+        part = emails[i:i + chunk]
+        placeholders = ",".join("?" * len(part))
+        rows = conn.execute(f"SELECT email FROM users WHERE email IN ({placeholders})", part)
+        found.update(row[0] for row in rows)
+    return found
+
+
+def _insert_batch(conn, rows, on_conflict):
+    """rows: [(line_no, name, email, password_hash)] — ترجع عدد الصفوف المضافة"""
+    now = datetime.utcnow()
+    try:
+        with conn:
+            conn.executemany(INSERT_SQL, [(name, email, pw_hash, now) for _, name, email, pw_hash in rows])
+        return len(rows)
+    except sqlite3.IntegrityError:
+        # تسجيل متزامن أضاف نفس البريد بين الفحص والإدخال: نعيد الدفعة صفًا صفًا
+        inserted = 0
+        with conn:
+            for line_no, name, email, pw_hash in rows:
+                try:
+                    conn.execute(INSERT_SQL, (name, email, pw_hash, now))
+                    inserted += 1
+                except sqlite3.IntegrityError:
+                    on_conflict(line_no, email)
+        return inserted
+
+
+def import_users(stream, fmt="csv", batch_size=IMPORT_BATCH_SIZE, on_conflict=None, on_invalid=None):
+    """
+    on_conflict(line_no, email) يُستدعى لكل بريد مكرر (في الملف أو في قاعدة البيانات)
+    on_invalid(line_no, reason) يُستدعى لكل سطر ناقص أو غير صالح
+    """
+    on_conflict = on_conflict or (lambda line_no, email: None)
+    on_invalid = on_invalid or (lambda line_no, reason: None)
+    summary = {"imported": 0, "conflicts": 0, "invalid": 0}
+
+    def conflict(line_no, email):
+        summary["conflicts"] += 1
+        on_conflict(line_no, email)
+
+    conn = get_connection()
+    records = iter_records(stream, fmt)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+
+        valid, seen = [], set()
+        for line_no, record in batch:
+            if not isinstance(record, dict) or any(not record.get(f) for f in REQUIRED_FIELDS):
+                summary["invalid"] += 1
+                on_invalid(line_no, "missing name, email or password")
+                continue
+            email = str(record["email"]).strip()
+            if email in seen:
+                conflict(line_no, email)
+                continue
+            seen.add(email)
+            valid.append((line_no, str(record["name"]).strip(), email, str(record["password"])))
+
+        existing = _existing_emails(conn, seen)
+        fresh = []
+        for row in valid:
+            if row[2] in existing:
+                conflict(row[0], row[2])
+            else:
+                fresh.append(row)
+        if not fresh:
+            continue
+
+        hashes = password_hasher.hash_many([row[3] for row in fresh])
+        rows = [(line_no, name, email, pw_hash)
+                for (line_no, name, email, _), pw_hash in zip(fresh, hashes)]
+        summary["imported"] += _insert_batch(conn, rows, conflict)
+
+    return summary
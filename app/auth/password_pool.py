@@ -0,0 +1,91 @@
+# app/auth/password_pool.py
+# تشغيل bcrypt في مجموعة عمليات مستقلة بدل خيط الطلب نفسه
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from passlib.hash import bcrypt
+
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+PASSWORD_POOL_WORKERS = int(os.environ.get("PASSWORD_POOL_WORKERS", os.cpu_count() or 2))
+# عدد العمليات المسموح بانتظارها قبل رفض الطلبات الجديدة (503)
+PASSWORD_POOL_MAX_PENDING = int(os.environ.get("PASSWORD_POOL_MAX_PENDING", PASSWORD_POOL_WORKERS * 8))
+PASSWORD_POOL_WAIT_SECONDS = float(os.environ.get("PASSWORD_POOL_WAIT_SECONDS", 0.05))
+
+
+class PasswordPoolBusy(Exception):
+    """كل أماكن الانتظار مشغولة؛ يجب رد الطلب بـ 503"""
+
+
+def hash_rounds(password_hash):
+    # شكل الهاش: $2b$12$...
+    try:
+        return int(password_hash.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def _hash(password, rounds):
+    return bcrypt.using(rounds=rounds).hash(password)
+
+
+def _verify(password, password_hash, rounds):
+    """يرجع (صحيح؟، هاش جديد إذا كانت تكلفة الهاش المخزن مختلفة عن الإعداد الحالي)"""
+    try:
+        if not bcrypt.verify(password, password_hash):
+            return False, None
+    except (TypeError, ValueError):
+        return False, None
+    if hash_rounds(password_hash) != rounds:
+        return True, _hash(password, rounds)
+    return True, None
+
+
+class PasswordHasher:
+    def __init__(self, rounds=BCRYPT_ROUNDS, workers=PASSWORD_POOL_WORKERS,
+                 max_pending=PASSWORD_POOL_MAX_PENDING, wait_seconds=PASSWORD_POOL_WAIT_SECONDS):
+        self.rounds = rounds
+        self.workers = workers
+        self.wait_seconds = wait_seconds
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # إنشاء العمليات عند أول استخدام (بعد fork الخاص بـ gunicorn وليس عند الاستيراد)
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(timeout=self.wait_seconds):
+            raise PasswordPoolBusy()
+        try:
+            future = self._pool().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash(self, password):
+        return self._submit(_hash, password, self.rounds).result()
+
+    def verify(self, password, password_hash):
+        return self._submit(_verify, password, password_hash, self.rounds).result()
+
+    def hash_many(self, passwords, chunksize=16):
+        """هاش دفعة كاملة على كل الأنوية (للاستيراد الجماعي، بدون حد الانتظار الخاص بالطلبات)"""
+        rounds = [self.rounds] * len(passwords)
+        return list(self._pool().map(_hash, passwords, rounds, chunksize=chunksize))
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+password_hasher = PasswordHasher()
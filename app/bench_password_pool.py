@@ -0,0 +1,63 @@
+# bench_password_pool.py
+# محاكاة موجة تسجيل دخول: زمن الطلبات الخفيفة في نفس العملية
+# أثناء تنفيذ bcrypt مباشرة في خيوط الطلبات مقابل مجموعة العمليات
+# التشغيل من جذر المشروع:  python -m app.bench_password_pool
+import json
+import threading
+import time
+
+from passlib.hash import bcrypt
+
+from app.auth.password_pool import PasswordHasher, PasswordPoolBusy
+
+ROUNDS = 10
+LOGIN_THREADS = 32
+LOGINS_PER_THREAD = 4
+LIGHT_REQUESTS = 2000
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))]
+
+
+def light_request():
+    # طلب API عادي: تجهيز JSON صغير
+    return json.dumps({"balance": 1000.0, "transactions": list(range(50))})
+
+
+def run(label, login):
+    rejected = []
+
+    def storm():
+        for _ in range(LOGINS_PER_THREAD):
+            try:
+                login()
+            except PasswordPoolBusy:
+                rejected.append(1)
+
+    threads = [threading.Thread(target=storm) for _ in range(LOGIN_THREADS)]
+    for t in threads:
+        t.start()
+
+    samples = []
+    for _ in range(LIGHT_REQUESTS):
+        start = time.perf_counter()
+        light_request()
+        samples.append(time.perf_counter() - start)
+        time.sleep(0.0005)
+
+    for t in threads:
+        t.join()
+    print(f"{label:<22} light p50 {percentile(samples, 50) * 1e6:8.1f}µs"
+          f"  p99 {percentile(samples, 99) * 1e6:9.1f}µs   rejected(503) {len(rejected)}")
+
+
+if __name__ == "__main__":
+    stored = bcrypt.using(rounds=ROUNDS).hash("secret")
+    run("inline bcrypt", lambda: bcrypt.verify("secret", stored))
+
+    hasher = PasswordHasher(rounds=ROUNDS, max_pending=16)
+    hasher.verify("secret", stored)
+    run("process pool", lambda: hasher.verify("secret", stored))
+    hasher.shutdown()
@@ -0,0 +1,53 @@
+# bench_rate_limit.py
+# قياس عدد فحوصات Rate Limit في الثانية مع 100 ألف مستخدم مختلف
+# التشغيل من جذر المشروع:  python -m app.bench_rate_limit
+import os
+import random
+import tempfile
+import time
+
+from app.rate_limiter import MemoryBackend, RateLimiter, SQLiteBackend
+
+USERS = 100_000
+CHECKS = 500_000
+SQLITE_CHECKS = 50_000
+
+
+def legacy_check(actions, user_id, now, max_attempts=5, window_seconds=60):
+    """النسخة القديمة: إعادة بناء قائمة المحاولات في كل استدعاء"""
+    attempts = actions.get(user_id, [])
+    attempts = [t for t in attempts if now - t < window_seconds]
+    if len(attempts) >= max_attempts:
+        return False
+    attempts.append(now)
+    actions[user_id] = attempts
+    return True
+
+
+def run(label, check, keys):
+    start = time.perf_counter()
+    now = time.time()
+    for i, key in enumerate(keys):
+        check(key, now + i * 0.0001)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {len(keys) / elapsed:>12,.0f} checks/s")
+
+
+if __name__ == "__main__":
+    rng = random.Random(1)
+    keys = [f"user:{rng.randrange(USERS)}" for _ in range(CHECKS)]
+
+    actions = {}
+    run("legacy dict + list", lambda key, now: legacy_check(actions, key, now), keys)
+    print(f"{'':<28} {len(actions):>12,} مفتاح في الذاكرة")
+
+    backend = MemoryBackend(max_keys=USERS)
+    limiter = RateLimiter(5, 60, backend)
+    run("MemoryBackend", limiter.allow, keys)
+    print(f"{'':<28} {len(backend):>12,} مفتاح في الذاكرة")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = SQLiteBackend(os.path.join(tmp, "rate_limits.db"))
+        limiter = RateLimiter(5, 60, backend)
+        run("SQLiteBackend (WAL)", limiter.allow, keys[:SQLITE_CHECKS])
+        print(f"{'':<28} {len(backend):>12,} مفتاح في الملف")
@@ -0,0 +1,80 @@
+# bench_sqlite.py
+# مقارنة اتصال جديد لكل استعلام (الطريقة القديمة) مع الاتصال المشترك لكل خيط (WAL)
+# التشغيل من جذر المشروع:  python -m app.bench_sqlite
+import os
+import sqlite3
+import tempfile
+import time
+
+from app.database import connection
+
+ROWS = 5_000
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        created_at TEXT
+    )
+"""
+INSERT = "INSERT INTO users (name, email, password_hash, created_at) VALUES (?, ?, ?, datetime('now'))"
+SELECT = "SELECT * FROM users WHERE email=?"
+
+
+def fresh_connection(path):
+    # نفس أسلوب get_connection() القديم: اتصال جديد ثم إغلاقه بعد كل عملية
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def before(path):
+    conn = fresh_connection(path)
+    conn.execute(SCHEMA)
+    conn.close()
+
+    start = time.perf_counter()
+    for i in range(ROWS):
+        conn = fresh_connection(path)
+        conn.execute(INSERT, (f"user{i}", f"user{i}@example.com", "x"))
+        conn.commit()
+        conn.close()
+    inserts = ROWS / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(ROWS):
+        conn = fresh_connection(path)
+        conn.execute(SELECT, (f"user{i}@example.com",)).fetchone()
+        conn.close()
+    lookups = ROWS / (time.perf_counter() - start)
+    return inserts, lookups
+
+
+def after(path):
+    conn = connection.get_connection(path)
+    conn.execute(SCHEMA)
+
+    start = time.perf_counter()
+    for i in range(ROWS):
+        conn = connection.get_connection(path)
+        conn.execute(INSERT, (f"user{i}", f"user{i}@example.com", "x"))
+        conn.commit()
+    inserts = ROWS / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(ROWS):
+        conn = connection.get_connection(path)
+        conn.execute(SELECT, (f"user{i}@example.com",)).fetchone()
+    lookups = ROWS / (time.perf_counter() - start)
+    connection.close_connection(path)
+    return inserts, lookups
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, run, name in (("before (اتصال لكل استعلام)", before, "before.db"),
+                                 ("after (اتصال لكل خيط + WAL)", after, "after.db")):
+            inserts, lookups = run(os.path.join(tmp, name))
+            print(f"{label:<30} inserts {inserts:>10,.0f}/s   lookups {lookups:>10,.0f}/s")
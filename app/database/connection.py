@@ -0,0 +1,67 @@
+# app/database/connection.py
+# اتصال SQLite واحد قابل لإعادة الاستخدام لكل خيط، بدل فتح وإغلاق اتصال مع كل استعلام
+import os
+import sqlite3
+import threading
+
+DATABASE_PATH = os.environ.get("DATABASE_PATH", "app.db")
+
+# إعدادات الأداء (يمكن تغييرها من متغيرات البيئة)
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", -64000))   # بالسالب = KiB (64MB)
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_STATEMENT_CACHE = int(os.environ.get("SQLITE_STATEMENT_CACHE", 256))
+SQLITE_BUSY_TIMEOUT = float(os.environ.get("SQLITE_BUSY_TIMEOUT", 5.0))
+
+_local = threading.local()
+_wal_ready = set()
+_wal_lock = threading.Lock()
+
+
+def _enable_wal(conn, path):
+    # وضع WAL محفوظ داخل ملف قاعدة البيانات نفسه، فيكفي تعيينه مرة واحدة لكل ملف
+    if path in _wal_ready:
+        return
+    with _wal_lock:
+        if path not in _wal_ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            _wal_ready.add(path)
+
+
+def _open(path):
+    conn = sqlite3.connect(
+        path,
+        timeout=SQLITE_BUSY_TIMEOUT,
+        cached_statements=SQLITE_STATEMENT_CACHE,
+    )
+    conn.row_factory = sqlite3.Row
+    _enable_wal(conn, path)
+    conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+    conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def get_connection(path=None):
+    """اتصال الخيط الحالي (يُنشأ مرة واحدة ويُعاد استخدامه). لا تغلقه بعد الاستعلام."""
+    path = path or DATABASE_PATH
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        conn = connections[path] = _open(path)
+    return conn
+
+
+# الاسم المستخدم في بعض الوحدات
+get_db_connection = get_connection
+
+
+def close_connection(path=None):
+    """إغلاق اتصال الخيط الحالي (عند إنهاء الخيط أو في teardown)"""
+    connections = getattr(_local, "connections", {})
+    conn = connections.pop(path or DATABASE_PATH, None)
+    if conn is not None:
+        conn.close()
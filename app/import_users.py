@@ -0,0 +1,37 @@
+# import_users.py
+# استيراد جماعي للمستخدمين من ملف CSV أو JSONL (الأعمدة: name, email, password)
+# مثال:  python -m app.import_users partners.csv --batch-size 5000
+import argparse
+import sys
+import time
+
+from app.auth.bulk_import import IMPORT_BATCH_SIZE, detect_format, import_users
+from app.auth.password_pool import password_hasher
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import users from CSV/JSONL")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default=None)
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or detect_format(args.path)
+    start = time.perf_counter()
+    with open(args.path, newline="", encoding="utf-8") as stream:
+        summary = import_users(
+            stream,
+            fmt=fmt,
+            batch_size=args.batch_size,
+            on_conflict=lambda line_no, email: print(f"line {line_no}: duplicate email {email}", file=sys.stderr),
+            on_invalid=lambda line_no, reason: print(f"line {line_no}: {reason}", file=sys.stderr),
+        )
+    password_hasher.shutdown()
+
+    elapsed = time.perf_counter() - start
+    print(f"Imported {summary['imported']} users in {elapsed:.1f}s "
+          f"({summary['conflicts']} duplicate emails, {summary['invalid']} invalid rows)")
+
+
+if __name__ == "__main__":
+    main()
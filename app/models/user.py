@@ -1,6 +1,6 @@
 from sqlalchemy import Column, Integer, String, DateTime
 from datetime import datetime
-from passlib.hash import bcrypt
+from app.auth.password_pool import password_hasher
 from app.database.db import Base
 
 class User(Base):
@@ -15,14 +15,14 @@ class User(Base):
 
     # set password (hash)
     def set_password(self, password: str):
-        self.password_hash = bcrypt.hash(password)
+        self.password_hash = password_hasher.hash(password)
 
-    # check password
+    # check password (ويعيد الهاش بالتكلفة الحالية إذا تغيّرت؛ يُحفظ مع commit الجلسة)
     def check_password(self, password: str) -> bool:
-        try:
-            return bcrypt.verify(password, self.password_hash)
-        except Exception:
-            return False
+        valid, new_hash = password_hasher.verify(password, self.password_hash)
+        if new_hash:
+            self.password_hash = new_hash
+        return valid
 
     def to_dict(self):
         return {
@@ -32,30 +32,32 @@ class User(Base):
             "role": self.role,
             "created_at": self.created_at.isoformat() if self.created_at else None
         }
-from passlib.hash import bcrypt
+from app.auth.password_pool import password_hasher
 from datetime import datetime
 
 class User:
     def __init__(self, name, email, password):
         self.name = name
         self.email = email
-        self.password_hash = bcrypt.hash(password)
+        self.password_hash = password_hasher.hash(password)
         self.created_at = datetime.utcnow()
 
     def verify_password(self, password):
-        return bcrypt.verify(password, self.password_hash)
-from passlib.hash import bcrypt
-from app.database.db import get_db_connection
+        valid, new_hash = password_hasher.verify(password, self.password_hash)
+        if new_hash:
+            self.password_hash = new_hash
+        return valid
+from app.auth.password_pool import password_hasher
+from app.database.connection import get_db_connection
 
 class User:
     @staticmethod
     def create(username, password):
-        hashed = bcrypt.hash(password)
+        hashed = password_hasher.hash(password)
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, hashed))
         conn.commit()
-        conn.close()
 
     @staticmethod
     def find_by_username(username):
@@ -63,26 +65,24 @@ class User:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
         user = cursor.fetchone()
-        conn.close()
         return user
 
     @staticmethod
     def verify_password(password, hashed):
-        return bcrypt.verify(password, hashed)
+        return password_hasher.verify(password, hashed)[0]
 # app/models/user.py
-from passlib.hash import bcrypt
-from app.database.db import get_db_connection
+from app.auth.password_pool import password_hasher
+from app.database.connection import get_db_connection
 
 class User:
     @staticmethod
     def create(username: str, password: str):
-        hashed = bcrypt.hash(password)
+        hashed = password_hasher.hash(password)
         conn = get_db_connection()
         cur = conn.cursor()
         cur.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", (username, hashed))
         conn.commit()
         uid = cur.lastrowid
-        conn.close()
         return uid
 
     @staticmethod
@@ -91,35 +91,47 @@ class User:
         cur = conn.cursor()
         cur.execute("SELECT * FROM users WHERE username = ?", (username,))
         row = cur.fetchone()
-        conn.close()
         return row
 
     @staticmethod
     def verify_password(password: str, hashed: str) -> bool:
-        try:
-            return bcrypt.verify(password, hashed)
-        except Exception:
-            return False
-from app.database.db import get_connection
+        return password_hasher.verify(password, hashed)[0]
+from app.auth.password_pool import hash_rounds
+from app.database.connection import get_connection
 import hashlib
+import hmac
 
+# هاش sha256 القديم: يبقى فقط للتحقق من الحسابات المسجّلة قبل bcrypt
 def hash_password(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
 
+def verify_password(password: str, stored: str):
+    """يرجع (صحيح؟، هاش جديد إن لزم): هاش sha256 القديم يُستبدل بـ bcrypt عند أول دخول ناجح"""
+    if hash_rounds(stored) is None:
+        if not hmac.compare_digest(hash_password(password), stored or ""):
+            return False, None
+        return True, password_hasher.hash(password)
+    return password_hasher.verify(password, stored)
+
 def create_user(username: str, password: str):
+    # الهاش يتم في مجموعة العمليات الخاصة بكلمات المرور (قد يرفع PasswordPoolBusy)
+    password_hash = password_hasher.hash(password)
     conn = get_connection()
     cursor = conn.cursor()
     cursor.execute(
         "INSERT INTO users (username, password, created_at) VALUES (?, ?, ?)",
-        (username, hash_password(password), datetime.now().isoformat())
+        (username, password_hash, datetime.now().isoformat())
     )
     conn.commit()
-    conn.close()
+
+def update_password_hash(user_id, password_hash: str):
+    conn = get_connection()
+    conn.execute("UPDATE users SET password = ? WHERE id = ?", (password_hash, user_id))
+    conn.commit()
 
 def get_user_by_username(username: str):
     conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
     user = cursor.fetchone()
-    conn.close()
     return user
@@ -0,0 +1,170 @@
+# app/rate_limiter.py
+# محدد معدل الطلبات (Sliding Window Counter) بزمن ثابت لكل فحص وذاكرة محدودة
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def _slide(window_index, prev_count, curr_count, now_index):
+    """نقل العدادات إلى النافذة الحالية"""
+    if now_index == window_index:
+        return prev_count, curr_count
+    if now_index == window_index + 1:
+        return curr_count, 0
+    return 0, 0
+
+
+def _allow(prev_count, curr_count, now, window_seconds, max_attempts):
+    # تقدير عدد المحاولات خلال آخر window_seconds:
+    # جزء من النافذة السابقة بحسب ما تبقى منها + كامل النافذة الحالية
+    elapsed = (now % window_seconds) / window_seconds
+    return prev_count * (1.0 - elapsed) + curr_count < max_attempts
+
+
+# ------------------------
+# التخزين داخل العملية (افتراضي)
+# ------------------------
+class MemoryBackend:
+    """
+    حالة كل مفتاح: [نافذة, عداد سابق, عداد حالي, وقت انتهاء الصلاحية]
+    المفاتيح مرتبة حسب آخر استخدام، فتُحذف المفاتيح الخاملة من البداية تلقائيًا
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._state = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, now, window_seconds, max_attempts):
+        now_index = int(now // window_seconds)
+        state = self._state
+        with self._lock:
+            entry = state.get(key)
+            if entry is None:
+                prev_count = curr_count = 0
+            else:
+                prev_count, curr_count = _slide(entry[0], entry[1], entry[2], now_index)
+
+            allowed = _allow(prev_count, curr_count, now, window_seconds, max_attempts)
+            if allowed:
+                curr_count += 1
+            # بعد نافذتين كاملتين لا يبقى لهذا المفتاح أي أثر
+            expires_at = (now_index + 2) * window_seconds
+            if entry is None:
+                state[key] = [now_index, prev_count, curr_count, expires_at]
+                if len(state) > self.max_keys:
+                    state.popitem(last=False)
+            else:
+                entry[0] = now_index
+                entry[1] = prev_count
+                entry[2] = curr_count
+                entry[3] = expires_at
+                state.move_to_end(key)
+
+            # حذف المفتاح الأقدم إذا أصبح خاملًا (مرة واحدة لكل فحص، فالتكلفة ثابتة)
+            for oldest in state.values():
+                if oldest[3] <= now:
+                    state.popitem(last=False)
+                break
+            return allowed
+
+    def __len__(self):
+        return len(self._state)
+
+    def clear(self):
+        with self._lock:
+            self._state.clear()
+
+
+# ------------------------
+# تخزين مشترك بين عمليات gunicorn عبر SQLite
+# ------------------------
+class SQLiteBackend:
+    """
+    نفس الخوارزمية لكن الحالة محفوظة في ملف SQLite مشترك (WAL)،
+    فتبقى الحدود صحيحة عند تشغيل عدة Workers
+    """
+
+    def __init__(self, path, purge_every=1000):
+        self.path = path
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._hits = 0
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                key TEXT PRIMARY KEY,
+                window INTEGER NOT NULL,
+                prev_count INTEGER NOT NULL,
+                curr_count INTEGER NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_limits_expires ON rate_limits (expires_at)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key, now, window_seconds, max_attempts):
+        now_index = int(now // window_seconds)
+        conn = self._connection()
+        # BEGIN IMMEDIATE يحجز قفل الكتابة فتكون القراءة والتحديث عملية واحدة بين العمليات
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT window, prev_count, curr_count FROM rate_limits WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                prev_count, curr_count = 0, 0
+            else:
+                prev_count, curr_count = _slide(row[0], row[1], row[2], now_index)
+
+            allowed = _allow(prev_count, curr_count, now, window_seconds, max_attempts)
+            if allowed:
+                curr_count += 1
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limits (key, window, prev_count, curr_count, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, now_index, prev_count, curr_count, (now_index + 2) * window_seconds),
+            )
+            self._hits += 1
+            if self._hits % self.purge_every == 0:
+                conn.execute("DELETE FROM rate_limits WHERE expires_at <= ?", (now,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM rate_limits").fetchone()[0]
+
+    def clear(self):
+        self._connection().execute("DELETE FROM rate_limits")
+
+
+def backend_from_env():
+    """RATE_LIMIT_DB=/path/to/file.db لمشاركة الحدود بين العمليات، وإلا التخزين داخل العملية"""
+    path = os.environ.get("RATE_LIMIT_DB")
+    if path:
+        return SQLiteBackend(path)
+    return MemoryBackend(int(os.environ.get("RATE_LIMIT_MAX_KEYS", 100000)))
+
+
+class RateLimiter:
+    def __init__(self, max_attempts, window_seconds, backend):
+        self.max_attempts = max_attempts
+        self.window_seconds = window_seconds
+        self.backend = backend
+
+    def allow(self, key, now=None):
+        now = time.time() if now is None else now
+        return self.backend.hit(key, now, self.window_seconds, self.max_attempts)
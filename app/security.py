@@ -1,7 +1,7 @@
 # app/security.py
 from functools import wraps
 from flask import session, redirect, url_for, flash
-import time
+from app.rate_limiter import RateLimiter, backend_from_env
 
 # ------------------------
 # حماية الدخول
@@ -30,23 +30,22 @@ def admin_required(f):
 # ------------------------
 # تحديد عدد المحاولات لكل إجراء (Rate Limit)
 # ------------------------
-USER_ACTIONS = {}
+# الحالة محفوظة في Backend قابل للتبديل: داخل العملية افتراضيًا،
+# أو ملف SQLite مشترك بين الـ Workers عند تعيين RATE_LIMIT_DB
+RATE_LIMIT_BACKEND = backend_from_env()
 
-def rate_limit(max_attempts=5, window_seconds=60):
+def rate_limit(max_attempts=5, window_seconds=60, backend=None):
     def decorator(f):
+        limiter = RateLimiter(max_attempts, window_seconds, backend or RATE_LIMIT_BACKEND)
+        action = f"{f.__module__}.{f.__name__}"
+
         @wraps(f)
         def decorated_function(*args, **kwargs):
             user_id = session.get("user_id")
-            now = time.time()
             if user_id:
-                attempts = USER_ACTIONS.get(user_id, [])
-                # إزالة المحاولات القديمة
-                attempts = [t for t in attempts if now - t < window_seconds]
-                if len(attempts) >= max_attempts:
+                if not limiter.allow(f"{action}:{user_id}"):
                     flash("تم تجاوز الحد المسموح من العمليات، حاول لاحقًا", "warning")
                     return redirect(url_for("dashboard"))
-                attempts.append(now)
-                USER_ACTIONS[user_id] = attempts
             return f(*args, **kwargs)
         return decorated_function
     return decorator
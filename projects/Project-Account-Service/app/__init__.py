@@ -49,19 +49,57 @@ def create_app(config_object="app.config.Config"):
     login_manager.login_view = "auth.login"
     login_manager.session_protection = "strong"
 
+    from app.user_repository import user_repository
+    user_repository.init_app(app)
+
+    # طبقة المصادقة: تعمل مرة واحدة لكل طلب وتحفظ الهوية في flask.g
+    from app import auth_pipeline
+    auth_pipeline.init_app(app)
+
+    from app.revocation import revocation_store
+    revocation_store.init_app(app)
+
+    # دفتر الأستاذ (الأرصدة والتحويلات) قبل تسجيل الـ Blueprints التي تعتمد عليه
+    from app.ledger import ledger
+    ledger.init_app(app)
+
+    from app.locks import account_locks
+    account_locks.init_app(app)
+
+    from app.idempotency import idempotency_cache
+    idempotency_cache.init_app(app)
+
+    from app.valuation import valuation
+    valuation.init_app(app)
+
+    from app.trade_archive import trade_archive
+    trade_archive.init_app(app)
+
     # =========================
     # تسجيل Blueprints
     # =========================
     from app.routes.accounts import accounts_bp
     from app.routes.auth import auth_bp
     from app.routes.dashboard import dashboard_bp
+    from app.routes.market import market_bp
+    from app.routes.trades import trades_bp
     from app.routes.transfer import transfer_bp
 
     app.register_blueprint(accounts_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(dashboard_bp)
+    app.register_blueprint(market_bp)
+    app.register_blueprint(trades_bp)
     app.register_blueprint(transfer_bp)
 
+    # حالة الحسابات والصفقات: آخر لقطة + الأحداث بعدها (بعد استيراد الـ Blueprints التي تسجّل حالتها)
+    from app.event_store import event_store
+    event_store.init_app(app)
+
+    # صفقات توقف فتحها أو إغلاقها بين حدث النية وقيد الدفتر: تُكمل أو تُلغى حسب الدفتر
+    from app.routes.trades import reconcile_pending_trades
+    reconcile_pending_trades()
+
     # =========================
     # الصفحة الرئيسية
     # =========================
@@ -74,6 +112,7 @@ def create_app(config_object="app.config.Config"):
     # =========================
     with app.app_context():
         db.create_all()
+        revocation_store.load()
         print("✅ قاعدة البيانات جاهزة!")
 
     return app
@@ -81,11 +120,8 @@ def create_app(config_object="app.config.Config"):
 # =========================
 # User Loader
 # =========================
-from app.routes.auth import users_db, User
+from app.user_repository import user_repository
 
 @login_manager.user_loader
 def load_user(user_id):
-    for user in users_db.values():
-        if user.get_id() == str(user_id):
-            return user
-    return None
+    return user_repository.get(user_id)
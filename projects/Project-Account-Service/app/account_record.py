@@ -0,0 +1,101 @@
+# app/account_record.py
+
+import operator
+import sys
+import time
+from datetime import datetime, timezone
+
+# =========================
+# سجل حساب مضغوط (بدل قاموس لكل مستخدم)
+# =========================
+# __slots__ بدل dict: لا جدول تجزئة لكل حساب، والقيم المتكررة (standard / active / USD)
+# نص واحد مشترك بين كل الحسابات، ووقت الإنشاء عدد صحيح (ثوانٍ منذ epoch) بدل نص ISO.
+# الوصول بأسلوب القاموس (account["real"]) مدعوم حتى لا يتغير باقي الكود، و to_dict() لردود الـ API.
+
+ACCOUNT_TYPES = ("standard", "vip")
+STATUSES = ("active", "suspended")
+CURRENCIES = ("USD",)
+
+FIELDS = (
+    "real", "demo", "account_type", "status", "currency",
+    "kyc_verified", "daily_withdraw_limit", "created_at",
+)
+# قيم الحقول كـ tuple بدالة C واحدة (اللقطة تنسخ كل الحسابات تحت قفل سجل الأحداث)
+row_values = operator.attrgetter(*FIELDS)
+# الحقول النصية محدودة القيم: تُخزّن كنسخة مشتركة (intern)
+_ENUM_FIELDS = frozenset(("account_type", "status", "currency"))
+
+
+class AccountRecord:
+    __slots__ = FIELDS
+
+    def __init__(self, real=0.0, demo=0.0, account_type="standard", status="active", currency="USD",
+                 kyc_verified=False, daily_withdraw_limit=5000, created_at=None):
+        self.real = real
+        self.demo = demo
+        self.account_type = sys.intern(account_type)
+        self.status = sys.intern(status)
+        self.currency = sys.intern(currency)
+        self.kyc_verified = kyc_verified
+        self.daily_withdraw_limit = daily_withdraw_limit
+        self.created_at = int(time.time()) if created_at is None else created_at
+
+    # -------------------------
+    # واجهة متوافقة مع القاموس
+    # -------------------------
+    def __getitem__(self, key):
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in FIELDS:
+            raise KeyError(key)
+        setattr(self, key, sys.intern(value) if key in _ENUM_FIELDS else value)
+
+    def __contains__(self, key):
+        return key in FIELDS
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in FIELDS else default
+
+    def keys(self):
+        return FIELDS
+
+    def update(self, fields):
+        for key, value in fields.items():
+            self[key] = value
+
+    def to_dict(self):
+        """نفس شكل القاموس السابق في ردود الـ API (created_at بصيغة ISO)"""
+        data = {field: getattr(self, field) for field in FIELDS}
+        data["created_at"] = datetime.fromtimestamp(self.created_at, timezone.utc).replace(tzinfo=None).isoformat()
+        return data
+
+    # -------------------------
+    # الحفظ (سجل الأحداث واللقطات)
+    # -------------------------
+    def to_row(self):
+        return list(row_values(self))
+
+    @classmethod
+    def from_state(cls, data):
+        """من to_row() أو من قاموس الحساب القديم (created_at كنص ISO)"""
+        if isinstance(data, list):
+            return cls(*data)
+        record = cls()
+        record.update({key: value for key, value in data.items() if key != "created_at"})
+        created_at = data.get("created_at")
+        if isinstance(created_at, str):
+            created_at = int(datetime.fromisoformat(created_at).replace(tzinfo=timezone.utc).timestamp())
+        if created_at is not None:
+            record.created_at = created_at
+        return record
+
+    def __eq__(self, other):
+        if not isinstance(other, AccountRecord):
+            return NotImplemented
+        return self.to_row() == other.to_row()
+
+    def __repr__(self):
+        return f"AccountRecord({self.to_dict()!r})"
@@ -0,0 +1,71 @@
+# app/auth_pipeline.py
+
+from flask import current_app, g, request
+from flask_login import current_user
+import jwt
+
+from app.revocation import revocation_store
+from app.token_cache import VerifiedTokenCache, decode_token
+
+# =========================
+# طبقة المصادقة الموحدة
+# =========================
+# تعمل مرة واحدة لكل طلب (before_request) وتحفظ الهوية والـ claims في flask.g،
+# وكل الـ Blueprints تقرأ منها بدل أن يعيد كل Decorator قراءة الهيدر والتحقق من التوقيع.
+
+verified_tokens = VerifiedTokenCache()
+
+
+def init_app(app):
+    verified_tokens.max_size = app.config.get("TOKEN_CACHE_SIZE", verified_tokens.max_size)
+    verified_tokens.clear()
+    app.before_request(authenticate_request)
+
+
+def bearer_token():
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        return header[7:].strip() or None
+    return None
+
+
+def authenticate_request():
+    """تحديد هوية صاحب الطلب: JWT في الهيدر أولًا، ثم جلسة Flask-Login"""
+    g.user_id = None
+    g.claims = {}
+    g.auth_method = None
+    g.auth_error = None
+
+    token = bearer_token()
+    if token:
+        try:
+            claims = decode_token(token, current_app.config["SECRET_KEY"], verified_tokens)
+        except jwt.ExpiredSignatureError:
+            g.auth_error = "توكن منتهي الصلاحية"
+            return None
+        except jwt.InvalidTokenError:
+            g.auth_error = "توكن غير صالح أو منتهي"
+            return None
+
+        # توكن التجديد صالح فقط لـ /auth/refresh وليس للوصول إلى الموارد
+        if claims.get("type", "access") != "access":
+            g.auth_error = "توكن غير صالح أو منتهي"
+            return None
+
+        jti = claims.get("jti")
+        if jti and revocation_store.is_revoked(jti):
+            g.auth_error = "تم تسجيل الخروج من هذا التوكن"
+            return None
+
+        g.user_id = str(claims.get("user_id"))
+        g.claims = claims
+        g.auth_method = "jwt"
+        return None
+
+    if current_user.is_authenticated:
+        # المستخدم محمّل مسبقًا بواسطة Flask-Login، فنبني منه نفس claims التوكن.
+        # الجلسة تكفي لـ login_required فقط؛ عمليات الأموال (token_required) تتطلب التوكن
+        g.user_id = current_user.get_id()
+        g.claims = {"role": current_user.role, "tier": current_user.tier}
+        g.auth_method = "session"
+    return None
@@ -5,3 +5,60 @@ class Config:
     SECRET_KEY = "YOUR_SECRET_KEY_HERE"  # ضع مفتاح سري قوي هنا
     SQLALCHEMY_DATABASE_URI = "sqlite:///app.db"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # عدد كائنات User المحفوظة في ذاكرة LRU الخاصة بمستودع المستخدمين
+    USER_CACHE_SIZE = 10000
+
+    # الحد الأقصى لعدد التوكنات المحفوظة بعد التحقق من توقيعها
+    TOKEN_CACHE_SIZE = 50000
+
+    # الحجم المبدئي لـ Bloom Filter الخاص بالتوكنات الملغاة
+    REVOCATION_CAPACITY = 100000
+    # كل كم ثانية يقرأ العامل الإلغاءات التي سجّلها عمال آخرون على نفس قاعدة البيانات
+    REVOCATION_SYNC_SECONDS = 5
+
+    # صلاحية توكن الوصول (قصيرة لأن الدور والمستوى موقّعان داخله) وتوكن التجديد
+    ACCESS_TOKEN_MINUTES = 15
+    REFRESH_TOKEN_DAYS = 7
+
+    # دفتر الأستاذ: None = instance/ledger.db
+    LEDGER_PATH = None
+    LEDGER_SYNCHRONOUS = "FULL"       # كل commit محفوظ على القرص قبل الرد
+    LEDGER_GROUP_COMMIT_MAX = 512     # أقصى عدد معاملات في commit واحد
+    LEDGER_COMMIT_DELAY_MS = 0        # انتظار إضافي لتجميع طلبات أكثر في نفس الـ commit
+
+    # عدد الأقفال المقسّمة لعمليات الأرصدة (حسابات على نفس الشريحة تتسلسل)
+    LOCK_STRIPES = 1024
+
+    # حد السحب اليومي: نافذة متحركة 24 ساعة بفترات 10 دقائق، وتقرير حجم السحب بالأيام
+    WITHDRAW_WINDOW_SECONDS = 24 * 3600
+    WITHDRAW_BUCKET_SECONDS = 600
+    VOLUME_REPORT_DAYS = 30
+
+    # السجلات والإشعارات: عدد الإدخالات في الذاكرة لكل مستخدم، والباقي على القرص
+    LOG_SPILL_DIR = None              # None = instance/logs
+    LOG_RING_CAPACITY = 200
+    LOG_SPILL_BATCH = 50              # عدد الإدخالات المكتوبة للقرص في كل مرة
+    LOG_SEGMENT_ENTRIES = 1000        # عدد الإدخالات في كل ملف مقطع
+
+    # أقصى مدة انتظار (بالثواني) لطلب الإشعارات في وضع long-poll
+    NOTIFICATION_LONG_POLL_MAX = 30
+
+    # Idempotency-Key: مدة حفظ الرد الأول، أقصى عدد مفاتيح، ومدة انتظار الطلب المكرر للطلب الجاري
+    IDEMPOTENCY_TTL_SECONDS = 24 * 3600
+    IDEMPOTENCY_MAX_KEYS = 100000
+    IDEMPOTENCY_WAIT_SECONDS = 30
+
+    # سجل أحداث الحسابات والصفقات: None = instance/events، ولقطة كاملة كل EVENT_SNAPSHOT_EVERY حدث
+    EVENT_STORE_DIR = None
+    EVENT_SNAPSHOT_EVERY = 10000
+    EVENT_LOG_FSYNC = False           # الأرصدة في الدفتر؛ هنا بيانات الحساب والصفقات فقط
+
+    # نداء الهامش عندما تنزل حقوق الملكية تحت هذه النسبة (%) من الهامش المحجوز
+    MARGIN_CALL_LEVEL = 100
+    # أقصى رافعة للصفقة (الأرباح تُدفع من system:pnl بلا حد أعلى)
+    MAX_LEVERAGE = 100
+
+    # أرشيف الصفقات المغلقة: None = instance/trade_archive، وعدد الصفوف في كل قطعة .npy
+    TRADE_ARCHIVE_DIR = None
+    TRADE_ARCHIVE_CHUNK_ROWS = 65536
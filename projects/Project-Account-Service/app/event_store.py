@@ -0,0 +1,234 @@
+# app/event_store.py
+
+import atexit
+import json
+import os
+import threading
+import time
+
+# =========================
+# سجل الأحداث مع لقطات دورية (Event Sourcing + Snapshots)
+# =========================
+# كل تغيير على حالة الحسابات والصفقات في الذاكرة يُكتب حدثًا في ملف JSONL قبل تطبيقه،
+# وكل snapshot_every حدث تُحفظ لقطة كاملة للحالة ويبدأ ملف أحداث جديد (القديم يُحذف).
+# تحت القفل تُنسخ الحالة ويُبدّل ملف الأحداث فقط؛ التسلسل والكتابة و fsync في خيط منفصل،
+# فالطلبات لا تنتظر كتابة اللقطة.
+# عند التشغيل: آخر لقطة ثم الأحداث التي بعدها فقط، فزمن الاستعادة محدود بعدد الأحداث
+# بين لقطتين وليس بطول التاريخ كله.
+#
+# الأرصدة ليست هنا: مصدرها دفتر الأستاذ (app/ledger.py).
+
+SNAPSHOT_FILE = "snapshot.json"
+SEGMENT_PREFIX = "events-"
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+class _Stream:
+    """
+    apply(op, user_id, data): تطبيق حدث على الحالة (نفس الدالة عند التنفيذ وعند الاستعادة)
+    dump() → نسخة من الحالة كاملة لا تشارك الحالة الحية أي كائن قابل للتعديل (تُستدعى تحت القفل
+    وتُسلسل بعده)، load(data): استبدال الحالة باللقطة (None = حالة فارغة)
+    persist(dumped) اختياري → بيانات JSON، يُستدعى خارج القفل قبل كتابة اللقطة (مثل كتابة ملفات)
+    """
+    __slots__ = ("apply", "dump", "load", "persist")
+
+    def __init__(self, apply, dump, load, persist=None):
+        self.apply = apply
+        self.dump = dump
+        self.load = load
+        self.persist = persist
+
+
+class EventStore:
+    def __init__(self, directory=None, snapshot_every=10000, fsync=False):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self._streams = {}
+        self._lock = threading.Lock()
+        self._file = None
+        self._snapshot_thread = None
+        self.seq = 0
+        self.snapshot_seq = 0
+        self.last_recovery = {}
+
+    def register(self, name, apply, dump, load, persist=None):
+        self._streams[name] = _Stream(apply, dump, load, persist)
+
+    def init_app(self, app):
+        directory = app.config.get("EVENT_STORE_DIR") or os.path.join(app.instance_path, "events")
+        self.snapshot_every = app.config.get("EVENT_SNAPSHOT_EVERY", self.snapshot_every)
+        self.fsync = app.config.get("EVENT_LOG_FSYNC", self.fsync)
+        self.open(directory)
+        report = self.last_recovery
+        print(
+            f"♻️ استعادة الحالة: لقطة حتى الحدث {report['snapshot_seq']} + "
+            f"{report['replayed']} حدث بعدها في {report['seconds'] * 1000:.1f}ms"
+        )
+
+    # -------------------------
+    # الملفات
+    # -------------------------
+    def _segments(self):
+        """ملفات الأحداث مرتبة: [(أول seq في الملف، المسار)]"""
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(".jsonl"):
+                segments.append((int(name[len(SEGMENT_PREFIX):-6]), os.path.join(self.directory, name)))
+        return sorted(segments)
+
+    def _open_segment(self, first_seq):
+        if self._file is not None:
+            self._file.close()
+        path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{first_seq:012d}.jsonl")
+        self._file = open(path, "a", encoding="utf-8")
+        # ملف موجود ينتهي بسطر ناقص: الحدث التالي يبدأ في سطر جديد
+        if self._file.tell() and not _ends_with_newline(path):
+            self._file.write("\n")
+
+    def open(self, directory):
+        self.close()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        started = time.perf_counter()
+
+        snapshot = {"seq": 0, "streams": {}}
+        try:
+            with open(os.path.join(directory, SNAPSHOT_FILE), encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            pass
+        for name, stream in self._streams.items():
+            stream.load(snapshot["streams"].get(name))
+        self.seq = self.snapshot_seq = snapshot["seq"]
+
+        replayed = 0
+        for _, path in self._segments():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # سطر ناقص بعد توقف مفاجئ: الحدث لم يكتمل ولم يُطبَّق
+                        continue
+                    if event["seq"] <= self.seq:
+                        continue
+                    stream = self._streams.get(event["stream"])
+                    if stream is not None:
+                        stream.apply(event["op"], event["user_id"], event["data"])
+                    self.seq = event["seq"]
+                    replayed += 1
+
+        self._open_segment(self.seq + 1)
+        self.last_recovery = {
+            "snapshot_seq": self.snapshot_seq,
+            "replayed": replayed,
+            "seconds": time.perf_counter() - started,
+        }
+
+    def close(self):
+        # لقطة قيد الكتابة تكتمل قبل الإغلاق
+        thread = self._snapshot_thread
+        if thread is not None:
+            thread.join()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # -------------------------
+    # الكتابة
+    # -------------------------
+    def emit(self, stream_name, op, user_id, data):
+        """كتابة الحدث ثم تطبيقه على الحالة؛ ترجع ما ترجعه apply"""
+        stream = self._streams[stream_name]
+        with self._lock:
+            if self._file is None:
+                return stream.apply(op, user_id, data)
+            self.seq += 1
+            self._file.write(json.dumps(
+                {"seq": self.seq, "stream": stream_name, "op": op, "user_id": user_id, "data": data},
+                ensure_ascii=False
+            ) + "\n")
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            result = stream.apply(op, user_id, data)
+            if self.seq - self.snapshot_seq >= self.snapshot_every and self._snapshot_thread is None:
+                state = self._capture()
+                self._snapshot_thread = threading.Thread(
+                    target=self._write_snapshot, args=(state,), name="event-snapshot", daemon=True
+                )
+                self._snapshot_thread.start()
+            return result
+
+    def snapshot(self):
+        """لقطة فورية تنتظر اكتمال الكتابة (بعد أي لقطة قيد الكتابة في الخلفية)"""
+        while True:
+            thread = self._snapshot_thread
+            if thread is not None:
+                thread.join()
+            with self._lock:
+                if self._snapshot_thread is not None:
+                    continue
+                if self._file is None or self.seq <= self.snapshot_seq:
+                    return
+                state = self._capture()
+                # emit لا يبدأ لقطة أخرى حتى تنتهي هذه
+                self._snapshot_thread = threading.current_thread()
+            self._write_snapshot(state)
+            return
+
+    def _capture(self):
+        """
+        يُستدعى تحت القفل: لا حدث يُطبَّق أثناء نسخ الحالة، فاللقطة متسقة مع seq.
+        الأحداث بعد seq تذهب إلى ملف جديد، والقديمة تُحذف بعد حفظ اللقطة فقط
+        """
+        state = {"seq": self.seq, "streams": {name: s.dump() for name, s in self._streams.items()}}
+        self._open_segment(self.seq + 1)
+        return state
+
+    def _write_snapshot(self, state):
+        """
+        خارج القفل. الكتابة إلى ملف مؤقت ثم rename حتى لا تبقى لقطة ناقصة بعد توقف مفاجئ؛
+        إذا فشلت تبقى اللقطة السابقة وملفات أحداثها، وتُعاد المحاولة مع الحدث التالي
+        """
+        try:
+            for name, stream in self._streams.items():
+                if stream.persist is not None and name in state["streams"]:
+                    state["streams"][name] = stream.persist(state["streams"][name])
+            path = os.path.join(self.directory, SNAPSHOT_FILE)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+            self.snapshot_seq = state["seq"]
+
+            # الأحداث حتى seq موجودة في اللقطة: حذف ملفاتها (الملف الحالي يبدأ بعدها)
+            for first_seq, segment in self._segments():
+                if first_seq <= state["seq"]:
+                    os.remove(segment)
+        except Exception as e:
+            print(f"⚠️ فشل حفظ لقطة سجل الأحداث: {e}")
+        finally:
+            if self._snapshot_thread is threading.current_thread():
+                self._snapshot_thread = None
+
+    def stats(self):
+        return {
+            "seq": self.seq,
+            "snapshot_seq": self.snapshot_seq,
+            "events_since_snapshot": self.seq - self.snapshot_seq,
+            "snapshot_every": self.snapshot_every,
+            "last_recovery": self.last_recovery,
+        }
+
+
+event_store = EventStore()
+atexit.register(event_store.close)
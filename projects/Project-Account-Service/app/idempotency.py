@@ -0,0 +1,175 @@
+# app/idempotency.py
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import g, jsonify, make_response, request
+
+# =========================
+# مفاتيح منع التكرار (Idempotency-Key)
+# =========================
+# أول رد لكل (مستخدم، مسار، مفتاح) يُحفظ لمدة محددة، وإعادة نفس الطلب (مثل إعادة المحاولة بعد
+# انتهاء مهلة الشبكة) ترجع نفس الرد دون تنفيذ العملية مرة ثانية. الطلب المكرر أثناء تنفيذ الأول
+# ينتظره بدل أن يتسابق معه.
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+# رؤوس الرد التي تُعاد مع الرد المحفوظ
+REPLAYED_HEADERS = ("Content-Type", "Retry-After", "Location")
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "expires_at", "done", "status", "body", "headers")
+
+    def __init__(self, fingerprint, expires_at):
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+        self.done = threading.Event()
+        self.status = None
+        self.body = None
+        self.headers = None
+
+
+class IdempotencyCache:
+    def __init__(self, ttl_seconds=86400, max_keys=100000, wait_seconds=30):
+        self.ttl_seconds = ttl_seconds
+        self.max_keys = max_keys
+        self.wait_seconds = wait_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.replays = 0
+
+    def init_app(self, app):
+        self.ttl_seconds = app.config.get("IDEMPOTENCY_TTL_SECONDS", self.ttl_seconds)
+        self.max_keys = app.config.get("IDEMPOTENCY_MAX_KEYS", self.max_keys)
+        self.wait_seconds = app.config.get("IDEMPOTENCY_WAIT_SECONDS", self.wait_seconds)
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self, now):
+        """
+        حذف المنتهية ثم الأقدم حتى max_keys، مع إبقاء المفاتيح قيد التنفيذ (done غير مضبوط):
+        حذفها يجعل إعادة المحاولة المتزامنة مالكًا جديدًا فتُنفَّذ العملية مرتين.
+        """
+        # المدخلات مرتبة حسب وقت الإضافة ونفس TTL للجميع، فالمنتهية دائمًا في البداية
+        entries = self._entries
+        in_flight = []
+        while entries:
+            key, entry = next(iter(entries.items()))
+            if entry.expires_at > now and len(entries) + len(in_flight) <= self.max_keys:
+                break
+            entries.popitem(last=False)
+            if not entry.done.is_set():
+                in_flight.append((key, entry))
+        # إعادة المفاتيح قيد التنفيذ إلى البداية بنفس ترتيبها
+        for key, entry in reversed(in_flight):
+            entries[key] = entry
+            entries.move_to_end(key, last=False)
+
+    def begin(self, key, fingerprint, now=None):
+        """
+        ترجع (entry، owner): owner=True يعني أن هذا الطلب هو الأول ويجب أن ينفّذ ثم يستدعي finish/abort،
+        وإلا فـ entry لطلب سابق (منتهٍ أو قيد التنفيذ).
+        entry = None إذا امتلأت الذاكرة بمفاتيح كلها قيد التنفيذ (لا يمكن حفظ مفتاح جديد بأمان)
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now and entry.done.is_set():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                return entry, False
+            entry = self._entries[key] = _Entry(fingerprint, now + self.ttl_seconds)
+            self._evict(now)
+            if len(self._entries) > self.max_keys:
+                del self._entries[key]
+                return None, False
+            return entry, True
+
+    def finish(self, entry, response):
+        entry.status = response.status_code
+        entry.body = response.get_data()
+        entry.headers = [(name, response.headers[name]) for name in REPLAYED_HEADERS if name in response.headers]
+        entry.done.set()
+
+    def abort(self, key, entry):
+        """الطلب الأول فشل بخطأ خادم: نحذف المفتاح حتى تُنفَّذ إعادة المحاولة فعليًا"""
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        entry.done.set()
+
+    def replayed(self):
+        with self._lock:
+            self.replays += 1
+
+    def stats(self):
+        return {"keys": len(self._entries), "max_keys": self.max_keys, "replays": self.replays}
+
+
+idempotency_cache = IdempotencyCache()
+
+
+def _fingerprint():
+    digest = hashlib.sha256(request.method.encode())
+    digest.update(request.full_path.encode())
+    digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _replay(entry):
+    response = make_response(entry.body, entry.status)
+    for name, value in entry.headers:
+        response.headers[name] = value
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(f):
+    """
+    Decorator لعمليات تحريك الأموال (بعد login_required حتى يكون g.user_id جاهزًا).
+    بدون هيدر Idempotency-Key يعمل الـ route كالمعتاد.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({"error": "Idempotency-Key طويل جدًا"}), 400
+
+        scoped_key = (g.get("user_id"), request.method, request.path, key)
+        fingerprint = _fingerprint()
+        entry, owner = idempotency_cache.begin(scoped_key, fingerprint)
+        if entry is None:
+            response = jsonify({"error": "الخادم مشغول بطلبات أخرى، أعد المحاولة لاحقًا"})
+            response.headers["Retry-After"] = "1"
+            return response, 503
+
+        if not owner:
+            if entry.fingerprint != fingerprint:
+                return jsonify({"error": "Idempotency-Key مستخدم مسبقًا لطلب مختلف"}), 422
+            # طلب مكرر أثناء تنفيذ الأول: ننتظره ثم نعيد نفس الرد
+            if not entry.done.wait(idempotency_cache.wait_seconds) or entry.status is None:
+                return jsonify({"error": "الطلب الأصلي ما زال قيد التنفيذ، أعد المحاولة لاحقًا"}), 409
+            idempotency_cache.replayed()
+            return _replay(entry)
+
+        try:
+            response = make_response(f(*args, **kwargs))
+        except Exception:
+            idempotency_cache.abort(scoped_key, entry)
+            raise
+        if response.status_code >= 500:
+            idempotency_cache.abort(scoped_key, entry)
+        else:
+            idempotency_cache.finish(entry, response)
+        return response
+    return decorated_function
@@ -0,0 +1,418 @@
+# app/ledger.py
+
+import atexit
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+# =========================
+# دفتر الأستاذ (Ledger)
+# =========================
+# كل عملية مالية = معاملة واحدة بقيود مزدوجة (مجموع المبالغ = صفر) تُضاف إلى جدول
+# لا يقبل التعديل أو الحذف. الأرصدة صفوف مادية تُحدّث في نفس المعاملة، ونسخة منها
+# في الذاكرة لمعرفة الحسابات الموجودة. الكتابة عبر خيط واحد يجمع الطلبات المتزامنة في commit واحد.
+#
+# أكثر من عملية (worker) على نفس الملف: فحص الرصيد يقرأ الجدول داخل BEGIN IMMEDIATE (قفل
+# الكتابة) وليس الذاكرة، والتحديث فرق (balance = balance + ?) وليس قيمة مطلقة، فلا يضيع
+# تحديث عملية أخرى ولا يُقبل سحب على رصيد قديم.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger_transactions (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    user_id TEXT,
+    memo TEXT,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ledger_postings (
+    id INTEGER PRIMARY KEY,
+    txn_id INTEGER NOT NULL REFERENCES ledger_transactions(id),
+    account TEXT NOT NULL,
+    user_id TEXT,
+    amount REAL NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_postings_account_id ON ledger_postings (account, id);
+CREATE INDEX IF NOT EXISTS ix_transactions_user_kind ON ledger_transactions (user_id, kind, created_at);
+CREATE TABLE IF NOT EXISTS ledger_balances (
+    account TEXT PRIMARY KEY,
+    balance REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ledger_txn_keys (
+    key TEXT PRIMARY KEY,
+    txn_id INTEGER NOT NULL REFERENCES ledger_transactions(id)
+);
+CREATE TRIGGER IF NOT EXISTS ledger_postings_no_update BEFORE UPDATE ON ledger_postings
+BEGIN SELECT RAISE(ABORT, 'ledger_postings is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS ledger_postings_no_delete BEFORE DELETE ON ledger_postings
+BEGIN SELECT RAISE(ABORT, 'ledger_postings is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS ledger_transactions_no_update BEFORE UPDATE ON ledger_transactions
+BEGIN SELECT RAISE(ABORT, 'ledger_transactions is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS ledger_transactions_no_delete BEFORE DELETE ON ledger_transactions
+BEGIN SELECT RAISE(ABORT, 'ledger_transactions is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS ledger_txn_keys_no_update BEFORE UPDATE ON ledger_txn_keys
+BEGIN SELECT RAISE(ABORT, 'ledger_txn_keys is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS ledger_txn_keys_no_delete BEFORE DELETE ON ledger_txn_keys
+BEGIN SELECT RAISE(ABORT, 'ledger_txn_keys is append-only'); END;
+"""
+
+ADD_BALANCE = """
+INSERT INTO ledger_balances (account, balance) VALUES (?, ?)
+ON CONFLICT(account) DO UPDATE SET balance = balance + excluded.balance
+"""
+SELECT_BALANCE = "SELECT balance FROM ledger_balances WHERE account = ?"
+SELECT_KEY = "SELECT txn_id FROM ledger_txn_keys WHERE key = ?"
+
+# الحسابات التي تبدأ بهذه البادئة (الصندوق الخارجي، تمويل الديمو، الصفقات...) يمكن أن تصبح سالبة
+SYSTEM_PREFIX = "system:"
+EPSILON = 1e-9
+
+
+def user_account(user_id, kind):
+    """اسم حساب المستخدم في الدفتر: user:<id>:real | demo | wallet"""
+    return f"user:{user_id}:{kind}"
+
+
+class InsufficientFunds(Exception):
+    """القيد سيجعل رصيد حساب مستخدم سالبًا (index: رقم المعاملة داخل الدفعة)"""
+
+    def __init__(self, account, index=None):
+        super().__init__(account)
+        self.account = account
+        self.index = index
+
+
+class _Request:
+    """
+    معاملة واحدة أو أكثر تُطبّق معًا في نفس الـ commit.
+    items: [(kind, user_id, entries, memo)]
+    atomic: فشل أي معاملة يلغي الكل، وإلا تُطبّق الناجحة فقط
+    """
+    __slots__ = ("items", "atomic", "only_if_new", "key", "future")
+
+    def __init__(self, items, atomic=True, only_if_new=None, key=None):
+        self.items = items
+        self.atomic = atomic
+        self.only_if_new = only_if_new
+        self.key = key
+        self.future = Future()
+
+
+def _normalize(entries):
+    entries = [(account, float(amount)) for account, amount in entries]
+    if not all(math.isfinite(amount) for _, amount in entries):
+        raise ValueError("ledger amounts must be finite")
+    if abs(sum(amount for _, amount in entries)) > EPSILON:
+        raise ValueError("ledger transaction does not balance")
+    return entries
+
+
+class Ledger:
+    def __init__(self, path=None, synchronous="FULL", max_batch=512, commit_delay=0.0):
+        self.path = path
+        self.synchronous = synchronous
+        self.max_batch = max_batch
+        self.commit_delay = commit_delay
+        self._balances = {}
+        self._queue = queue.Queue()
+        self._writer = None
+        self._readers = threading.local()
+        self.commits = 0
+        self.transactions = 0
+
+    def init_app(self, app):
+        path = app.config.get("LEDGER_PATH") or os.path.join(app.instance_path, "ledger.db")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.synchronous = app.config.get("LEDGER_SYNCHRONOUS", self.synchronous)
+        self.max_batch = app.config.get("LEDGER_GROUP_COMMIT_MAX", self.max_batch)
+        self.commit_delay = app.config.get("LEDGER_COMMIT_DELAY_MS", self.commit_delay * 1000) / 1000.0
+        self.open(path)
+
+    # -------------------------
+    # التشغيل والإيقاف
+    # -------------------------
+    def open(self, path):
+        self.close()
+        self.path = path
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        self._balances = dict(conn.execute("SELECT account, balance FROM ledger_balances"))
+        self._readers = threading.local()
+        self.commits = self.transactions = 0
+
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._run, args=(conn,), name="ledger-writer", daemon=True)
+        self._writer.start()
+
+    def close(self):
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        return conn
+
+    # -------------------------
+    # الكتابة
+    # -------------------------
+    def post(self, kind, user_id, entries, memo="", only_if_new=None, key=None):
+        """
+        إضافة معاملة وانتظار حفظها على القرص.
+        entries: [(account, amount)] ومجموعها يجب أن يساوي صفرًا
+        only_if_new: اسم حساب؛ تُتجاهل المعاملة إذا كان موجودًا (للأرصدة الافتتاحية)
+        key: مفتاح فريد للمعاملة (مثل trade_close:<user>:<trade>)؛ تُتجاهل إذا حُفظت معاملة بنفس المفتاح
+        ترجع (txn_id أو None، {account: الرصيد الجديد}) أو ترفع InsufficientFunds
+        """
+        request = _Request([(kind, user_id, _normalize(entries), memo)], only_if_new=only_if_new, key=key)
+        return self._submit(request)[0]
+
+    def post_batch(self, items, atomic=True):
+        """
+        عدة معاملات في commit واحد (مثل دفعات الرواتب).
+        items: [(kind, user_id, entries, memo)]
+        atomic=True: ترفع InsufficientFunds (مع index) ولا يُحفظ شيء إذا فشلت أي معاملة
+        atomic=False: ترجع قائمة بنفس الترتيب فيها (txn_id، الأرصدة) أو InsufficientFunds لكل معاملة
+        """
+        items = [(kind, user_id, _normalize(entries), memo) for kind, user_id, entries, memo in items]
+        if not items:
+            return []
+        return self._submit(_Request(items, atomic=atomic))
+
+    def _submit(self, request):
+        if self._writer is None:
+            raise RuntimeError("ledger is not open")
+        self._queue.put(request)
+        return request.future.result()
+
+    def open_account(self, account, amount, source, kind="opening", user_id=None):
+        """رصيد افتتاحي مرة واحدة فقط لكل حساب (آمن عند التكرار أو التزامن)"""
+        if self.has_account(account):
+            return
+        self.post(kind, user_id, [(source, -amount), (account, amount)], only_if_new=account)
+
+    def _run(self, conn):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                break
+            batch = [request]
+            if self.commit_delay:
+                time.sleep(self.commit_delay)
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    request = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop = True
+                    break
+                batch.append(request)
+            self._commit(conn, batch)
+            if stop:
+                break
+        conn.close()
+
+    def _commit(self, conn, batch):
+        """كل طلبات الدفعة في معاملة SQLite واحدة = fsync واحد"""
+        pending = {}
+        stored = {}
+        keys = set()
+        results = []
+        now = time.time()
+
+        def stored_balance(account):
+            # من الجدول تحت قفل الكتابة: يشمل ما كتبته عمليات أخرى على نفس الملف (None = غير موجود)
+            if account not in stored:
+                row = conn.execute(SELECT_BALANCE, (account,)).fetchone()
+                stored[account] = None if row is None else row[0]
+            return stored[account]
+
+        def balance(account):
+            if account in pending:
+                return pending[account]
+            value = stored_balance(account)
+            return 0.0 if value is None else value
+
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for request in batch:
+                if request.only_if_new is not None and (
+                    request.only_if_new in pending or stored_balance(request.only_if_new) is not None
+                ):
+                    results.append((request, [(None, {})]))
+                    continue
+                if request.key is not None:
+                    if request.key in keys or conn.execute(SELECT_KEY, (request.key,)).fetchone():
+                        results.append((request, [(None, {})]))
+                        continue
+                result = self._apply(conn, request, balance, pending, now)
+                if request.key is not None and not isinstance(result, Exception):
+                    conn.execute("INSERT INTO ledger_txn_keys (key, txn_id) VALUES (?, ?)", (request.key, result[0][0]))
+                    keys.add(request.key)
+                results.append((request, result))
+            conn.execute("COMMIT")
+        except Exception as exc:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for request in batch:
+                request.future.set_exception(exc)
+            return
+
+        # الذاكرة تُحدّث فقط بعد نجاح الحفظ على القرص
+        self._balances.update(pending)
+        self.commits += 1
+        for request, result in results:
+            if isinstance(result, Exception):
+                request.future.set_exception(result)
+            else:
+                self.transactions += sum(1 for outcome in result if not isinstance(outcome, Exception))
+                request.future.set_result(result)
+
+    def _apply(self, conn, request, balance, pending, now):
+        """فحص كل معاملات الطلب على الأرصدة الحالية ثم كتابة المقبولة منها"""
+        overlay = {}
+        deltas = {}
+        outcomes = []
+        for index, (_, _, entries, _) in enumerate(request.items):
+            updated = {}
+            for account, amount in entries:
+                updated[account] = updated.get(account, overlay.get(account, balance(account))) + amount
+            short = next(
+                (a for a, b in updated.items() if b < -EPSILON and not a.startswith(SYSTEM_PREFIX)),
+                None
+            )
+            if short is not None:
+                if request.atomic:
+                    return InsufficientFunds(short, index)
+                outcomes.append(InsufficientFunds(short, index))
+                continue
+            overlay.update(updated)
+            for account, amount in entries:
+                deltas[account] = deltas.get(account, 0.0) + amount
+            outcomes.append(updated)
+
+        written = []
+        for (kind, user_id, entries, memo), outcome in zip(request.items, outcomes):
+            if isinstance(outcome, Exception):
+                written.append(outcome)
+                continue
+            txn_id = conn.execute(
+                "INSERT INTO ledger_transactions (kind, user_id, memo, created_at) VALUES (?, ?, ?, ?)",
+                (kind, user_id, memo, now)
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO ledger_postings (txn_id, account, user_id, amount, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(txn_id, account, user_id, amount, now) for account, amount in entries]
+            )
+            written.append((txn_id, outcome))
+        # مجموع التغيير لكل حساب مرة واحدة مهما كان عدد المعاملات عليه
+        conn.executemany(ADD_BALANCE, deltas.items())
+        pending.update(overlay)
+        return written
+
+    # -------------------------
+    # القراءة
+    # -------------------------
+    def balance(self, account, default=0.0):
+        """من الجدول: الذاكرة لا ترى ما كتبته عمليات أخرى على نفس الملف"""
+        row = self._reader().execute(SELECT_BALANCE, (account,)).fetchone()
+        return default if row is None else row[0]
+
+    def has_account(self, account):
+        # الحسابات لا تُحذف: الموجود في الذاكرة موجود في الجدول
+        if account in self._balances:
+            return True
+        row = self._reader().execute(SELECT_BALANCE, (account,)).fetchone()
+        if row is None:
+            return False
+        self._balances[account] = row[0]
+        return True
+
+    def keyed_entries(self, key):
+        """قيود المعاملة المحفوظة بمفتاح key كـ {account: amount}، أو None إذا لم تُحفظ"""
+        rows = self._reader().execute(
+            "SELECT p.account, p.amount FROM ledger_txn_keys k JOIN ledger_postings p ON p.txn_id = k.txn_id "
+            "WHERE k.key = ?",
+            (key,)
+        ).fetchall()
+        return {account: amount for account, amount in rows} or None
+
+    def _reader(self):
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = self._readers.conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+        return conn
+
+    def postings_page(self, account, limit, after_id=None, direction=None,
+                      min_amount=None, max_amount=None, since=None, until=None):
+        """
+        صفحة من قيود حساب واحد بترتيب الإضافة (keyset): id > after_id ثم LIMIT،
+        فتكلفة الصفحة ثابتة عبر الفهرس (account, id) مهما طال السجل.
+        direction: "credit" (مبلغ موجب) أو "debit" (سالب)؛ min/max على القيمة المطلقة؛ since/until بالـ epoch
+        """
+        where = ["p.account = ?"]
+        params = [account]
+        if after_id is not None:
+            where.append("p.id > ?")
+            params.append(after_id)
+        if direction == "credit":
+            where.append("p.amount > 0")
+        elif direction == "debit":
+            where.append("p.amount < 0")
+        if min_amount is not None:
+            where.append("abs(p.amount) >= ?")
+            params.append(min_amount)
+        if max_amount is not None:
+            where.append("abs(p.amount) <= ?")
+            params.append(max_amount)
+        if since is not None:
+            where.append("p.created_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("p.created_at < ?")
+            params.append(until)
+        params.append(limit)
+
+        rows = self._reader().execute(
+            "SELECT p.id, p.txn_id, p.amount, p.created_at, t.kind, t.memo "
+            "FROM ledger_postings p JOIN ledger_transactions t ON t.id = p.txn_id "
+            f"WHERE {' AND '.join(where)} ORDER BY p.id LIMIT ?",
+            params
+        )
+        return [dict(row) for row in rows]
+
+    def user_volume(self, user_id, kind, since):
+        """
+        [(created_at، المبلغ)] لكل معاملة من نوع kind للمستخدم منذ since،
+        والمبلغ = ما خرج من حسابات المستخدم (موجب للسحب والتحويل)
+        """
+        rows = self._reader().execute(
+            "SELECT t.created_at, -SUM(p.amount) FROM ledger_transactions t "
+            "JOIN ledger_postings p ON p.txn_id = t.id "
+            "WHERE t.user_id = ? AND t.kind = ? AND t.created_at >= ? AND p.account LIKE 'user:%' "
+            "GROUP BY t.id ORDER BY t.id",
+            (user_id, kind, since)
+        )
+        return rows.fetchall()
+
+    def stats(self):
+        return {
+            "accounts": len(self._balances),
+            "transactions": self.transactions,
+            "commits": self.commits,
+            "avg_batch": self.transactions / self.commits if self.commits else 0.0,
+        }
+
+
+ledger = Ledger()
+atexit.register(ledger.close)
@@ -0,0 +1,55 @@
+# app/locks.py
+
+import threading
+from contextlib import contextmanager
+
+# =========================
+# أقفال مقسّمة حسب الحساب (Striped Locks)
+# =========================
+# عدد ثابت من الأقفال، وكل حساب يقع على واحد منها حسب الـ hash.
+# العمليات على حسابات مختلفة تعمل بالتوازي غالبًا، والعمليات على نفس الحساب تتسلسل،
+# دون قفل لكل مستخدم (ذاكرة غير محدودة) ودون قفل عام واحد (تسلسل كل شيء).
+
+
+class StripedLocks:
+    def __init__(self, stripes=1024):
+        self._build(stripes)
+
+    def init_app(self, app):
+        self._build(app.config.get("LOCK_STRIPES", self.stripes))
+
+    def _build(self, stripes):
+        self.stripes = max(int(stripes), 1)
+        # RLock حتى لا يتعطل الخيط إذا طلب نفس الحساب مرتين (مثل دالة مساعدة داخل route)
+        self._locks = [threading.RLock() for _ in range(self.stripes)]
+        self.acquired = 0
+        self.contended = 0
+
+    def _index(self, key):
+        # str حتى يقع "1" و 1 على نفس القفل
+        return hash(str(key)) % self.stripes
+
+    @contextmanager
+    def hold(self, *keys):
+        """
+        قفل كل الحسابات المطلوبة معًا. الأقفال تُؤخذ دائمًا بترتيب رقم الشريحة،
+        فعمليتان بين نفس الطرفين (A→B و B→A) لا يمكن أن تنتظر كل منهما الأخرى.
+        """
+        indexes = sorted({self._index(key) for key in keys if key is not None})
+        locks = [self._locks[i] for i in indexes]
+        for lock in locks:
+            if not lock.acquire(blocking=False):
+                self.contended += 1
+                lock.acquire()
+        self.acquired += len(locks)
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def stats(self):
+        return {"stripes": self.stripes, "acquired": self.acquired, "contended": self.contended}
+
+
+account_locks = StripedLocks()
@@ -0,0 +1,134 @@
+# app/positions.py
+
+# =========================
+# فهرس المراكز المفتوحة لكل (مستخدم، رمز)
+# =========================
+# يُحدَّث تدريجيًا عند فتح كل صفقة وإغلاقها، فلا حاجة للمرور على صفقات المستخدم لمعرفة
+# اتجاهه على رمز معيّن (قاعدة منع التحوط للحساب Standard) أو حجم تعرّضه.
+# الكمية = مبلغ الصفقة بالدولار (amount_usd)، والتعرّض = الكمية × الرافعة.
+# الرمز بحروف كبيرة مثل الأسعار ومستويات SL/TP ("gold" و "GOLD" مركز واحد).
+
+SIDES = {"buy": "long", "sell": "short"}
+
+
+class _Side:
+    __slots__ = ("quantity", "exposure", "trades", "priced_quantity", "entry_cost")
+
+    def __init__(self):
+        self.quantity = 0.0
+        self.exposure = 0.0
+        self.trades = 0
+        # متوسط سعر الدخول من الصفقات التي لها سعر دخول (رموز موجودة في بيانات السوق)
+        self.priced_quantity = 0.0
+        self.entry_cost = 0.0
+
+    def add(self, trade, sign):
+        quantity = trade["amount_usd"] * sign
+        self.quantity += quantity
+        self.exposure += quantity * trade["leverage"]
+        self.trades += sign
+        if trade.get("entry_price") is not None:
+            self.priced_quantity += quantity
+            self.entry_cost += quantity * trade["entry_price"]
+        if not self.trades:
+            # آخر صفقة أُغلقت: تصفير بدل بقايا أخطاء التقريب
+            self.__init__()
+
+    def average_entry(self):
+        return self.entry_cost / self.priced_quantity if self.priced_quantity > 0 else None
+
+    def to_dict(self):
+        return {
+            "quantity": self.quantity,
+            "exposure": self.exposure,
+            "open_trades": self.trades,
+            "average_entry": self.average_entry(),
+        }
+
+
+class Position:
+    __slots__ = ("symbol", "long", "short")
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.long = _Side()
+        self.short = _Side()
+
+    def side(self, trade_type):
+        return self.long if SIDES[trade_type] == "long" else self.short
+
+    @property
+    def open_trades(self):
+        return self.long.trades + self.short.trades
+
+    @property
+    def net_quantity(self):
+        return self.long.quantity - self.short.quantity
+
+    @property
+    def direction(self):
+        if self.long.trades and self.short.trades:
+            return "hedged"
+        if self.long.trades:
+            return "long"
+        if self.short.trades:
+            return "short"
+        return "flat"
+
+    def to_dict(self):
+        main = self.long if self.net_quantity >= 0 else self.short
+        return {
+            "symbol": self.symbol,
+            "direction": self.direction,
+            "net_quantity": self.net_quantity,
+            "exposure": self.long.exposure + self.short.exposure,
+            "net_exposure": self.long.exposure - self.short.exposure,
+            "average_entry": main.average_entry(),
+            "open_trades": self.open_trades,
+            "long": self.long.to_dict(),
+            "short": self.short.to_dict(),
+        }
+
+
+class PositionIndex:
+    def __init__(self):
+        self._by_user = {}   # user_id → {symbol: Position}
+
+    def clear(self):
+        self._by_user.clear()
+
+    def get(self, user_id, symbol):
+        return self._by_user.get(user_id, {}).get(symbol.upper())
+
+    def for_user(self, user_id):
+        return list(self._by_user.get(user_id, {}).values())
+
+    def has_opposite(self, user_id, symbol, trade_type):
+        """هل لدى المستخدم صفقة مفتوحة على نفس الرمز بالاتجاه المعاكس"""
+        position = self.get(user_id, symbol)
+        if position is None:
+            return False
+        return bool(position.side("sell" if trade_type == "buy" else "buy").trades)
+
+    def on_open(self, user_id, trade):
+        symbol = trade["symbol"].upper()
+        symbols = self._by_user.setdefault(user_id, {})
+        position = symbols.get(symbol)
+        if position is None:
+            position = symbols[symbol] = Position(symbol)
+        position.side(trade["type"]).add(trade, 1)
+
+    def on_close(self, user_id, trade):
+        symbol = trade["symbol"].upper()
+        symbols = self._by_user.get(user_id, {})
+        position = symbols.get(symbol)
+        if position is None:
+            return
+        position.side(trade["type"]).add(trade, -1)
+        if not position.open_trades:
+            del symbols[symbol]
+            if not symbols:
+                del self._by_user[user_id]
+
+    def __len__(self):
+        return sum(len(symbols) for symbols in self._by_user.values())
@@ -0,0 +1,196 @@
+# app/revocation.py
+
+import threading
+import time
+
+from sqlalchemy import inspect, text
+
+from app import db
+
+# نافذة تداخل بين مزامنتين: إلغاء كُتب بوقت أقدم لكن لم يُحفظ (commit) إلا بعد المزامنة السابقة
+SYNC_OVERLAP_SECONDS = 30
+
+
+# =========================
+# جدول التوكنات الملغاة
+# =========================
+class RevokedToken(db.Model):
+    __tablename__ = "revoked_tokens"
+
+    jti = db.Column(db.String(64), primary_key=True)
+    expires_at = db.Column(db.Float, nullable=False, index=True)
+    revoked_at = db.Column(db.Float, nullable=False, default=0.0, index=True)
+
+
+# =========================
+# Bloom Filter
+# =========================
+class BloomFilter:
+    """
+    فلتر احتمالي: إذا قال "غير موجود" فهو مؤكد، لذلك أغلب الطلبات (توكنات غير ملغاة)
+    تنتهي هنا دون الوصول إلى المجموعة الدقيقة.
+    نستخدم موضعين فقط (بدون حلقة) مع 16 بت لكل عنصر: نسبة خطأ ~1.4% وتكلفة فحص ثابتة وصغيرة.
+    """
+
+    def __init__(self, capacity, bits_per_item=16):
+        self.capacity = max(int(capacity), 1)
+        # حجم من قوى العدد 2 حتى يكون اختيار الموضع عملية AND بدل القسمة
+        self.size = 1 << max(int(self.capacity * bits_per_item - 1).bit_length(), 3)
+        self._mask = self.size - 1
+        self._bits = bytearray(self.size >> 3)
+
+    def _positions(self, item):
+        # موضعان من قيمة hash() واحدة (64 بت)
+        h = hash(item)
+        return h & self._mask, (h >> 32) & self._mask
+
+    def add(self, item):
+        bits = self._bits
+        for pos in self._positions(item):
+            bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item):
+        # نفس _positions لكن داخليًا لأن هذا الفحص يعمل مع كل طلب
+        h = hash(item)
+        mask = self._mask
+        bits = self._bits
+        first = h & mask
+        if not (bits[first >> 3] >> (first & 7)) & 1:
+            return False
+        second = (h >> 32) & mask
+        return bool((bits[second >> 3] >> (second & 7)) & 1)
+
+
+# =========================
+# مخزن التوكنات الملغاة
+# =========================
+class RevocationStore:
+    """
+    Bloom Filter في الذاكرة أمام مجموعة دقيقة (jti -> exp)، مع حفظ دائم في قاعدة البيانات
+    حتى لا تضيع الإلغاءات بعد إعادة التشغيل. المدخلات تُحذف بعد انتهاء صلاحية التوكن.
+
+    مع أكثر من عامل (worker) على نفس قاعدة البيانات: خيط في الخلفية يقرأ كل sync_interval
+    ثانية الإلغاءات الجديدة فقط (revoked_at) من الجدول، فتسجيل الخروج في عامل يظهر في البقية
+    خلال sync_interval ثانية على الأكثر دون أي تكلفة إضافية على فحص كل طلب.
+    """
+
+    def __init__(self, capacity=100000, purge_interval=60, sync_interval=5):
+        self.capacity = capacity
+        self.purge_interval = purge_interval
+        self.sync_interval = sync_interval
+        self._revoked = {}
+        self._bloom = BloomFilter(capacity)
+        self._next_purge = 0.0
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+        self._app = None
+        self._sync_thread = None
+
+    def init_app(self, app):
+        self.capacity = app.config.get("REVOCATION_CAPACITY", self.capacity)
+        self.sync_interval = app.config.get("REVOCATION_SYNC_SECONDS", self.sync_interval)
+        self._app = app
+
+    @staticmethod
+    def _ensure_schema():
+        """جداول revoked_tokens القديمة بدون عمود revoked_at (create_all لا يضيف أعمدة)"""
+        columns = {column["name"] for column in inspect(db.engine).get_columns(RevokedToken.__tablename__)}
+        if "revoked_at" not in columns:
+            with db.engine.begin() as connection:
+                connection.execute(text(
+                    "ALTER TABLE revoked_tokens ADD COLUMN revoked_at FLOAT NOT NULL DEFAULT 0"
+                ))
+
+    def load(self, now=None):
+        """تحميل الإلغاءات غير المنتهية من قاعدة البيانات (عند بدء التشغيل)"""
+        now = time.time() if now is None else now
+        self._ensure_schema()
+        db.session.execute(db.delete(RevokedToken).where(RevokedToken.expires_at <= now))
+        db.session.commit()
+        rows = db.session.execute(db.select(RevokedToken.jti, RevokedToken.expires_at)).all()
+        with self._lock:
+            self._revoked = {jti: expires_at for jti, expires_at in rows}
+            self._rebuild()
+            self._next_purge = now + self.purge_interval
+            self._synced_at = now
+        self._start_sync()
+
+    def _start_sync(self):
+        if self._sync_thread is not None or not self.sync_interval or self._app is None:
+            return
+        # قاعدة في الذاكرة لا يشاركها عامل آخر، واتصالها الوحيد مشترك بين الخيوط
+        if db.engine.url.database in (None, "", ":memory:"):
+            return
+        self._sync_thread = threading.Thread(target=self._sync_loop, name="revocation-sync", daemon=True)
+        self._sync_thread.start()
+
+    def _sync_loop(self):
+        while True:
+            time.sleep(self.sync_interval)
+            try:
+                with self._app.app_context():
+                    self.sync()
+                    db.session.remove()
+            except Exception as e:
+                print(f"⚠️ فشل مزامنة التوكنات الملغاة: {e}")
+
+    def sync(self, now=None):
+        """إضافة الإلغاءات التي كتبها عمال آخرون منذ آخر مزامنة"""
+        now = time.time() if now is None else now
+        rows = db.session.execute(
+            db.select(RevokedToken.jti, RevokedToken.expires_at)
+            .where(RevokedToken.revoked_at >= self._synced_at - SYNC_OVERLAP_SECONDS)
+            .where(RevokedToken.expires_at > now)
+        ).all()
+        with self._lock:
+            self._synced_at = now
+            for jti, expires_at in rows:
+                if jti not in self._revoked:
+                    self._revoked[jti] = expires_at
+                    self._bloom.add(jti)
+            if len(self._revoked) > self._bloom.capacity:
+                self._rebuild()
+
+    def _rebuild(self):
+        capacity = max(self.capacity, len(self._revoked) * 2)
+        bloom = BloomFilter(capacity)
+        for jti in self._revoked:
+            bloom.add(jti)
+        self._bloom = bloom
+
+    def is_revoked(self, jti):
+        # المسار الساخن: لا يوجد أي إلغاء، أو الـ Bloom Filter ينفي وجوده
+        if not self._revoked or jti not in self._bloom:
+            return False
+        return jti in self._revoked
+
+    def revoke(self, jti, expires_at, now=None):
+        now = time.time() if now is None else now
+        if expires_at <= now:
+            return
+        db.session.merge(RevokedToken(jti=jti, expires_at=float(expires_at), revoked_at=now))
+        db.session.commit()
+        with self._lock:
+            self._revoked[jti] = expires_at
+            if len(self._revoked) > self._bloom.capacity:
+                self._rebuild()
+            else:
+                self._bloom.add(jti)
+        if now >= self._next_purge:
+            self.purge(now)
+
+    def purge(self, now=None):
+        """حذف التوكنات المنتهية من الذاكرة وقاعدة البيانات وإعادة بناء الفلتر"""
+        now = time.time() if now is None else now
+        db.session.execute(db.delete(RevokedToken).where(RevokedToken.expires_at <= now))
+        db.session.commit()
+        with self._lock:
+            self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+            self._rebuild()
+            self._next_purge = now + self.purge_interval
+
+    def __len__(self):
+        return len(self._revoked)
+
+
+revocation_store = RevocationStore()
@@ -0,0 +1,119 @@
+# app/rolling.py
+
+import threading
+import time
+from collections import deque
+
+# =========================
+# مجاميع متحركة بفترات زمنية (Rolling Window)
+# =========================
+# لكل مفتاح (مستخدم) صف من الفترات [بداية الفترة، المجموع] مع مجموع كلي جاهز.
+# الإضافة والاستعلام O(1): الفترات الأقدم من النافذة تُحذف عند أول وصول بعد انتهائها،
+# دون المرور على سجل العمليات.
+
+
+class _Series:
+    __slots__ = ("buckets", "total")
+
+    def __init__(self):
+        self.buckets = deque()
+        self.total = 0.0
+
+
+class RollingWindow:
+    """
+    window_seconds: طول النافذة (مثلًا 24 ساعة)
+    bucket_seconds: دقة الفترات؛ الفترة التي تتقاطع مع بداية النافذة تُحسب كاملة،
+    فالمجموع قد يشمل حتى bucket_seconds إضافية قبل النافذة (أحوط لحدود السحب)
+    loader(key, since) → [(timestamp, amount)]: تعبئة المفتاح من المصدر الدائم أول مرة
+    """
+
+    def __init__(self, window_seconds, bucket_seconds, loader=None):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.loader = loader
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def configure(self, window_seconds, bucket_seconds):
+        with self._lock:
+            self.window_seconds = window_seconds
+            self.bucket_seconds = bucket_seconds
+            self._series.clear()
+
+    def _start(self, timestamp):
+        return int(timestamp // self.bucket_seconds) * self.bucket_seconds
+
+    def _expire(self, series, now):
+        oldest = self._start(now - self.window_seconds)
+        buckets = series.buckets
+        while buckets and buckets[0][0] < oldest:
+            series.total -= buckets.popleft()[1]
+        if not buckets:
+            series.total = 0.0
+
+    def _add(self, series, amount, timestamp):
+        start = self._start(timestamp)
+        buckets = series.buckets
+        if buckets and buckets[-1][0] == start:
+            buckets[-1][1] += amount
+        elif not buckets or buckets[-1][0] < start:
+            buckets.append([start, amount])
+        else:
+            # وقت أقدم من آخر فترة (نادر: تعبئة أو ساعات غير متزامنة)
+            for bucket in reversed(buckets):
+                if bucket[0] == start:
+                    bucket[1] += amount
+                    break
+                if bucket[0] < start:
+                    buckets.insert(buckets.index(bucket) + 1, [start, amount])
+                    break
+            else:
+                buckets.appendleft([start, amount])
+        series.total += amount
+
+    def _series_for(self, key, now):
+        """يُستدعى تحت القفل؛ المفاتيح الجديدة تُعبأ مسبقًا في preload خارج القفل"""
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series()
+        self._expire(series, now)
+        return series
+
+    def preload(self, key, now=None):
+        """
+        تعبئة المفتاح من loader إن لم يكن محمّلًا. يجب استدعاؤها قبل حفظ العملية في المصدر الدائم،
+        وإلا تُحسب العملية مرتين (مرة من loader ومرة من add).
+        الاستعلام خارج القفل حتى لا يوقف فحوص المستخدمين الآخرين
+        """
+        now = time.time() if now is None else now
+        if self.loader is None or key in self._series:
+            return
+        rows = self.loader(key, self._start(now - self.window_seconds))
+        with self._lock:
+            if key not in self._series:
+                series = self._series[key] = _Series()
+                for timestamp, amount in rows:
+                    self._add(series, amount, timestamp)
+
+    def add(self, key, amount, now=None):
+        now = time.time() if now is None else now
+        self.preload(key, now)
+        with self._lock:
+            self._add(self._series_for(key, now), amount, now)
+
+    def total(self, key, now=None):
+        now = time.time() if now is None else now
+        self.preload(key, now)
+        with self._lock:
+            return self._series_for(key, now).total
+
+    def buckets(self, key, now=None):
+        """[(بداية الفترة، المجموع)] داخل النافذة من الأقدم إلى الأحدث"""
+        now = time.time() if now is None else now
+        self.preload(key, now)
+        with self._lock:
+            return [(start, amount) for start, amount in self._series_for(key, now).buckets]
+
+    def __len__(self):
+        return len(self._series)
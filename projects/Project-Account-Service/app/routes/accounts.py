@@ -1,128 +1,263 @@
 # app/routes/accounts.py
 
-from flask import Blueprint, request, jsonify
-from flask_login import login_required, current_user
-from datetime import datetime
+from flask import Blueprint, request, jsonify, g, current_app
+from app.routes.decorators import login_required, token_required, roles_required
+from datetime import datetime, timezone
+import atexit
+import math
+import os
+
+from app.account_record import AccountRecord, row_values
+from app.event_store import event_store
+from app.idempotency import idempotent, idempotency_cache
+from app.ledger import ledger, user_account, InsufficientFunds
+from app.locks import account_locks
+from app.rolling import RollingWindow
+from app.spill_log import SpillingLog
+from app.trade_archive import trade_archive
+from app.valuation import valuation
 
 # db سيتم استخدامه من main بعد تهيئة التطبيق (Factory Pattern)
 # لذا هنا لا نستورد db مباشرة لتجنب circular import
 
 accounts_bp = Blueprint("accounts", __name__, url_prefix="/accounts")
 
-# قاعدة بيانات مؤقتة للمستخدمين
+# بيانات الحساب في الذاكرة (AccountRecord لكل مستخدم)؛ الأرصدة (real / demo) نسخة من دفتر الأستاذ
+DEMO_OPENING_BALANCE = 10000.0
 user_accounts = {}
-account_logs = {}
-notifications = {}
+# المستخدمون الذين نُسخت أرصدتهم من الدفتر منذ التشغيل (أرصدة اللقطة قد تكون قديمة)
+synced_balances = set()
+
+# كل تعديل على user_accounts (غير الأرصدة) يمر عبر event_store حتى يُستعاد بعد إعادة التشغيل
+def apply_account_event(op, user_id, data):
+    if op == "open":
+        user_accounts[user_id] = AccountRecord.from_state(data)
+    elif op == "update":
+        user_accounts[user_id].update(data)
+    return user_accounts[user_id]
+
+def dump_accounts():
+    return list(zip(user_accounts, map(row_values, user_accounts.values())))
+
+def load_accounts(data):
+    user_accounts.clear()
+    synced_balances.clear()
+    for user_id, account in data or []:
+        account = user_accounts[user_id] = AccountRecord.from_state(account)
+        valuation.set_balance(user_id, account.real)
+
+event_store.register("accounts", apply_account_event, dump_accounts, load_accounts)
+
+# السجلات والإشعارات: آخر الإدخالات في الذاكرة والأقدم على القرص (app/spill_log.py)
+account_logs = SpillingLog("account_logs")
+notifications = SpillingLog("notifications")
+atexit.register(account_logs.flush)
+atexit.register(notifications.flush)
+
+@accounts_bp.record_once
+def configure_log_storage(state):
+    config = state.app.config
+    directory = config.get("LOG_SPILL_DIR") or os.path.join(state.app.instance_path, "logs")
+    for log in (account_logs, notifications):
+        log.configure(
+            directory,
+            capacity=config.get("LOG_RING_CAPACITY"),
+            spill_batch=config.get("LOG_SPILL_BATCH"),
+            segment_entries=config.get("LOG_SEGMENT_ENTRIES")
+        )
+
+# مجاميع السحب المتحركة لكل مستخدم: آخر 24 ساعة لحد السحب، وأيام كاملة للتقارير.
+# تُعبأ من دفتر الأستاذ عند أول استخدام لكل مستخدم (بعد إعادة التشغيل لا يُصفّر الحد)
+def _load_withdrawals(user_id, since):
+    return ledger.user_volume(user_id, "withdraw", since)
+
+withdrawals_24h = RollingWindow(24 * 3600, 600, loader=_load_withdrawals)
+withdrawals_daily = RollingWindow(30 * 86400, 86400, loader=_load_withdrawals)
+
+@accounts_bp.record_once
+def configure_withdrawal_windows(state):
+    config = state.app.config
+    withdrawals_24h.configure(config.get("WITHDRAW_WINDOW_SECONDS", 24 * 3600),
+                              config.get("WITHDRAW_BUCKET_SECONDS", 600))
+    withdrawals_daily.configure(config.get("VOLUME_REPORT_DAYS", 30) * 86400, 86400)
 
 def get_user_account(user_id):
     if user_id not in user_accounts:
-        user_accounts[user_id] = {
-            "real": 0.0,
-            "demo": 10000.0,
-            "account_type": "standard",  # standard | vip
-            "status": "active",          # active | suspended
-            "currency": "USD",
-            "kyc_verified": False,
-            "daily_withdraw_limit": 5000,
-            "created_at": datetime.utcnow().isoformat()
-        }
+        event_store.emit("accounts", "open", user_id, AccountRecord(demo=DEMO_OPENING_BALANCE).to_row())
+        ledger.open_account(user_account(user_id, "demo"), DEMO_OPENING_BALANCE, "system:demo", user_id=user_id)
+        sync_balances(user_id)
+    elif user_id not in synced_balances:
+        sync_balances(user_id)
     return user_accounts[user_id]
 
+def sync_balances(user_id):
+    """نسخ أرصدة المستخدم من دفتر الأستاذ إلى سجل الحساب"""
+    account = user_accounts[user_id]
+    account["real"] = ledger.balance(user_account(user_id, "real"))
+    account["demo"] = ledger.balance(user_account(user_id, "demo"))
+    synced_balances.add(user_id)
+    valuation.set_balance(user_id, account.real)
+    return account
+
+def external_account(account_type):
+    # الإيداع والسحب الحقيقي من/إلى خارج النظام، والديمو من/إلى صندوق الديمو
+    return "system:external" if account_type == "real" else "system:demo"
+
 def log_action(user_id, action, details=""):
-    if user_id not in account_logs:
-        account_logs[user_id] = []
-    account_logs[user_id].append({
+    account_logs.append(user_id, {
         "action": action,
         "details": details,
         "timestamp": datetime.utcnow().isoformat()
     })
 
 def notify(user_id, message):
-    if user_id not in notifications:
-        notifications[user_id] = []
-    notifications[user_id].append({
+    notifications.append(user_id, {
         "message": message,
         "timestamp": datetime.utcnow().isoformat()
     })
 
+def read_log(log, user_id):
+    """?after=<seq> للقراءة من نقطة معينة (تشمل القرص)، وإلا آخر limit إدخال"""
+    limit = min(request.args.get("limit", 100, type=int), 1000)
+    after = request.args.get("after", type=int)
+    if after is None:
+        return log.latest(user_id, limit)
+    return log.read(user_id, after=after, limit=limit)
+
 @accounts_bp.route("/balance", methods=["GET"])
 @login_required
 def account_balance():
-    """عرض الرصيد الحالي للمستخدم"""
-    account = get_user_account(current_user.id)
-    return jsonify(account), 200
+    """عرض الرصيد الحالي للمستخدم مع تقييم الصفقات المفتوحة بسعر السوق"""
+    account = get_user_account(g.user_id)
+    return jsonify({**account.to_dict(), **valuation.account(g.user_id)}), 200
+
+def parse_amount(value):
+    """المبلغ كرقم موجب ومحدود، أو None (نص غير رقمي، inf، nan، صفر أو سالب)"""
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        return None
+    return amount if math.isfinite(amount) and amount > 0 else None
 
 @accounts_bp.route("/deposit", methods=["POST"])
-@login_required
+@token_required
+@idempotent
 def deposit():
     """إيداع مبلغ في الحساب"""
     data = request.get_json()
     account_type = data.get("type")
-    amount = float(data.get("amount", 0))
+    amount = parse_amount(data.get("amount", 0))
 
     if account_type not in ["real", "demo"]:
         return jsonify({"error": "نوع الحساب غير صالح"}), 400
-    if amount <= 0:
-        return jsonify({"error": "المبلغ يجب أن يكون أكبر من صفر"}), 400
+    if amount is None:
+        return jsonify({"error": "المبلغ يجب أن يكون رقمًا أكبر من صفر"}), 400
 
-    account = get_user_account(current_user.id)
-    account[account_type] += amount
+    with account_locks.hold(g.user_id):
+        account = get_user_account(g.user_id)
+        ledger.post("deposit", g.user_id, [
+            (external_account(account_type), -amount),
+            (user_account(g.user_id, account_type), amount),
+        ], memo=f"{amount} to {account_type}")
+        sync_balances(g.user_id)
 
-    log_action(current_user.id, "deposit", f"{amount} to {account_type}")
-    notify(current_user.id, f"تم إيداع {amount}$ في حسابك {account_type}")
+    log_action(g.user_id, "deposit", f"{amount} to {account_type}")
+    notify(g.user_id, f"تم إيداع {amount}$ في حسابك {account_type}")
 
-    return jsonify({"message": "تم الإيداع بنجاح", "balance": account}), 200
+    return jsonify({"message": "تم الإيداع بنجاح", "balance": account.to_dict()}), 200
 
 @accounts_bp.route("/withdraw", methods=["POST"])
-@login_required
+@token_required
+@idempotent
 def withdraw():
     """سحب مبلغ من الحساب"""
     data = request.get_json()
     account_type = data.get("type")
-    amount = float(data.get("amount", 0))
+    amount = parse_amount(data.get("amount", 0))
+    if amount is None:
+        return jsonify({"error": "المبلغ يجب أن يكون رقمًا أكبر من صفر"}), 400
 
-    account = get_user_account(current_user.id)
+    # الفحوص والخصم تحت قفل الحساب حتى لا يتداخل سحبان متزامنان
+    with account_locks.hold(g.user_id):
+        account = get_user_account(g.user_id)
 
-    if not account["kyc_verified"]:
-        return jsonify({"error": "يجب توثيق الحساب (KYC) قبل السحب"}), 403
+        if not account["kyc_verified"]:
+            return jsonify({"error": "يجب توثيق الحساب (KYC) قبل السحب"}), 403
 
-    if amount > account["daily_withdraw_limit"]:
-        return jsonify({"error": "تجاوزت الحد اليومي للسحب"}), 403
+        # الحد على مجموع السحوبات خلال آخر 24 ساعة وليس على الطلب الواحد فقط
+        withdrawals_daily.preload(g.user_id)
+        if withdrawals_24h.total(g.user_id) + amount > account["daily_withdraw_limit"]:
+            return jsonify({"error": "تجاوزت الحد اليومي للسحب"}), 403
 
-    if account_type not in ["real", "demo"]:
-        return jsonify({"error": "نوع الحساب غير صالح"}), 400
-    if amount <= 0 or account[account_type] < amount:
-        return jsonify({"error": "الرصيد غير كافٍ"}), 400
+        if account_type not in ["real", "demo"]:
+            return jsonify({"error": "نوع الحساب غير صالح"}), 400
+        if amount <= 0 or account[account_type] < amount:
+            return jsonify({"error": "الرصيد غير كافٍ"}), 400
 
-    account[account_type] -= amount
+        try:
+            ledger.post("withdraw", g.user_id, [
+                (user_account(g.user_id, account_type), -amount),
+                (external_account(account_type), amount),
+            ], memo=f"{amount} from {account_type}")
+        except InsufficientFunds:
+            return jsonify({"error": "الرصيد غير كافٍ"}), 400
+        sync_balances(g.user_id)
+        withdrawals_24h.add(g.user_id, amount)
+        withdrawals_daily.add(g.user_id, amount)
 
-    log_action(current_user.id, "withdraw", f"{amount} from {account_type}")
-    notify(current_user.id, f"تم سحب {amount}$ من حسابك")
+    log_action(g.user_id, "withdraw", f"{amount} from {account_type}")
+    notify(g.user_id, f"تم سحب {amount}$ من حسابك")
 
-    return jsonify({"message": "تم السحب بنجاح", "balance": account}), 200
+    return jsonify({"message": "تم السحب بنجاح", "balance": account.to_dict()}), 200
 
-@accounts_bp.route("/upgrade", methods=["POST"])
+@accounts_bp.route("/withdrawals", methods=["GET"])
 @login_required
+def withdrawal_volume():
+    """مجموع السحب خلال 24 ساعة، المتبقي من الحد، وحجم السحب لكل يوم"""
+    account = get_user_account(g.user_id)
+    last_24h = withdrawals_24h.total(g.user_id)
+    daily = [
+        {"date": datetime.fromtimestamp(start, timezone.utc).date().isoformat(), "amount": amount}
+        for start, amount in withdrawals_daily.buckets(g.user_id)
+    ]
+    return jsonify({
+        "last_24h": last_24h,
+        "daily_withdraw_limit": account["daily_withdraw_limit"],
+        "remaining": max(account["daily_withdraw_limit"] - last_24h, 0),
+        "daily": daily
+    }), 200
+
+@accounts_bp.route("/upgrade", methods=["POST"])
+@token_required
 def upgrade_account():
     """ترقية الحساب إلى VIP"""
-    account = get_user_account(current_user.id)
-    account["account_type"] = "vip"
-    account["daily_withdraw_limit"] = 20000
+    from app.routes.auth import issue_tokens
+    from app.user_repository import user_repository
+
+    with account_locks.hold(g.user_id):
+        get_user_account(g.user_id)
+        event_store.emit("accounts", "update", g.user_id, {"account_type": "vip", "daily_withdraw_limit": 20000})
+        # المستوى موقّع داخل التوكن: نحفظه للمستخدم ونصدر توكنات جديدة تحمله
+        user = user_repository.set_tier(g.user_id, "vip")
 
-    log_action(current_user.id, "upgrade", "VIP account")
-    notify(current_user.id, "تمت ترقية حسابك إلى VIP")
+    log_action(g.user_id, "upgrade", "VIP account")
+    notify(g.user_id, "تمت ترقية حسابك إلى VIP")
 
-    return jsonify({"message": "تمت الترقية إلى VIP"}), 200
+    response = {"message": "تمت الترقية إلى VIP"}
+    if user is not None:
+        response.update(issue_tokens(user))
+    return jsonify(response), 200
 
 @accounts_bp.route("/verify-kyc", methods=["POST"])
-@login_required
+@token_required
 def verify_kyc():
     """توثيق الحساب"""
-    account = get_user_account(current_user.id)
-    account["kyc_verified"] = True
+    with account_locks.hold(g.user_id):
+        get_user_account(g.user_id)
+        event_store.emit("accounts", "update", g.user_id, {"kyc_verified": True})
 
-    log_action(current_user.id, "kyc", "verified")
-    notify(current_user.id, "تم توثيق حسابك بنجاح")
+    log_action(g.user_id, "kyc", "verified")
+    notify(g.user_id, "تم توثيق حسابك بنجاح")
 
     return jsonify({"message": "KYC Verified"}), 200
 
@@ -130,10 +265,95 @@ def verify_kyc():
 @login_required
 def logs():
     """سجل النشاط"""
-    return jsonify(account_logs.get(current_user.id, [])), 200
+    return jsonify(read_log(account_logs, g.user_id)), 200
+
+# آخر seq قرأه المستخدم؛ غير المقروء = آخر seq - هذه القيمة (بدون عدّ).
+# يمر عبر event_store مثل بيانات الحساب حتى لا تعود كل الإشعارات غير مقروءة بعد إعادة التشغيل
+notification_reads = {}
+
+def apply_read_event(op, user_id, data):
+    # القراءة لا ترجع للخلف: تعليم قديم بعد تعليم أحدث لا يعيد إشعارات كغير مقروءة
+    if data["upto"] > notification_reads.get(user_id, 0):
+        notification_reads[user_id] = data["upto"]
+    return notification_reads.get(user_id, 0)
+
+def dump_reads():
+    return dict(notification_reads)
+
+def load_reads(data):
+    notification_reads.clear()
+    notification_reads.update(data or {})
+
+event_store.register("notification_reads", apply_read_event, dump_reads, load_reads)
+
+# الإشعارات غير المفرّغة تضيع بعد توقف مفاجئ: الترقيم يستمر بعد آخر ما قرأه المستخدم
+# حتى لا تختفي الإشعارات الجديدة خلف مؤشر قراءة أكبر من آخر seq
+notifications.seq_floor = lambda user_id: notification_reads.get(user_id, 0)
+
+def unread_count(user_id):
+    return max(notifications.last_seq(user_id) - notification_reads.get(user_id, 0), 0)
 
 @accounts_bp.route("/notifications", methods=["GET"])
 @login_required
 def get_notifications():
-    """إشعارات المستخدم"""
-    return jsonify(notifications.get(current_user.id, [])), 200
+    """
+    إشعارات المستخدم
+    ?since=<seq>: الإشعارات بعد هذا الرقم فقط؛ بدونه آخر limit إشعار
+    ?wait=<ثوان>: مع since، ينتظر الطلب حتى وصول إشعار جديد أو انتهاء المهلة (long-poll)
+    """
+    limit = min(request.args.get("limit", 100, type=int), 1000)
+    since = request.args.get("since", type=int)
+    wait = min(max(request.args.get("wait", 0, type=float), 0), current_app.config.get("NOTIFICATION_LONG_POLL_MAX", 30))
+
+    if since is None:
+        entries = notifications.latest(g.user_id, limit)
+    else:
+        entries = notifications.read(g.user_id, after=since, limit=limit)
+        if not entries and wait and notifications.wait(g.user_id, since, wait):
+            entries = notifications.read(g.user_id, after=since, limit=limit)
+
+    if entries:
+        next_since = entries[-1]["seq"]
+    else:
+        next_since = since if since is not None else notifications.last_seq(g.user_id)
+
+    return jsonify({
+        "notifications": entries,
+        "next_since": next_since,
+        "unread": unread_count(g.user_id)
+    }), 200
+
+@accounts_bp.route("/notifications/unread", methods=["GET"])
+@login_required
+def get_unread_count():
+    return jsonify({"unread": unread_count(g.user_id)}), 200
+
+@accounts_bp.route("/notifications/read", methods=["POST"])
+@login_required
+def mark_notifications_read():
+    """تعليم الإشعارات كمقروءة حتى upto (افتراضيًا حتى آخر إشعار)"""
+    data = request.get_json(silent=True) or {}
+    last_seq = notifications.last_seq(g.user_id)
+    try:
+        upto = min(int(data.get("upto", last_seq)), last_seq)
+    except (TypeError, ValueError):
+        return jsonify({"error": "upto يجب أن يكون رقمًا"}), 400
+
+    # تحت قفل الحساب: طلبان متزامنان لا يكتبان حدثين بترتيب معكوس
+    with account_locks.hold(g.user_id):
+        if upto > notification_reads.get(g.user_id, 0):
+            event_store.emit("notification_reads", "read", g.user_id, {"upto": upto})
+    return jsonify({"unread": unread_count(g.user_id)}), 200
+
+@accounts_bp.route("/storage", methods=["GET"])
+@login_required
+@roles_required("admin")
+def storage_report():
+    """تقرير استهلاك الذاكرة والقرص للسجلات والإشعارات"""
+    return jsonify({
+        "account_logs": account_logs.memory_report(),
+        "notifications": notifications.memory_report(),
+        "idempotency": idempotency_cache.stats(),
+        "events": event_store.stats(),
+        "trade_archive": trade_archive.stats()
+    }), 200
@@ -1,19 +1,23 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, g
 from werkzeug.security import generate_password_hash, check_password_hash
-from flask_login import login_user, logout_user, login_required
+from flask_login import login_user, logout_user
 import jwt
 import datetime
+import uuid
 
-auth_bp = Blueprint("auth", __name__, url_prefix="/auth")
+from app.revocation import revocation_store
+from app.routes.decorators import login_required, current_role, current_tier
+from app.user_repository import user_repository, DuplicateUsername
 
-# قاعدة بيانات افتراضية للمستخدمين
-users_db = {}
+auth_bp = Blueprint("auth", __name__, url_prefix="/auth")
 
 class User:
-    def __init__(self, id, username, password_hash):
+    def __init__(self, id, username, password_hash, role="user", tier="standard"):
         self.id = id
         self.username = username
         self.password_hash = password_hash
+        self.role = role
+        self.tier = tier
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -37,6 +41,54 @@ class User:
 
 SECRET_KEY = "YOUR_SECRET_KEY_HERE"  # محفوظ كما هو (لن نكسره)
 
+
+# =========================
+# إصدار التوكنات
+# =========================
+def _encode(claims):
+    return jwt.encode(claims, current_app.config.get("SECRET_KEY", SECRET_KEY), algorithm="HS256")
+
+
+def issue_tokens(user):
+    """
+    توكن وصول قصير يحمل الدور والمستوى (لا حاجة لتحميل المستخدم في كل طلب)
+    + توكن تجديد أطول لا يحمل صلاحيات ويُستخدم فقط في /auth/refresh
+    """
+    now = datetime.datetime.utcnow()
+    access_ttl = datetime.timedelta(minutes=current_app.config.get("ACCESS_TOKEN_MINUTES", 15))
+    refresh_ttl = datetime.timedelta(days=current_app.config.get("REFRESH_TOKEN_DAYS", 7))
+
+    access_token = _encode({
+        "user_id": user.get_id(),
+        "role": user.role,
+        "tier": user.tier,
+        "type": "access",
+        "jti": uuid.uuid4().hex,
+        "exp": now + access_ttl
+    })
+    refresh_token = _encode({
+        "user_id": user.get_id(),
+        "type": "refresh",
+        "jti": uuid.uuid4().hex,
+        "exp": now + refresh_ttl
+    })
+    return {
+        "token": access_token,
+        "refresh_token": refresh_token,
+        "expires_in": int(access_ttl.total_seconds())
+    }
+
+
+def decode_refresh_token(token):
+    """claims توكن التجديد أو None إذا كان غير صالح أو ملغى أو ليس توكن تجديد"""
+    try:
+        claims = jwt.decode(token, current_app.config.get("SECRET_KEY", SECRET_KEY), algorithms=["HS256"])
+    except jwt.InvalidTokenError:
+        return None
+    if claims.get("type") != "refresh" or revocation_store.is_revoked(claims.get("jti")):
+        return None
+    return claims
+
 # تسجيل مستخدم جديد
 @auth_bp.route("/register", methods=["POST"])
 def register():
@@ -48,15 +100,16 @@ def register():
         if not username or not password:
             return jsonify({"error": "الاسم وكلمة المرور مطلوبان"}), 400
 
-        if username in users_db:
+        if user_repository.get_by_username(username):
             return jsonify({"error": "المستخدم موجود بالفعل"}), 400
 
-        user_id = len(users_db) + 1
         password_hash = generate_password_hash(password)
-        user = User(user_id, username, password_hash)
-        users_db[username] = user
+        try:
+            user = user_repository.add(username, password_hash)
+        except DuplicateUsername:
+            return jsonify({"error": "المستخدم موجود بالفعل"}), 400
 
-        return jsonify({"message": "تم إنشاء الحساب بنجاح", "user_id": user_id}), 201
+        return jsonify({"message": "تم إنشاء الحساب بنجاح", "user_id": user.id}), 201
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -70,37 +123,63 @@ def login():
         username = data.get("username")
         password = data.get("password")
 
-        user = users_db.get(username)
+        user = user_repository.get_by_username(username)
         if not user or not user.check_password(password):
             return jsonify({"error": "اسم المستخدم أو كلمة المرور غير صحيحة"}), 401
 
         # ✅ تسجيل الدخول عبر Flask-Login
         login_user(user)
 
-        # إنشاء التوكن مع صلاحية 24 ساعة
-        token = jwt.encode(
-            {
-                "user_id": user.get_id(),
-                "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=24)
-            },
-            current_app.config.get("SECRET_KEY", SECRET_KEY),
-            algorithm="HS256"
-        )
-
         return jsonify({
             "message": "تم تسجيل الدخول بنجاح",
             "user_id": user.get_id(),
-            "token": token
+            **issue_tokens(user)
         }), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+# تجديد التوكن: الطلب الوحيد الذي يقرأ المستخدم من المستودع، حتى تنعكس تغييرات الدور
+@auth_bp.route("/refresh", methods=["POST"])
+def refresh():
+    data = request.get_json(silent=True) or {}
+    refresh_token = data.get("refresh_token")
+    if not refresh_token:
+        return jsonify({"error": "توكن التجديد مطلوب"}), 400
+
+    claims = decode_refresh_token(refresh_token)
+    if claims is None:
+        return jsonify({"error": "توكن التجديد غير صالح أو منتهي"}), 401
+
+    # من الجدول وليس من ذاكرة LRU: قد يكون عامل آخر غيّر الدور أو المستوى
+    try:
+        user_repository.forget(int(claims.get("user_id")))
+    except (TypeError, ValueError):
+        pass
+    user = user_repository.get(claims.get("user_id"))
+    if user is None:
+        return jsonify({"error": "المستخدم غير موجود"}), 401
+
+    # تدوير توكن التجديد: القديم لا يُستخدم مرتين
+    revocation_store.revoke(claims["jti"], claims["exp"])
+    return jsonify(issue_tokens(user)), 200
+
+
 # تسجيل الخروج
 @auth_bp.route("/logout", methods=["POST"])
 @login_required
 def logout():
+    # إلغاء التوكن الحالي حتى نهاية صلاحيته
+    jti = g.claims.get("jti")
+    if jti:
+        revocation_store.revoke(jti, g.claims["exp"])
+
+    # إلغاء توكن التجديد أيضًا إن أُرسل، حتى لا يُصدر توكنات جديدة بعد الخروج
+    refresh_token = (request.get_json(silent=True) or {}).get("refresh_token")
+    claims = decode_refresh_token(refresh_token) if refresh_token else None
+    if claims and str(claims.get("user_id")) == g.user_id:
+        revocation_store.revoke(claims["jti"], claims["exp"])
     logout_user()
     return jsonify({"message": "تم تسجيل الخروج بنجاح"}), 200
 
@@ -109,4 +188,9 @@ def logout():
 @auth_bp.route("/me", methods=["GET"])
 @login_required
 def me():
-    return jsonify({"message": "المستخدم مسجّل دخول"}), 200
+    return jsonify({
+        "message": "المستخدم مسجّل دخول",
+        "user_id": g.user_id,
+        "role": current_role(),
+        "tier": current_tier()
+    }), 200
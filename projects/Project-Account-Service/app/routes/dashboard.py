@@ -1,8 +1,6 @@
-from flask import Blueprint, jsonify, request, current_app
-from app.routes.decorators import login_required
-from flask_login import current_user
-import jwt
-import datetime
+from flask import Blueprint, request, jsonify, g
+from datetime import datetime
+from app.routes.decorators import login_required, roles_required
 
 dashboard_bp = Blueprint("dashboard", __name__, url_prefix="/dashboard")
 
@@ -15,37 +13,8 @@ dashboard_data = {
     ]
 }
 
-def jwt_required(func):
-    """
-    Decorator إضافي للتحقق من JWT في Header Authorization
-    يعمل جنبًا إلى جنب مع Flask-Login
-    """
-    from functools import wraps
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        token = None
-        auth_header = request.headers.get("Authorization")
-        if auth_header and auth_header.startswith("Bearer "):
-            token = auth_header.split(" ")[1]
-
-        if not token:
-            return jsonify({"error": "JWT token مفقود"}), 401
-
-        try:
-            data = jwt.decode(token, current_app.config.get("SECRET_KEY"), algorithms=["HS256"])
-            user_id = data.get("user_id")
-            # ✅ هنا يمكن إضافة تحقق إضافي إذا أردنا
-        except jwt.ExpiredSignatureError:
-            return jsonify({"error": "JWT انتهت صلاحيته"}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "JWT غير صالحة"}), 401
-
-        return func(*args, **kwargs)
-    return wrapper
-
 @dashboard_bp.route("/", methods=["GET"])
 @login_required
-@jwt_required
 def dashboard_home():
     try:
         return jsonify({"dashboard": dashboard_data}), 200
@@ -57,7 +26,6 @@ def dashboard_home():
 # =========================
 @dashboard_bp.route("/main-home", methods=["GET"])
 @login_required
-@jwt_required
 def main_home():
     """
     روت للصفحة الرئيسية يمكن توجيه / إليه
@@ -69,3 +37,72 @@ def main_home():
         }), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+# =========================
+# ملخص التداول: الصفقات + تقييم المراكز المفتوحة بسعر السوق
+# =========================
+@dashboard_bp.route("/summary", methods=["GET"])
+@login_required
+def trades_summary():
+    from app.routes.accounts import get_user_account
+    from app.routes.trades import get_user_trades
+    from app.trade_archive import trade_archive
+    from app.valuation import valuation
+
+    account = get_user_account(g.user_id)
+    book = get_user_trades(g.user_id)
+    valued = valuation.account(g.user_id)
+    # الدفتر فيه المفتوحة فقط، والمغلقة مجاميع على أعمدة الأرشيف
+    closed = trade_archive.summary(g.user_id)
+    open_buys = sum(1 for t in book.open.values() if t["type"] == "buy")
+    summary = {
+        "total_trades": len(book) + closed["closed_trades"],
+        "open_trades": len(book.open),
+        "closed_trades": closed["closed_trades"],
+        "buy_trades": open_buys + closed["buy_trades"],
+        "sell_trades": len(book.open) - open_buys + closed["sell_trades"],
+        "profit_loss_total": closed["profit_loss_total"],
+        "win_rate": closed["win_rate"],
+        "balance": account["real"],
+        "unrealized_pnl": valued["unrealized_pnl"],
+        "margin_used": valued["margin_used"],
+        "equity": valued["equity"],
+        "margin_level": valued["margin_level"],
+        "margin_call": valued["margin_call"],
+        "last_update": datetime.utcnow().isoformat()
+    }
+    return jsonify({"summary": summary}), 200
+
+# =========================
+# تحليلات الصفقات المغلقة (من الأرشيف العمودي app/trade_archive.py)
+# =========================
+@dashboard_bp.route("/analytics", methods=["GET"])
+@login_required
+def trades_analytics():
+    """الربح/الخسارة لكل رمز، نسبة الصفقات الرابحة والحجم اليومي لصفقات المستخدم المغلقة"""
+    from app.trade_archive import trade_archive
+
+    return jsonify({
+        "summary": trade_archive.summary(g.user_id),
+        "pnl_by_symbol": trade_archive.pnl_by_symbol(g.user_id),
+        "volume_by_day": trade_archive.volume_by_day(g.user_id),
+    }), 200
+
+@dashboard_bp.route("/analytics/all", methods=["GET"])
+@login_required
+@roles_required("admin")
+def platform_analytics():
+    """نفس التحليلات على كل الحسابات + أكبر الحسابات تداولًا (?top=20)"""
+    from app.trade_archive import trade_archive
+
+    try:
+        top = int(request.args.get("top", 20))
+    except ValueError:
+        return jsonify({"error": "top يجب أن يكون رقمًا"}), 400
+    return jsonify({
+        "summary": trade_archive.summary(),
+        "pnl_by_symbol": trade_archive.pnl_by_symbol(),
+        "volume_by_day": trade_archive.volume_by_day(),
+        "turnover_by_account": trade_archive.turnover_by_account(max(top, 0)),
+        "archive": trade_archive.stats(),
+    }), 200
@@ -1,24 +1,61 @@
 from functools import wraps
-from flask import request, jsonify
-import jwt
+from flask import g, jsonify
+
+# الهوية يتم تحديدها مرة واحدة لكل طلب في app/auth_pipeline.py
+# هنا نكتفي بقراءة النتيجة من flask.g دون إعادة فك التوكن
+
+DEFAULT_ROLE = "user"
+DEFAULT_TIER = "standard"
 
-SECRET_KEY = "YOUR_SECRET_KEY_HERE"  # ضع مفتاح سري قوي هنا
 
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        token = None
-        # الحصول على التوكن من الهيدر Authorization
-        if "Authorization" in request.headers:
-            token_header = request.headers.get("Authorization")
-            if token_header.startswith("Bearer "):
-                token = token_header.split(" ")[1]
-        if not token:
-            return jsonify({"error": "التوكن مفقود"}), 401
-        try:
-            data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            request.user_id = str(data.get("user_id"))
-        except Exception as e:
-            return jsonify({"error": "توكن غير صالح أو منتهي"}), 401
+        if g.get("user_id") is None:
+            return jsonify({"error": g.get("auth_error") or "التوكن مفقود"}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def token_required(f):
+    """
+    مثل login_required لكن بتوكن Bearer فقط: العمليات التي تنقل الأموال أو تغيّر الحساب
+    لا تُقبل بكوكي جلسة Flask-Login (لا حماية CSRF على هذه الـ API)
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if g.get("user_id") is None:
+            return jsonify({"error": g.get("auth_error") or "التوكن مفقود"}), 401
+        if g.get("auth_method") != "jwt":
+            return jsonify({"error": "هذه العملية تتطلب توكن في هيدر Authorization"}), 401
         return f(*args, **kwargs)
     return decorated_function
+
+
+def current_role():
+    return g.get("claims", {}).get("role", DEFAULT_ROLE)
+
+
+def current_tier():
+    return g.get("claims", {}).get("tier", DEFAULT_TIER)
+
+
+# =========================
+# Decorator للتحكم في الوصول حسب نوع المستخدم
+# =========================
+def roles_required(*allowed_roles, tiers=None, on_forbidden=None):
+    """
+    تحقق من أن المستخدم الحالي يمتلك أحد الأدوار المسموح بها (واختياريًا أحد المستويات).
+    الدور والمستوى موقّعان داخل التوكن، فالفحص مقارنة في الذاكرة دون تحميل المستخدم.
+    on_forbidden: دالة بديلة لرد 403 (مثل إعادة التوجيه في صفحات HTML)
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if current_role() not in allowed_roles or (tiers and current_tier() not in tiers):
+                if on_forbidden is not None:
+                    return on_forbidden()
+                return jsonify({"error": "غير مصرح لك بالوصول إلى هذه الصفحة"}), 403
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
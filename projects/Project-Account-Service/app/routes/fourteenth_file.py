@@ -1,9 +1,8 @@
 # app/routes/fourteenth_file.py
 
-from flask import Blueprint, jsonify, request, current_app
-from flask_login import login_required, current_user
+from flask import Blueprint, jsonify, request, current_app, g
+from app.routes.decorators import login_required, roles_required
 from datetime import datetime
-from functools import wraps
 
 fourteenth_file_bp = Blueprint("fourteenth_file", __name__, url_prefix="/fourteenth_file")
 
@@ -17,23 +16,6 @@ def get_notifications(user_id):
         user_notifications[user_id] = []
     return user_notifications[user_id]
 
-# =========================
-# Decorator للتحكم في الوصول حسب نوع المستخدم
-# =========================
-def roles_required(*allowed_roles):
-    """
-    تحقق من أن المستخدم الحالي يمتلك أحد الأدوار المسموح بها
-    """
-    def decorator(f):
-        @wraps(f)
-        def decorated_function(*args, **kwargs):
-            user_role = getattr(current_user, "role", "user")  # افتراضي: user
-            if user_role not in allowed_roles:
-                return jsonify({"error": "غير مصرح لك بالوصول إلى هذه الصفحة"}), 403
-            return f(*args, **kwargs)
-        return decorated_function
-    return decorator
-
 # =========================
 # Routes للإشعارات (موجودة مسبقًا)
 # =========================
@@ -42,7 +24,7 @@ def roles_required(*allowed_roles):
 @roles_required("user", "admin", "vip")
 def list_notifications():
     """عرض جميع الإشعارات للمستخدم"""
-    notifications = get_notifications(getattr(current_user, "id", None))
+    notifications = get_notifications(g.user_id)
     return jsonify({"notifications": notifications, "last_update": datetime.utcnow().isoformat()}), 200
 
 @fourteenth_file_bp.route("/add", methods=["POST"])
@@ -55,7 +37,7 @@ def add_notification():
     if not message:
         return jsonify({"error": "رسالة الإشعار فارغة"}), 400
 
-    notifications = get_notifications(getattr(current_user, "id", None))
+    notifications = get_notifications(g.user_id)
     notifications.append({"message": message, "created_at": datetime.utcnow().isoformat()})
 
     return jsonify({"message": "تمت إضافة الإشعار بنجاح", "notifications": notifications}), 201
@@ -1,9 +1,9 @@
 # app/routes/market.py
 
-from flask import Blueprint, jsonify, request
-from flask_login import login_required, current_user
+from flask import Blueprint, jsonify, request, g
+from app.routes.decorators import login_required, token_required, roles_required
 from datetime import datetime
-from functools import wraps
+import math
 
 market_bp = Blueprint("market", __name__, url_prefix="/market")
 
@@ -30,18 +30,57 @@ market_history = {
 price_alerts = {}
 
 # =========================
-# Decorator للتحكم في الوصول حسب نوع المستخدم
+# مستمعو تغيّر الأسعار (مثل محرك SL/TP في trades.py) بدون استيراد دائري
 # =========================
-def roles_required(*allowed_roles):
-    def decorator(f):
-        @wraps(f)
-        def decorated_function(*args, **kwargs):
-            user_role = getattr(current_user, "role", "user")
-            if user_role not in allowed_roles:
-                return jsonify({"error": "غير مصرح لك بالوصول إلى هذه الصفحة"}), 403
-            return f(*args, **kwargs)
-        return decorated_function
-    return decorator
+price_listeners = []
+
+def on_price_change(listener):
+    """listener(symbol, price) يُستدعى بعد كل تحديث سعر"""
+    price_listeners.append(listener)
+    return listener
+
+# مستمعو دفعة الأسعار (مثل إعادة تقييم كل الصفقات): مرة واحدة بعد الدفعة بآخر الأسعار
+batch_listeners = []
+
+def on_prices_applied(listener):
+    """listener({symbol: price}) يُستدعى مرة واحدة بعد كل دفعة أسعار"""
+    batch_listeners.append(listener)
+    return listener
+
+def apply_ticks(ticks):
+    """
+    تطبيق [(symbol, price)] بالترتيب (من update_market أو من مزود أسعار): مستمعو كل سعر
+    بعد تطبيقه، ثم مستمعو الدفعة مرة واحدة
+    """
+    latest = {}
+    for symbol, price in ticks:
+        info = market_data[symbol]
+        info["change"] = price - info["price"]
+        info["price"] = price
+        info["high"] = max(info["high"], price)
+        info["low"] = min(info["low"], price)
+        info["timestamp"] = datetime.utcnow().isoformat()
+
+        # حفظ السجل التاريخي
+        market_history[symbol].append({
+            "price": price,
+            "timestamp": info["timestamp"]
+        })
+
+        for listener in price_listeners:
+            listener(symbol, price)
+        latest[symbol] = price
+
+    if latest:
+        for listener in batch_listeners:
+            listener(latest)
+
+def apply_tick(symbol, price):
+    apply_ticks([(symbol, price)])
+
+def valid_price(price):
+    """سعر رقمي محدود وأكبر من صفر (الأسعار تُغلق صفقات SL/TP وتحقق أرباحًا في الدفتر)"""
+    return isinstance(price, float) and math.isfinite(price) and price > 0
 
 # =========================
 # Route: عرض البيانات الأساسية للسوق
@@ -59,28 +98,66 @@ def get_market_overview():
 # Route: تحديث البيانات الافتراضية للسوق
 # =========================
 @market_bp.route("/update", methods=["POST"])
-@login_required
-@roles_required("admin", "vip")
+@token_required
+@roles_required("admin")
 def update_market():
-    data = request.get_json() or {}
-    for symbol, info in market_data.items():
-        delta = data.get(symbol, {}).get("change", info["change"])
-        info["price"] += delta
-        info["high"] = max(info["high"], info["price"])
-        info["low"] = min(info["low"], info["price"])
-        info["timestamp"] = datetime.utcnow().isoformat()
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "بيانات السعر غير صالحة"}), 400
 
-        # حفظ السجل التاريخي
-        market_history[symbol].append({
-            "price": info["price"],
-            "timestamp": info["timestamp"]
-        })
+    # التحقق من كل الأسعار قبل تطبيق أي منها
+    ticks = []
+    for symbol, info in market_data.items():
+        update = data.get(symbol, {})
+        if not isinstance(update, dict):
+            return jsonify({"error": f"بيانات السعر غير صالحة: {symbol}"}), 400
+        try:
+            price = info["price"] + float(update.get("change", info["change"]))
+        except (TypeError, ValueError):
+            return jsonify({"error": f"التغيير غير صالح: {symbol}"}), 400
+        if not valid_price(price):
+            return jsonify({"error": f"السعر الناتج غير صالح: {symbol}"}), 400
+        ticks.append((symbol, price))
+
+    apply_ticks(ticks)
 
     return jsonify({
         "message": "تم تحديث بيانات السوق",
         "market": market_data
     }), 200
 
+# =========================
+# Route: أسعار من مزود خارجي (tick feed)
+# =========================
+@market_bp.route("/ticks", methods=["POST"])
+@token_required
+@roles_required("admin")
+def push_ticks():
+    """[{"symbol": "GOLD", "price": 1951.5}, ...] بالترتيب"""
+    ticks = request.get_json() or []
+    if isinstance(ticks, dict):
+        ticks = [ticks]
+
+    # التحقق من كل الأسعار قبل تطبيق أي منها
+    parsed = []
+    for tick in ticks:
+        if not isinstance(tick, dict):
+            return jsonify({"error": "بيانات السعر غير صالحة"}), 400
+        symbol = str(tick.get("symbol", "")).upper()
+        try:
+            price = float(tick["price"])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"error": "السعر غير صالح"}), 400
+        if not valid_price(price):
+            return jsonify({"error": "السعر غير صالح"}), 400
+        if symbol not in market_data:
+            return jsonify({"error": f"الرمز غير موجود: {symbol}"}), 404
+        parsed.append((symbol, price))
+
+    apply_ticks(parsed)
+
+    return jsonify({"message": "تم تحديث الأسعار", "applied": len(parsed)}), 200
+
 # =========================
 # Route: ملخص السوق
 # =========================
@@ -145,7 +222,7 @@ def add_price_alert():
     if not symbol or target_price is None:
         return jsonify({"error": "بيانات غير مكتملة"}), 400
 
-    user_id = current_user.get_id()
+    user_id = g.user_id
     price_alerts.setdefault(user_id, []).append({
         "symbol": symbol,
         "target_price": target_price,
@@ -160,7 +237,7 @@ def add_price_alert():
 @market_bp.route("/alerts", methods=["GET"])
 @login_required
 def list_price_alerts():
-    user_id = current_user.get_id()
+    user_id = g.user_id
     return jsonify({
         "alerts": price_alerts.get(user_id, [])
     }), 200
@@ -1,9 +1,8 @@
 # app/routes/next_file.py
 
-from flask import Blueprint, request, jsonify
-from flask_login import login_required, current_user
+from flask import Blueprint, request, jsonify, g
+from app.routes.decorators import login_required, roles_required
 from datetime import datetime
-from functools import wraps
 
 next_file_bp = Blueprint("next_file", __name__, url_prefix="/next_file")
 
@@ -20,20 +19,6 @@ def get_user_data(user_id):
         }
     return user_data[user_id]
 
-# =========================
-# Decorator للتحكم في الوصول حسب نوع المستخدم
-# =========================
-def roles_required(*allowed_roles):
-    def decorator(f):
-        @wraps(f)
-        def decorated_function(*args, **kwargs):
-            user_role = getattr(current_user, "role", "user")  # افتراضي: user
-            if user_role not in allowed_roles:
-                return jsonify({"error": "غير مصرح لك بالوصول إلى هذه الصفحة"}), 403
-            return f(*args, **kwargs)
-        return decorated_function
-    return decorator
-
 # =========================
 # Route: عرض الملاحظات
 # =========================
@@ -42,7 +27,7 @@ def roles_required(*allowed_roles):
 @roles_required("user", "admin", "vip")
 def get_notes():
     """عرض ملاحظات المستخدم"""
-    data = get_user_data(current_user.id)
+    data = get_user_data(g.user_id)
 
     # دعم التصفية حسب نص البحث
     search_query = request.args.get("search", "").strip()
@@ -68,7 +53,7 @@ def add_note():
     if not note:
         return jsonify({"error": "الملاحظة فارغة"}), 400
 
-    user_notes = get_user_data(current_user.id)
+    user_notes = get_user_data(g.user_id)
     new_note = {
         "note": note,
         "created_at": datetime.utcnow().isoformat()
@@ -91,7 +76,7 @@ def edit_note(note_index):
     if not new_note:
         return jsonify({"error": "الملاحظة الجديدة فارغة"}), 400
 
-    user_notes = get_user_data(current_user.id)
+    user_notes = get_user_data(g.user_id)
     if note_index < 0 or note_index >= len(user_notes["notes"]):
         return jsonify({"error": "الملاحظة غير موجودة"}), 404
 
@@ -109,7 +94,7 @@ def edit_note(note_index):
 @roles_required("user", "admin", "vip")
 def delete_note(note_index):
     """حذف ملاحظة موجودة"""
-    user_notes = get_user_data(current_user.id)
+    user_notes = get_user_data(g.user_id)
     if note_index < 0 or note_index >= len(user_notes["notes"]):
         return jsonify({"error": "الملاحظة غير موجودة"}), 404
 
@@ -126,7 +111,7 @@ def delete_note(note_index):
 @roles_required("user", "admin", "vip")
 def notes_stats():
     """عرض إحصائيات الملاحظات لكل مستخدم"""
-    data = get_user_data(current_user.id)
+    data = get_user_data(g.user_id)
     total_notes = len(data["notes"])
     last_update = data["last_update"]
     latest_note = data["notes"][-1] if data["notes"] else None
@@ -1,9 +1,8 @@
 # app/routes/next_file_2.py
 
-from flask import Blueprint, jsonify, request
-from flask_login import login_required, current_user
+from flask import Blueprint, jsonify, request, g
+from app.routes.decorators import login_required, roles_required
 from datetime import datetime
-from functools import wraps
 
 next_file_2_bp = Blueprint("next_file_2", __name__, url_prefix="/next_file_2")
 
@@ -15,26 +14,12 @@ def get_user_tasks(user_id):
         user_tasks[user_id] = []
     return user_tasks[user_id]
 
-# =========================
-# Decorator للتحكم في الصلاحيات
-# =========================
-def roles_required(*allowed_roles):
-    def decorator(f):
-        @wraps(f)
-        def decorated_function(*args, **kwargs):
-            user_role = getattr(current_user, "role", "user")
-            if user_role not in allowed_roles:
-                return jsonify({"error": "غير مصرح لك"}), 403
-            return f(*args, **kwargs)
-        return decorated_function
-    return decorator
-
 @next_file_2_bp.route("/", methods=["GET"])
 @login_required
 @roles_required("user", "admin", "vip")
 def list_tasks():
     """عرض جميع مهام المستخدم"""
-    tasks = get_user_tasks(current_user.id)
+    tasks = get_user_tasks(g.user_id)
     return jsonify({"tasks": tasks, "last_update": datetime.utcnow().isoformat()}), 200
 
 @next_file_2_bp.route("/add", methods=["POST"])
@@ -49,7 +34,7 @@ def add_task():
     if not task:
         return jsonify({"error": "المهمة فارغة"}), 400
 
-    tasks = get_user_tasks(current_user.id)
+    tasks = get_user_tasks(g.user_id)
     tasks.append({
         "task": task,
         "status": "pending",
@@ -67,7 +52,7 @@ def add_task():
 @roles_required("user", "admin", "vip")
 def edit_task(task_index):
     data = request.get_json()
-    tasks = get_user_tasks(current_user.id)
+    tasks = get_user_tasks(g.user_id)
 
     if task_index < 0 or task_index >= len(tasks):
         return jsonify({"error": "المهمة غير موجودة"}), 404
@@ -88,7 +73,7 @@ def change_status(task_index):
     data = request.get_json()
     status = data.get("status", "pending")
 
-    tasks = get_user_tasks(current_user.id)
+    tasks = get_user_tasks(g.user_id)
     if task_index < 0 or task_index >= len(tasks):
         return jsonify({"error": "المهمة غير موجودة"}), 404
 
@@ -104,7 +89,7 @@ def change_status(task_index):
 @login_required
 @roles_required("user", "admin", "vip")
 def delete_task(task_index):
-    tasks = get_user_tasks(current_user.id)
+    tasks = get_user_tasks(g.user_id)
 
     if task_index < 0 or task_index >= len(tasks):
         return jsonify({"error": "المهمة غير موجودة"}), 404
@@ -119,7 +104,7 @@ def delete_task(task_index):
 @login_required
 @roles_required("user", "admin", "vip")
 def tasks_stats():
-    tasks = get_user_tasks(current_user.id)
+    tasks = get_user_tasks(g.user_id)
 
     stats = {
         "total": len(tasks),
@@ -1,9 +1,8 @@
 # app/routes/previous_file.py
 
-from flask import Blueprint, jsonify, request
-from flask_login import login_required, current_user
+from flask import Blueprint, jsonify, request, g
+from app.routes.decorators import login_required, roles_required
 from datetime import datetime
-from functools import wraps
 
 previous_file_bp = Blueprint("previous_file", __name__, url_prefix="/previous_file")
 
@@ -17,26 +16,12 @@ def get_user_history(user_id):
         user_history[user_id] = []
     return user_history[user_id]
 
-# =========================
-# Decorator للتحكم في الوصول حسب نوع المستخدم
-# =========================
-def roles_required(*allowed_roles):
-    def decorator(f):
-        @wraps(f)
-        def decorated_function(*args, **kwargs):
-            user_role = getattr(current_user, "role", "user")  # افتراضي: user
-            if user_role not in allowed_roles:
-                return jsonify({"error": "غير مصرح لك بالوصول إلى هذه الصفحة"}), 403
-            return f(*args, **kwargs)
-        return decorated_function
-    return decorator
-
 @previous_file_bp.route("/", methods=["GET"])
 @login_required
 @roles_required("user", "admin", "vip")
 def view_history():
     """عرض تاريخ المستخدم"""
-    history = get_user_history(current_user.id)
+    history = get_user_history(g.user_id)
     return jsonify({"history": history, "last_update": datetime.utcnow().isoformat()}), 200
 
 @previous_file_bp.route("/add", methods=["POST"])
@@ -49,7 +34,7 @@ def add_history_item():
     if not action:
         return jsonify({"error": "العنصر فارغ"}), 400
 
-    history = get_user_history(current_user.id)
+    history = get_user_history(g.user_id)
     history.append({
         "action": action,
         "created_at": datetime.utcnow().isoformat()
@@ -67,7 +52,7 @@ def edit_history_item(item_index):
     if not new_action:
         return jsonify({"error": "العنصر الجديد فارغ"}), 400
 
-    history = get_user_history(current_user.id)
+    history = get_user_history(g.user_id)
     if item_index < 0 or item_index >= len(history):
         return jsonify({"error": "العنصر غير موجود"}), 404
 
@@ -81,7 +66,7 @@ def edit_history_item(item_index):
 @roles_required("user", "admin", "vip")
 def delete_history_item(item_index):
     """حذف عنصر موجود في التاريخ"""
-    history = get_user_history(current_user.id)
+    history = get_user_history(g.user_id)
     if item_index < 0 or item_index >= len(history):
         return jsonify({"error": "العنصر غير موجود"}), 404
 
@@ -1,9 +1,8 @@
 # app/routes/previous_file_2.py
 
-from flask import Blueprint, jsonify, request
-from flask_login import login_required, current_user
+from flask import Blueprint, jsonify, request, g
+from app.routes.decorators import login_required, roles_required
 from datetime import datetime
-from functools import wraps
 
 previous_file_2_bp = Blueprint("previous_file_2", __name__, url_prefix="/previous_file_2")
 
@@ -17,20 +16,6 @@ def get_user_logs(user_id):
         user_logs[user_id] = []
     return user_logs[user_id]
 
-# =========================
-# Decorator للتحكم في الوصول حسب دور المستخدم
-# =========================
-def roles_required(*allowed_roles):
-    def decorator(f):
-        @wraps(f)
-        def decorated_function(*args, **kwargs):
-            user_role = getattr(current_user, "role", "user")  # افتراضي: user
-            if user_role not in allowed_roles:
-                return jsonify({"error": "غير مصرح لك بالوصول إلى هذه الصفحة"}), 403
-            return f(*args, **kwargs)
-        return decorated_function
-    return decorator
-
 # =========================
 # Route: عرض جميع السجلات
 # =========================
@@ -39,7 +24,7 @@ def roles_required(*allowed_roles):
 @roles_required("user", "admin", "vip")
 def list_logs():
     """عرض جميع السجلات للمستخدم"""
-    logs = get_user_logs(current_user.id)
+    logs = get_user_logs(g.user_id)
     # يمكن إضافة فرز حسب التاريخ أو غيره مستقبلاً
     return jsonify({"logs": logs, "last_update": datetime.utcnow().isoformat()}), 200
 
@@ -56,7 +41,7 @@ def add_log():
     if not log_entry:
         return jsonify({"error": "السجل فارغ"}), 400
 
-    logs = get_user_logs(current_user.id)
+    logs = get_user_logs(g.user_id)
     logs.append({
         "log": log_entry,
         "created_at": datetime.utcnow().isoformat()
@@ -77,7 +62,7 @@ def edit_log(log_index):
     if not new_log:
         return jsonify({"error": "السجل الجديد فارغ"}), 400
 
-    logs = get_user_logs(current_user.id)
+    logs = get_user_logs(g.user_id)
     if log_index < 0 or log_index >= len(logs):
         return jsonify({"error": "السجل غير موجود"}), 404
 
@@ -94,7 +79,7 @@ def edit_log(log_index):
 @roles_required("user", "admin", "vip")
 def delete_log(log_index):
     """حذف سجل موجود"""
-    logs = get_user_logs(current_user.id)
+    logs = get_user_logs(g.user_id)
     if log_index < 0 or log_index >= len(logs):
         return jsonify({"error": "السجل غير موجود"}), 404
 
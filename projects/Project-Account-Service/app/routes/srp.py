@@ -6,7 +6,7 @@ from app.database.db import db
 from flask_login import login_required, current_user
 from werkzeug.security import generate_password_hash
 from datetime import datetime
-from functools import wraps
+from app.routes.decorators import roles_required as shared_roles_required
 import csv
 import io
 from flask_mail import Mail, Message
@@ -33,18 +33,14 @@ def log_activity(user_id, action):
 # =========================
 # التحقق من الصلاحيات
 # =========================
+def _forbidden_redirect():
+    flash('غير مصرح لك بالوصول إلى هذه الصفحة', 'danger')
+    return redirect(url_for('srp.srp_home'))
+
+
 def roles_required(*allowed_roles):
     """تأكد من أن المستخدم الحالي يمتلك أحد الأدوار المسموح بها"""
-    def decorator(f):
-        @wraps(f)
-        def decorated_function(*args, **kwargs):
-            user_role = getattr(current_user, "role", "user")
-            if user_role not in allowed_roles:
-                flash('غير مصرح لك بالوصول إلى هذه الصفحة', 'danger')
-                return redirect(url_for('srp.srp_home'))
-            return f(*args, **kwargs)
-        return decorated_function
-    return decorator
+    return shared_roles_required(*allowed_roles, on_forbidden=_forbidden_redirect)
 
 # =========================
 # إرسال إشعار بالبريد
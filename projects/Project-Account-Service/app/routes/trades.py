@@ -1,19 +1,38 @@
 # app/routes/trades.py
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g, current_app
 from datetime import datetime
+import math
 
 # 🔹 استخدام نفس نظام الحماية المعتمد في المشروع
-from app.routes.decorators import login_required
+from app.routes.decorators import login_required, token_required
+from app.idempotency import idempotent
 
 trades_bp = Blueprint("trades_bp", __name__, url_prefix="/trades")
 
-# بيانات افتراضية للصفقات
+# دفتر صفقات لكل مستخدم (app/trade_book.py)
 user_trades = {}
 trades_logs = {}
 
 # ربط بالرصيد والحسابات المؤقتة (سيتم ربطها لاحقًا مع SQLAlchemy)
-from app.routes.accounts import get_user_account, log_action, notify
+from app.routes.accounts import get_user_account, sync_balances, log_action, notify
+from app.event_store import event_store
+from app.ledger import ledger, user_account, InsufficientFunds
+from app.locks import account_locks
+from app.positions import PositionIndex
+from app.routes.market import market_data, on_price_change, on_prices_applied
+from app.trade_archive import trade_archive
+from app.trade_book import TradeBook
+from app.triggers import TriggerEngine
+from app.valuation import valuation, trade_pnl
+
+# المراكز المفتوحة لكل (مستخدم، رمز)، ومستويات SL/TP المعلقة لكل رمز؛
+# كلاهما يُحدَّث مع أحداث فتح وإغلاق الصفقات
+positions = PositionIndex()
+triggers = TriggerEngine()
+
+# أقصى رافعة إذا لم تُحدد MAX_LEVERAGE في الإعدادات
+DEFAULT_MAX_LEVERAGE = 100
 
 # أسعار افتراضية للعملات مقابل USD (في الإنتاج تربط بـ API خارجي)
 currency_rates = {
@@ -25,9 +44,101 @@ currency_rates = {
 
 def get_user_trades(user_id):
     if user_id not in user_trades:
-        user_trades[user_id] = []
+        user_trades[user_id] = TradeBook()
     return user_trades[user_id]
 
+# نوايا قيود الدفتر لكل مستخدم {trade_id: ("open" | "close", بيانات الحدث)}: النية تُكتب
+# قبل قيد الدفتر والحدث النهائي بعده، فتوقف مفاجئ بينهما يترك نية يحسمها reconcile_pending_trades
+# حسب الدفتر (القيد بمفتاح فريد لكل صفقة، فلا يُخصم الهامش أو يُضاف الربح مرتين)
+pending_trades = {}
+
+def trade_txn_key(action, user_id, trade_id):
+    return f"trade_{action}:{user_id}:{trade_id}"
+
+def _clear_pending(user_id, trade_id):
+    user_pending = pending_trades.get(user_id)
+    if user_pending and user_pending.pop(trade_id, None) is not None and not user_pending:
+        del pending_trades[user_id]
+
+# فتح وإغلاق الصفقات يمر عبر event_store (app/event_store.py) حتى تُستعاد بعد إعادة التشغيل؛
+# الصفقة المغلقة تخرج من الدفتر إلى الأرشيف العمودي (app/trade_archive.py)
+def apply_trade_event(op, user_id, data):
+    book = get_user_trades(user_id)
+    if op == "open_intent":
+        # الرقم محجوز حتى لو أُلغيت النية
+        book.next_id = max(book.next_id, data["trade_id"] + 1)
+        pending_trades.setdefault(user_id, {})[data["trade_id"]] = ("open", data)
+        return data
+    if op == "close_intent":
+        pending_trades.setdefault(user_id, {})[data["trade_id"]] = ("close", data)
+        return data
+    if op == "cancel":
+        _clear_pending(user_id, data["trade_id"])
+        return None
+    _clear_pending(user_id, data["trade_id"])
+    if op == "open":
+        trade = book.add(data)
+        if trade["status"] == "open":
+            positions.on_open(user_id, trade)
+            triggers.add(user_id, trade)
+            valuation.add(user_id, trade)
+        return trade
+    if op == "update":
+        was_open = data["trade_id"] in book.open
+        trade = book.update(data["trade_id"], data)
+        if was_open and trade["status"] != "open":
+            positions.on_close(user_id, trade)
+            triggers.cancel(user_id, trade["trade_id"])
+            valuation.remove(user_id, trade)
+            trade_archive.append(user_id, book.remove(trade["trade_id"]))
+        return trade
+
+def dump_trades():
+    # نسخ الصفقات: اللقطة تُسلسل خارج القفل والصفقة المفتوحة تتغير عند إغلاقها
+    return [[user_id, {
+        "next_id": book.next_id,
+        "trades": [dict(trade) for trade in book],
+        "pending": [[action, dict(data)] for action, data in pending_trades.get(user_id, {}).values()],
+    }] for user_id, book in user_trades.items()]
+
+def load_trades(data):
+    user_trades.clear()
+    positions.clear()
+    triggers.clear()
+    valuation.clear_trades()
+    pending_trades.clear()
+    valuation.set_prices({symbol: info["price"] for symbol, info in market_data.items()})
+    for user_id, state in data or []:
+        book = user_trades[user_id] = TradeBook.from_state(state)
+        for action, pending in state.get("pending", ()) if isinstance(state, dict) else ():
+            pending_trades.setdefault(user_id, {})[pending["trade_id"]] = (action, pending)
+        # لقطات ما قبل الأرشيف: الصفقات المغلقة فيها تنتقل إليه
+        for trade in list(book.closed.values()):
+            trade_archive.append(user_id, book.remove(trade["trade_id"]))
+        for trade in book.open.values():
+            positions.on_open(user_id, trade)
+            triggers.add(user_id, trade)
+            valuation.add(user_id, trade)
+
+# الأرشيف قبل الصفقات: استعادته تقصّه إلى اللقطة قبل أن يضيف load_trades وإعادة الأحداث إليه
+event_store.register("trade_archive", lambda op, user_id, data: None,
+                     trade_archive.checkpoint_state, trade_archive.restore, trade_archive.write_checkpoint)
+event_store.register("trades", apply_trade_event, dump_trades, load_trades)
+
+def reconcile_pending_trades():
+    """
+    بعد استعادة event_store: نية بلا حدث نهائي (توقف بين النية وقيد الدفتر أو بعده)
+    تُكمل إذا حُفظ قيدها في الدفتر وإلا تُلغى
+    """
+    for user_id, user_pending in list(pending_trades.items()):
+        for trade_id, (action, data) in list(user_pending.items()):
+            if ledger.keyed_entries(trade_txn_key(action, user_id, trade_id)) is None:
+                event_store.emit("trades", "cancel", user_id, {"trade_id": trade_id})
+            elif action == "open":
+                event_store.emit("trades", "open", user_id, data)
+            else:
+                event_store.emit("trades", "update", user_id, data)
+
 def log_trade(user_id, action, trade_id, details=""):
     if user_id not in trades_logs:
         trades_logs[user_id] = []
@@ -41,72 +152,107 @@ def log_trade(user_id, action, trade_id, details=""):
 @trades_bp.route("/", methods=["GET"])
 @login_required
 def list_trades():
-    """عرض جميع الصفقات للمستخدم"""
-    user_id = request.user_id
-    trades = get_user_trades(user_id)
+    """عرض صفقات المستخدم (?status=open | closed للمفتوحة أو المغلقة فقط)"""
+    book = get_user_trades(g.user_id)
+    status = request.args.get("status")
+    if status == "open":
+        trades = list(book.open.values())
+    elif status == "closed":
+        trades = trade_archive.trades(g.user_id)
+    else:
+        trades = sorted(trade_archive.trades(g.user_id) + book.all(), key=lambda t: t["trade_id"])
     return jsonify({"trades": trades, "last_update": datetime.utcnow().isoformat()}), 200
 
 @trades_bp.route("/new", methods=["POST"])
-@login_required
+@token_required
+@idempotent
 def new_trade():
     """فتح صفقة جديدة"""
     data = request.get_json()
-    symbol = data.get("symbol")
-    amount = float(data.get("amount", 0))
+    symbol = str(data.get("symbol") or "").upper()  # نفس مفتاح الأسعار والمراكز ومستويات SL/TP
     trade_type = data.get("type")  # buy or sell
-    leverage = float(data.get("leverage", 1))
     stop_loss = data.get("stop_loss")  # optional
     take_profit = data.get("take_profit")  # optional
     currency = data.get("currency", "USD").upper()  # العملة المطلوبة
 
-    user_id = request.user_id
+    user_id = g.user_id
 
     if currency not in currency_rates:
         return jsonify({"error": "عملة غير مدعومة"}), 400
 
-    if not symbol or amount <= 0 or trade_type not in ["buy", "sell"]:
+    try:
+        amount = float(data.get("amount", 0))
+        leverage = float(data.get("leverage", 1))
+    except (TypeError, ValueError):
         return jsonify({"error": "بيانات الصفقة غير صحيحة"}), 400
 
-    # التحقق من رصيد المستخدم
-    account = get_user_account(user_id)
-    if not account["kyc_verified"]:
-        return jsonify({"error": "يجب توثيق الحساب (KYC) قبل فتح الصفقات"}), 403
+    if not symbol or not math.isfinite(amount) or amount <= 0 or trade_type not in ["buy", "sell"]:
+        return jsonify({"error": "بيانات الصفقة غير صحيحة"}), 400
 
-    # تحويل المبلغ للعملة الافتراضية USD للحساب
-    amount_usd = amount * currency_rates[currency]
-    if amount_usd > account["real"]:
-        return jsonify({"error": "الرصيد غير كافٍ"}), 400
+    max_leverage = current_app.config.get("MAX_LEVERAGE", DEFAULT_MAX_LEVERAGE)
+    if not math.isfinite(leverage) or not 1 <= leverage <= max_leverage:
+        return jsonify({"error": f"الرافعة يجب أن تكون بين 1 و {max_leverage}"}), 400
 
-    # Hedging
-    existing_trades = [
-        t for t in get_user_trades(user_id)
-        if t["symbol"] == symbol and t["status"] == "open"
-    ]
-    if existing_trades and trade_type != existing_trades[-1]["type"] and account["account_type"] != "vip":
-        return jsonify({"error": "الحساب Standard لا يسمح بفتح صفقتين متعاكستين على نفس الرمز"}), 403
+    try:
+        stop_loss = float(stop_loss) if stop_loss is not None else None
+        take_profit = float(take_profit) if take_profit is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "stop_loss و take_profit يجب أن تكون أرقامًا"}), 400
+    if any(level is not None and not math.isfinite(level) for level in (stop_loss, take_profit)):
+        return jsonify({"error": "stop_loss و take_profit يجب أن تكون أرقامًا"}), 400
 
-    account["real"] -= amount_usd
+    # من فحص الرصيد حتى إضافة الصفقة تحت قفل الحساب (لا خصم مزدوج ولا رقم صفقة مكرر)
+    with account_locks.hold(user_id):
+        # التحقق من رصيد المستخدم
+        account = get_user_account(user_id)
+        if not account["kyc_verified"]:
+            return jsonify({"error": "يجب توثيق الحساب (KYC) قبل فتح الصفقات"}), 403
 
-    trade_id = len(get_user_trades(user_id)) + 1
+        # تحويل المبلغ للعملة الافتراضية USD للحساب
+        amount_usd = amount * currency_rates[currency]
+        if amount_usd > account["real"]:
+            return jsonify({"error": "الرصيد غير كافٍ"}), 400
 
-    trade = {
-        "trade_id": trade_id,
-        "symbol": symbol,
-        "amount": amount,
-        "currency": currency,
-        "amount_usd": amount_usd,
-        "type": trade_type,
-        "leverage": leverage,
-        "stop_loss": stop_loss,
-        "take_profit": take_profit,
-        "opened_at": datetime.utcnow().isoformat(),
-        "status": "open",
-        "profit_loss": 0.0,
-        "account_type": account["account_type"]
-    }
-
-    trades = get_user_trades(user_id)
-    trades.append(trade)
+        # Hedging: من فهرس المراكز بدل المرور على صفقات المستخدم
+        if account["account_type"] != "vip" and positions.has_opposite(user_id, symbol, trade_type):
+            return jsonify({"error": "الحساب Standard لا يسمح بفتح صفقتين متعاكستين على نفس الرمز"}), 403
+
+        trade_id = get_user_trades(user_id).allocate_id()
+        quote = market_data.get(symbol)
+
+        trade = {
+            "trade_id": trade_id,
+            "symbol": symbol,
+            "amount": amount,
+            "currency": currency,
+            "amount_usd": amount_usd,
+            "type": trade_type,
+            "leverage": leverage,
+            "entry_price": quote["price"] if quote else None,
+            "stop_loss": stop_loss,
+            "take_profit": take_profit,
+            "opened_at": datetime.utcnow().isoformat(),
+            "status": "open",
+            "profit_loss": 0.0,
+            "account_type": account["account_type"]
+        }
+
+        # الهامش ينتقل من الحساب الحقيقي إلى حساب الصفقات المفتوحة في الدفتر (بين النية والحدث)
+        event_store.emit("trades", "open_intent", user_id, trade)
+        try:
+            ledger.post("trade_open", user_id, [
+                (user_account(user_id, "real"), -amount_usd),
+                ("system:trading", amount_usd),
+            ], memo=f"{trade_type} {symbol} {amount} {currency}", key=trade_txn_key("open", user_id, trade_id))
+        except Exception as exc:
+            # الدفتر يرجع الخطأ بعد ROLLBACK فقط: القيد لم يُحفظ
+            event_store.emit("trades", "cancel", user_id, {"trade_id": trade_id})
+            if isinstance(exc, InsufficientFunds):
+                return jsonify({"error": "الرصيد غير كافٍ"}), 400
+            raise
+        sync_balances(user_id)
+
+        event_store.emit("trades", "open", user_id, trade)
 
     if account["real"] < 100:
         notify(user_id, "⚠️ تنبيه: رصيدك منخفض جدًا بعد فتح الصفقة!")
@@ -116,27 +262,99 @@ def new_trade():
 
     return jsonify({"message": "تم فتح الصفقة بنجاح", "trade": trade}), 201
 
-@trades_bp.route("/close/<int:trade_id>", methods=["POST"])
-@login_required
-def close_trade(trade_id):
-    """إغلاق صفقة مفتوحة"""
-    user_id = request.user_id
-    trades = get_user_trades(user_id)
+CLOSE_REASONS = {
+    "manual": "",
+    "stop_loss": " (وقف الخسارة)",
+    "take_profit": " (جني الأرباح)",
+}
+
+def close_user_trade(user_id, trade_id, reason="manual"):
+    """
+    مسار الإغلاق الوحيد: الإغلاق اليدوي ومستويات SL/TP.
+    ترجع (trade، None) أو (None، (رسالة الخطأ، status))
+    """
+    with account_locks.hold(user_id):
+        book = get_user_trades(user_id)
+        trade = book.get(trade_id)
+        if not trade:
+            # الأرقام لا تُعاد: رقم أصغر من العدّاد لصفقة أُغلقت ونُقلت إلى الأرشيف
+            if 0 < trade_id < book.next_id:
+                return None, ("الصفقة مغلقة بالفعل", 400)
+            return None, ("صفقة غير موجودة", 404)
+        if trade["status"] == "closed":
+            return None, ("الصفقة مغلقة بالفعل", 400)
 
-    trade = next((t for t in trades if t["trade_id"] == trade_id), None)
-    if not trade:
-        return jsonify({"error": "صفقة غير موجودة"}), 404
-    if trade["status"] == "closed":
-        return jsonify({"error": "الصفقة مغلقة بالفعل"}), 400
+        # الربح/الخسارة المحققة بسعر السوق الحالي (0 لرمز بدون سعر)
+        quote = market_data.get(trade["symbol"].upper())
+        profit_loss = trade_pnl(trade, quote["price"] if quote else None)
 
-    trade["profit_loss"] = trade["amount_usd"] * 0.05 * (1 if trade["type"] == "buy" else -1)
-    trade["status"] = "closed"
-    trade["closed_at"] = datetime.utcnow().isoformat()
+        get_user_account(user_id)
+        closed = {
+            "trade_id": trade_id,
+            "profit_loss": profit_loss,
+            "status": "closed",
+            "close_reason": reason,
+            "closed_at": datetime.utcnow().isoformat()
+        }
+        event_store.emit("trades", "close_intent", user_id, closed)
+        try:
+            ledger.post("trade_close", user_id, [
+                ("system:trading", -trade["amount_usd"]),
+                ("system:pnl", -profit_loss),
+                (user_account(user_id, "real"), trade["amount_usd"] + profit_loss),
+            ], memo=f"trade {trade_id} {trade['symbol']}", key=trade_txn_key("close", user_id, trade_id))
+        except Exception:
+            event_store.emit("trades", "cancel", user_id, {"trade_id": trade_id})
+            raise
+        sync_balances(user_id)
 
-    account = get_user_account(user_id)
-    account["real"] += trade["amount_usd"] + trade["profit_loss"]
+        event_store.emit("trades", "update", user_id, closed)
 
-    log_trade(user_id, "close", trade_id, f"Profit/Loss: {trade['profit_loss']}$ ({trade['currency']})")
-    notify(user_id, f"تم إغلاق صفقة {trade['symbol']}، الربح/الخسارة: {trade['profit_loss']}$")
+    log_trade(user_id, "close", trade_id, f"Profit/Loss: {trade['profit_loss']}$ ({trade['currency']}){CLOSE_REASONS[reason]}")
+    notify(user_id, f"تم إغلاق صفقة {trade['symbol']}{CLOSE_REASONS[reason]}، الربح/الخسارة: {trade['profit_loss']}$")
+    return trade, None
 
+@trades_bp.route("/close/<int:trade_id>", methods=["POST"])
+@token_required
+def close_trade(trade_id):
+    """إغلاق صفقة مفتوحة"""
+    trade, error = close_user_trade(g.user_id, trade_id)
+    if error:
+        message, status = error
+        return jsonify({"error": message}), status
     return jsonify({"message": "تم إغلاق الصفقة بنجاح", "trade": trade}), 200
+
+@on_price_change
+def fire_triggers(symbol, price):
+    """كل سعر جديد: إغلاق الصفقات التي تجاوز السعر مستوى SL أو TP لها"""
+    for user_id, trade_id, reason in triggers.on_tick(symbol, price):
+        try:
+            close_user_trade(user_id, trade_id, reason)
+        except Exception as e:
+            # on_tick سحب مستويات الصفقة: إعادتها حتى لا يضيع SL/TP، وباقي صفقات السعر تُغلق
+            trade = get_user_trades(user_id).get(trade_id)
+            if trade is not None and trade["status"] == "open":
+                triggers.add(user_id, trade)
+            print(f"⚠️ فشل إغلاق الصفقة {trade_id} للمستخدم {user_id} ({reason}): {e}")
+
+@on_prices_applied
+def mark_to_market(prices):
+    """بعد SL/TP: إعادة تقييم كل الصفقات المفتوحة مرة واحدة لكل دفعة أسعار وتنبيه الحسابات التي نزلت تحت مستوى نداء الهامش"""
+    for user_id, level in valuation.set_prices(prices):
+        notify(user_id, f"⚠️ نداء هامش: مستوى الهامش {level:.1f}% أقل من {valuation.margin_call_level}%")
+
+@trades_bp.route("/positions", methods=["GET"])
+@login_required
+def list_positions():
+    """المراكز المفتوحة للمستخدم لكل رمز (?symbol= لرمز واحد)"""
+    symbol = request.args.get("symbol")
+    if symbol:
+        position = positions.get(g.user_id, symbol)
+        if position is None:
+            return jsonify({"error": "لا يوجد مركز مفتوح على هذا الرمز"}), 404
+        return jsonify({"position": position.to_dict()}), 200
+    user_positions = [position.to_dict() for position in positions.for_user(g.user_id)]
+    return jsonify({
+        "positions": user_positions,
+        "total_exposure": sum(p["exposure"] for p in user_positions)
+    }), 200
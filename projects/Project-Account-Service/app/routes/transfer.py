@@ -1,64 +1,292 @@
-from flask import Blueprint, request, jsonify
-from app.routes.decorators import login_required
+from flask import Blueprint, request, jsonify, g
+from datetime import datetime, timezone
+import base64
+import binascii
+import json
+import math
+
+from app.routes.decorators import login_required, token_required
+from app.idempotency import idempotent
+from app.ledger import ledger, user_account, InsufficientFunds
+from app.locks import account_locks
+from app.user_repository import user_repository
 
 # إضافة url_prefix للـ Blueprint
 transfer_bp = Blueprint("transfer_bp", __name__, url_prefix="/transfer")
 
-# قاعدة بيانات مؤقتة للاختبارات
-users = {
-    "1": {
-        "balance": 1000.0,
-        "transactions": [
-            {"id": 1, "amount": 100, "type": "credit"},
-            {"id": 2, "amount": 50, "type": "debit"}
-        ]
-    }
-}
+# المحافظ والتحويلات محفوظة في دفتر الأستاذ (app/ledger.py)
+# رصيد افتتاحي لمحفظة الاختبار (يُضاف مرة واحدة فقط)
+OPENING_WALLETS = {"1": 1000.0}
+
+
+@transfer_bp.record_once
+def open_test_wallets(state):
+    for user_id, amount in OPENING_WALLETS.items():
+        ledger.open_account(wallet_account(user_id), amount, "system:external", user_id=user_id)
+
+
+def wallet_account(user_id):
+    return user_account(user_id, "wallet")
+
+
+def wallet_exists(user_id):
+    return ledger.has_account(wallet_account(user_id))
 
 # ============================
 # Route: إرسال التحويل
 # ============================
 @transfer_bp.route("/", methods=["POST"])
-@login_required
+@token_required
+@idempotent
 def send_transfer():
     data = request.json
     user_id = str(data.get("user_id"))
     amount = data.get("amount", 0)
 
     # التحقق أن user_id في التوكن يطابق user_id المرسل
-    if user_id != request.user_id:
+    if user_id != g.user_id:
         return jsonify({"error": "غير مخول"}), 403
 
-    if user_id not in users:
+    if not wallet_exists(user_id):
         return jsonify({"error": "المستخدم غير موجود"}), 400
 
-    if not amount or amount <= 0:
+    if isinstance(amount, bool) or not isinstance(amount, (int, float)) or not math.isfinite(amount) or amount <= 0:
         return jsonify({"message": "جميع الحقول مطلوبة"}), 400
 
-    users[user_id]["balance"] -= amount
-    users[user_id]["transactions"].append({
-        "id": len(users[user_id]["transactions"]) + 1,
-        "amount": amount,
-        "type": "debit"
-    })
+    # to_user_id اختياري: تحويل داخلي إلى محفظة مستخدم آخر، وإلا تحويل إلى خارج النظام
+    to_user_id = data.get("to_user_id")
+    if to_user_id is not None:
+        to_user_id = str(to_user_id)
+        if to_user_id == user_id:
+            return jsonify({"error": "لا يمكن التحويل إلى نفس المحفظة"}), 400
+        if not wallet_exists(to_user_id) and user_repository.get(to_user_id) is None:
+            return jsonify({"error": "المستلم غير موجود"}), 400
+        destination = wallet_account(to_user_id)
+    else:
+        destination = "system:external"
+
+    # قفل الطرفين معًا بترتيب ثابت (لا deadlock بين A→B و B→A)
+    with account_locks.hold(user_id, to_user_id):
+        try:
+            _, balances = ledger.post("transfer", user_id, [
+                (wallet_account(user_id), -amount),
+                (destination, amount),
+            ], memo=f"to {to_user_id or 'external'}")
+        except InsufficientFunds:
+            return jsonify({"error": "الرصيد غير كافٍ"}), 400
+
+    return jsonify({"message": "تم التحويل بنجاح", "balance": balances[wallet_account(user_id)]}), 200
+
+# ============================
+# Route: دفعة تحويلات (رواتب وما شابه)
+# ============================
+# JSON: {"atomic": true, "transfers": [{"to_user_id": 2, "amount": 10}, ...]} أو مصفوفة مباشرة
+# JSONL (application/x-ndjson): تحويل في كل سطر، و ?atomic=false للنتائج لكل عنصر
+TRANSFER_BATCH_MAX = 10000
+
+
+ATOMIC_VALUES = {"true": True, "false": False}
+
+
+def _batch_items():
+    """
+    (atomic, [(رقم السطر/العنصر، dict أو None)]) من جسم JSON أو JSONL.
+    atomic = None إذا لم تكن القيمة true أو false بالضبط (لا نخمّن معنى "0" أو "no")
+    """
+    content_type = request.mimetype or ""
+    atomic = ATOMIC_VALUES.get(request.args.get("atomic", "true").lower())
+    if content_type in ("application/x-ndjson", "application/jsonl", "application/x-jsonlines"):
+        items = []
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(None)
+            if len(items) > TRANSFER_BATCH_MAX:
+                break
+        return atomic, items
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        if "atomic" in data:
+            atomic = data["atomic"] if isinstance(data["atomic"], bool) else None
+        data = data.get("transfers")
+    return atomic, data if isinstance(data, list) else None
+
+
+def _validate_transfer(item, sender):
+    """(المستلم أو None للخارج، المبلغ) أو رسالة الخطأ"""
+    if not isinstance(item, dict):
+        return "عنصر غير صالح"
+    amount = item.get("amount")
+    if isinstance(amount, bool) or not isinstance(amount, (int, float)) or not math.isfinite(amount) or amount <= 0:
+        return "المبلغ يجب أن يكون رقمًا أكبر من صفر"
+    to_user_id = item.get("to_user_id")
+    if to_user_id is not None:
+        to_user_id = str(to_user_id)
+        if to_user_id == sender:
+            return "لا يمكن التحويل إلى نفس المحفظة"
+    return to_user_id, float(amount)
+
 
-    return jsonify({"message": "تم التحويل بنجاح", "balance": users[user_id]["balance"]}), 200
+@transfer_bp.route("/batch", methods=["POST"])
+@token_required
+@idempotent
+def send_transfer_batch():
+    sender = g.user_id
+    if not wallet_exists(sender):
+        return jsonify({"error": "المستخدم غير موجود"}), 400
+
+    atomic, items = _batch_items()
+    if atomic is None:
+        return jsonify({"error": "atomic يجب أن تكون true أو false"}), 400
+    if not items:
+        return jsonify({"error": "قائمة التحويلات مطلوبة"}), 400
+    if len(items) > TRANSFER_BATCH_MAX:
+        return jsonify({"error": f"الحد الأقصى {TRANSFER_BATCH_MAX} تحويل في الدفعة"}), 400
+
+    # التحقق دفعة واحدة: الحقول أولًا، ثم كل المستلمين غير المعروفين باستعلام واحد
+    parsed = [_validate_transfer(item, sender) for item in items]
+    recipients = {p[0] for p in parsed if isinstance(p, tuple) and p[0] is not None}
+    unknown = {r for r in recipients if not wallet_exists(r)}
+    if unknown:
+        unknown -= user_repository.existing_ids(unknown)
+
+    results = [None] * len(items)
+    ledger_items, positions = [], []
+    for index, outcome in enumerate(parsed):
+        if isinstance(outcome, str):
+            results[index] = {"index": index, "status": "invalid", "error": outcome}
+            continue
+        to_user_id, amount = outcome
+        if to_user_id in unknown:
+            results[index] = {"index": index, "status": "invalid", "error": "المستلم غير موجود"}
+            continue
+        destination = wallet_account(to_user_id) if to_user_id is not None else "system:external"
+        ledger_items.append(("transfer", sender, [(wallet_account(sender), -amount), (destination, amount)],
+                             f"batch to {to_user_id or 'external'}"))
+        positions.append(index)
+
+    invalid = [r for r in results if r is not None]
+    if atomic and invalid:
+        return jsonify({"error": "الدفعة تحتوي على عناصر غير صالحة", "results": invalid}), 400
+
+    # كل القيود في commit واحد، تحت أقفال المرسل وكل المستلمين
+    with account_locks.hold(sender, *recipients):
+        try:
+            outcomes = ledger.post_batch(ledger_items, atomic=atomic)
+        except InsufficientFunds as exc:
+            failed = positions[exc.index]
+            return jsonify({
+                "error": "الرصيد غير كافٍ",
+                "results": [{"index": failed, "status": "insufficient_funds", "error": "الرصيد غير كافٍ"}]
+            }), 400
+
+    for index, outcome in zip(positions, outcomes):
+        if isinstance(outcome, InsufficientFunds):
+            results[index] = {"index": index, "status": "insufficient_funds", "error": "الرصيد غير كافٍ"}
+        else:
+            results[index] = {"index": index, "status": "ok", "txn_id": outcome[0]}
+
+    applied = sum(1 for r in results if r["status"] == "ok")
+    return jsonify({
+        "message": "تم تنفيذ الدفعة",
+        "atomic": atomic,
+        "applied": applied,
+        "failed": len(results) - applied,
+        "balance": ledger.balance(wallet_account(sender)),
+        "results": results
+    }), 200
 
 # ============================
 # Route: سجل التحويلات
 # ============================
+# ?limit=50&after=<cursor>&type=credit|debit&min=&max=&from=2024-01-01&to=2024-02-01
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(posting_id):
+    """المؤشر رقم آخر قيد في الصفحة، مغلف حتى لا يعتمد العميل على شكله"""
+    return base64.urlsafe_b64encode(f"p:{posting_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        prefix, posting_id = base64.urlsafe_b64decode(padded).decode().split(":", 1)
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError(cursor)
+    if prefix != "p":
+        raise ValueError(cursor)
+    return int(posting_id)
+
+
+def _optional_float(value):
+    return float(value) if value not in (None, "") else None
+
+
+def _parse_date(value):
+    """تاريخ ISO (بتوقيت UTC إذا لم تُحدد المنطقة) → epoch"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
 @transfer_bp.route("/history", methods=["GET"])
 @login_required
 def transfer_history():
     user_id = request.args.get("user_id")
 
-    if user_id != request.user_id:
+    if user_id != g.user_id:
         return jsonify({"error": "غير مخول"}), 403
 
-    if user_id not in users:
+    if not wallet_exists(user_id):
         return jsonify({"error": "المستخدم غير موجود"}), 400
 
-    return jsonify({"transactions": users[user_id]["transactions"]}), 200
+    try:
+        limit = min(int(request.args.get("limit", HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE)
+        after_id = decode_cursor(request.args["after"]) if request.args.get("after") else None
+        min_amount = _optional_float(request.args.get("min"))
+        max_amount = _optional_float(request.args.get("max"))
+        since = _parse_date(request.args.get("from"))
+        until = _parse_date(request.args.get("to"))
+    except ValueError:
+        return jsonify({"error": "معاملات الاستعلام غير صالحة"}), 400
+    if limit <= 0:
+        return jsonify({"error": "معاملات الاستعلام غير صالحة"}), 400
+
+    direction = request.args.get("type")
+    if direction not in (None, "credit", "debit"):
+        return jsonify({"error": "النوع يجب أن يكون credit أو debit"}), 400
+
+    # نطلب صفًا إضافيًا لمعرفة وجود صفحة تالية دون استعلام COUNT
+    postings = ledger.postings_page(
+        wallet_account(user_id), limit + 1, after_id=after_id, direction=direction,
+        min_amount=min_amount, max_amount=max_amount, since=since, until=until
+    )
+    has_more = len(postings) > limit
+    postings = postings[:limit]
+
+    transactions = [
+        {
+            "id": posting["txn_id"],
+            "amount": abs(posting["amount"]),
+            "type": "credit" if posting["amount"] > 0 else "debit",
+            "created_at": datetime.fromtimestamp(posting["created_at"], timezone.utc).isoformat()
+        }
+        for posting in postings
+    ]
+    return jsonify({
+        "transactions": transactions,
+        "next_cursor": encode_cursor(postings[-1]["id"]) if has_more else None
+    }), 200
 
 # ============================
 # Route: أرصدة المحافظ
@@ -68,10 +296,10 @@ def transfer_history():
 def wallet_balances():
     user_id = request.args.get("user_id")
 
-    if user_id != request.user_id:
+    if user_id != g.user_id:
         return jsonify({"error": "غير مخول"}), 403
 
-    if user_id not in users:
+    if not wallet_exists(user_id):
         return jsonify({"error": "المستخدم غير موجود"}), 400
 
-    return jsonify({"balance": users[user_id]["balance"]}), 200
+    return jsonify({"balance": ledger.balance(wallet_account(user_id))}), 200
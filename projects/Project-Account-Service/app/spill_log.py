@@ -0,0 +1,213 @@
+# app/spill_log.py
+
+import json
+import os
+import sys
+import threading
+from collections import deque
+from urllib.parse import quote
+
+# =========================
+# سجلات محدودة الذاكرة مع تفريغ إلى القرص
+# =========================
+# لكل مستخدم حلقة ثابتة السعة في الذاكرة لآخر الإدخالات (الأكثر طلبًا)، وما هو أقدم
+# يُكتب دفعة واحدة إلى ملفات مقاطع (segments) على القرص ويُقرأ منها عند الطلب فقط.
+# كل إدخال يحمل رقمًا تسلسليًا (seq) لكل مستخدم، ومنه نعرف المقطع الذي يحتويه مباشرة.
+
+
+class _Stream:
+    __slots__ = ("ring", "last_seq", "spilled_upto")
+
+    def __init__(self, spilled_upto=0):
+        self.ring = deque()
+        self.last_seq = spilled_upto
+        self.spilled_upto = spilled_upto
+
+
+class SpillingLog:
+    def __init__(self, name, capacity=200, spill_batch=50, segment_entries=1000, directory=None):
+        self.name = name
+        self.capacity = capacity
+        self.spill_batch = spill_batch
+        self.segment_entries = segment_entries
+        self.directory = directory
+        self._streams = {}
+        self._lock = threading.Lock()
+        # seq_floor(user_id) اختياري: أقل seq يستمر منه الترقيم بعد إعادة التشغيل، لأن الإدخالات
+        # التي لم تُفرّغ تضيع بعد توقف مفاجئ ولا يجب أن تتكرر أرقام رآها العميل
+        self.seq_floor = None
+        # شروط انتظار لكل مستخدم (long-poll) على نفس القفل: [Condition، عدد المنتظرين]
+        self._waiters = {}
+
+    def configure(self, directory, capacity=None, spill_batch=None, segment_entries=None):
+        with self._lock:
+            self.directory = os.path.join(directory, self.name)
+            self.capacity = capacity or self.capacity
+            self.spill_batch = spill_batch or self.spill_batch
+            self.segment_entries = segment_entries or self.segment_entries
+            self._streams.clear()
+
+    # -------------------------
+    # ملفات المقاطع
+    # -------------------------
+    def _user_dir(self, user_id):
+        return os.path.join(self.directory, quote(str(user_id), safe=""))
+
+    def _segment_path(self, user_id, index):
+        return os.path.join(self._user_dir(user_id), f"{index:08d}.jsonl")
+
+    def _recover(self, user_id):
+        """آخر seq محفوظ على القرص (بعد إعادة التشغيل يستمر الترقيم من بعده)؛ الأرقام قد تحتوي فجوات"""
+        if self.directory is None:
+            return 0
+        try:
+            segments = sorted(os.listdir(self._user_dir(user_id)))
+        except FileNotFoundError:
+            return 0
+        if not segments:
+            return 0
+        last_index = int(segments[-1].split(".")[0])
+        last_seq = last_index * self.segment_entries
+        with open(self._segment_path(user_id, last_index), "rb") as f:
+            for line in f:
+                try:
+                    last_seq = max(last_seq, json.loads(line)["seq"])
+                except (ValueError, KeyError):
+                    # سطر ناقص بعد توقف مفاجئ
+                    continue
+        return last_seq
+
+    def _spill(self, user_id, stream, count):
+        """نقل أقدم count إدخال من الحلقة إلى القرص (كتابة واحدة لكل مقطع)"""
+        os.makedirs(self._user_dir(user_id), exist_ok=True)
+        count = min(count, len(stream.ring))
+        by_segment = {}
+        for _ in range(count):
+            entry = stream.ring.popleft()
+            index = (entry["seq"] - 1) // self.segment_entries
+            by_segment.setdefault(index, []).append(json.dumps(entry, ensure_ascii=False))
+        for index, lines in by_segment.items():
+            with open(self._segment_path(user_id, index), "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        stream.spilled_upto += count
+
+    def _read_disk(self, user_id, after, limit, upto):
+        entries = []
+        index = after // self.segment_entries
+        while len(entries) < limit and index * self.segment_entries < upto:
+            try:
+                with open(self._segment_path(user_id, index), encoding="utf-8") as f:
+                    for line in f:
+                        entry = json.loads(line)
+                        if after < entry["seq"] <= upto:
+                            entries.append(entry)
+                            if len(entries) >= limit:
+                                break
+            except FileNotFoundError:
+                pass
+            index += 1
+        return entries
+
+    # -------------------------
+    # الواجهة
+    # -------------------------
+    def _stream(self, user_id):
+        stream = self._streams.get(user_id)
+        if stream is None:
+            last_seq = self._recover(user_id)
+            if self.seq_floor is not None:
+                last_seq = max(last_seq, self.seq_floor(user_id))
+            stream = self._streams[user_id] = _Stream(last_seq)
+        return stream
+
+    def append(self, user_id, entry):
+        with self._lock:
+            stream = self._stream(user_id)
+            stream.last_seq += 1
+            entry["seq"] = stream.last_seq
+            stream.ring.append(entry)
+            # التفريغ على دفعات: الحلقة تتجاوز سعتها بحد أقصى spill_batch قبل الكتابة
+            if self.directory is not None and len(stream.ring) >= self.capacity + self.spill_batch:
+                self._spill(user_id, stream, self.spill_batch)
+            elif self.directory is None and len(stream.ring) > self.capacity:
+                stream.ring.popleft()
+            waiter = self._waiters.get(user_id)
+            if waiter is not None:
+                waiter[0].notify_all()
+        return entry
+
+    def wait(self, user_id, after, timeout):
+        """انتظار إدخال جديد بعد seq = after للمستخدم، أو انتهاء المهلة. ترجع True إذا وصل جديد"""
+        with self._lock:
+            stream = self._stream(user_id)
+            waiter = self._waiters.get(user_id)
+            if waiter is None:
+                waiter = self._waiters[user_id] = [threading.Condition(self._lock), 0]
+            waiter[1] += 1
+            try:
+                return waiter[0].wait_for(lambda: stream.last_seq > after, timeout)
+            finally:
+                waiter[1] -= 1
+                if not waiter[1]:
+                    del self._waiters[user_id]
+
+    def latest(self, user_id, limit=100):
+        """آخر limit إدخال؛ من الذاكرة فقط ما دامت الحلقة تحتويها، وإلا يُكمل من القرص"""
+        return self.read(user_id, after=max(self.last_seq(user_id) - limit, 0), limit=limit)
+
+    def read(self, user_id, after=0, limit=100):
+        """الإدخالات ذات seq > after بالترتيب، من القرص ثم من الذاكرة"""
+        with self._lock:
+            stream = self._stream(user_id)
+            spilled_upto = stream.spilled_upto
+            ring = [entry for entry in stream.ring if entry["seq"] > after]
+        entries = []
+        if after < spilled_upto and self.directory is not None:
+            entries = self._read_disk(user_id, after, limit, spilled_upto)
+        return (entries + ring)[:limit]
+
+    def last_seq(self, user_id):
+        with self._lock:
+            return self._stream(user_id).last_seq
+
+    def flush(self):
+        """كتابة كل ما في الذاكرة إلى القرص (عند الإيقاف) حتى يستمر الترقيم بعد إعادة التشغيل"""
+        if self.directory is None:
+            return
+        with self._lock:
+            for user_id, stream in self._streams.items():
+                if stream.ring:
+                    self._spill(user_id, stream, len(stream.ring))
+
+    def clear(self):
+        with self._lock:
+            self._streams.clear()
+
+    def memory_report(self):
+        """تقدير استهلاك الذاكرة (عينة من الإدخالات) وحجم الملفات على القرص"""
+        with self._lock:
+            streams = list(self._streams.values())
+            in_memory = sum(len(s.ring) for s in streams)
+            spilled = sum(s.spilled_upto for s in streams)
+            sample = [entry for s in streams[:50] for entry in list(s.ring)[-5:]]
+
+        per_entry = 0
+        if sample:
+            per_entry = sum(
+                sys.getsizeof(e) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in e.items())
+                for e in sample
+            ) / len(sample)
+
+        disk_bytes = 0
+        if self.directory is not None and os.path.isdir(self.directory):
+            for root, _, files in os.walk(self.directory):
+                disk_bytes += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+
+        return {
+            "users": len(streams),
+            "entries_in_memory": in_memory,
+            "approx_memory_bytes": int(in_memory * per_entry + len(streams) * sys.getsizeof(deque())),
+            "entries_on_disk": spilled,
+            "disk_bytes": disk_bytes,
+            "ring_capacity": self.capacity,
+        }
@@ -0,0 +1,89 @@
+# app/token_cache.py
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+
+
+# =========================
+# ذاكرة التوكنات التي تم التحقق منها
+# =========================
+class VerifiedTokenCache:
+    """
+    ذاكرة محدودة الحجم للتوكنات التي تم التحقق من توقيعها مسبقًا.
+    المفتاح هو بصمة SHA-256 للتوكن، وكل مدخل ينتهي عند قيمة exp الخاصة بالتوكن نفسه.
+    """
+
+    def __init__(self, max_size=50000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token):
+        if isinstance(token, str):
+            token = token.encode()
+        return hashlib.sha256(token).digest()
+
+    def get(self, token, now=None):
+        key = self.digest(token)
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, payload = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, token, payload):
+        expires_at = payload.get("exp")
+        # لا نحفظ التوكنات التي لا تملك تاريخ انتهاء
+        if not isinstance(expires_at, (int, float)):
+            return
+        key = self.digest(token)
+        with self._lock:
+            self._entries[key] = (expires_at, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+def decode_token(token, secret, cache):
+    """
+    فك التوكن مع المرور أولًا على الذاكرة المؤقتة؛ عند الإخفاق يتم التحقق الكامل (HMAC)
+    ثم حفظ الحمولة. يرفع jwt.InvalidTokenError إذا كان التوكن غير صالح.
+    """
+    payload = cache.get(token)
+    if payload is not None:
+        return payload
+    payload = jwt.decode(token, secret, algorithms=["HS256"])
+    cache.put(token, payload)
+    return payload
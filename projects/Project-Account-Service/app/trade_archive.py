@@ -0,0 +1,392 @@
+# app/trade_archive.py
+
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# =========================
+# أرشيف الصفقات المغلقة (تخزين عمودي)
+# =========================
+# الصفقة عند إغلاقها تخرج من دفتر المستخدم (TradeBook) إلى هنا: مصفوفة مستقلة لكل حقل،
+# والحقول النصية (المستخدم، الرمز، العملة...) أرقام في قاموس لكل عمود.
+# الصفوف الجديدة في ذاكرة مؤقتة، وكل chunk_rows صف تُكتب قطعة ثابتة كملفات .npy
+# (ملف لكل عمود) وتُفتح بعدها بـ mmap: القطع القديمة لا تشغل ذاكرة العملية.
+# الاستعلامات (الربح/الخسارة لكل رمز، نسبة الربح، الحجم اليومي، تداول كل حساب) عمليات
+# على الأعمدة كاملة دون بناء قاموس لكل صفقة. لكل قطعة فهرس مستخدمين (ترتيب الصفوف حسب
+# المستخدم، ملفان .npy بجانب الأعمدة): استعلامات حساب واحد تقرأ صفوفه فقط ببحث ثنائي
+# بدل المرور على كل صفوف الأرشيف.
+#
+# الاستعادة مع سجل الأحداث (app/event_store.py): اللقطة تحفظ عدد الصفوف والقواميس،
+# والذاكرة المؤقتة تُكتب عندها في tail-<عدد الصفوف>/. عند التشغيل يُقص الأرشيف إلى عدد
+# صفوف اللقطة ثم تعيد أحداث الإغلاق بعدها إضافة ما تلاها.
+
+CHUNK_PREFIX = "chunk-"
+TAIL_PREFIX = "tail-"
+# فهرس المستخدمين في القطعة: أرقام الصفوف مرتبة حسب المستخدم (ثابت)، وعمود المستخدم بنفس الترتيب
+USER_ORDER = "_user_order"
+USER_SORTED = "_user_sorted"
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+DAY_US = 86400 * 10**6
+NO_TIME = np.iinfo(np.int64).min
+
+# (الحقل، النوع): cat = نص بقاموس، opt = رقم اختياري (NaN = None)، time = ميكروثانية منذ 1970
+COLUMNS = (
+    ("user_id", "cat"),
+    ("trade_id", "int"),
+    ("symbol", "cat"),
+    ("type", "cat"),
+    ("amount", "float"),
+    ("currency", "cat"),
+    ("amount_usd", "float"),
+    ("leverage", "float"),
+    ("entry_price", "opt"),
+    ("stop_loss", "opt"),
+    ("take_profit", "opt"),
+    ("profit_loss", "float"),
+    ("opened_at", "time"),
+    ("closed_at", "time"),
+    ("close_reason", "cat"),
+    ("account_type", "cat"),
+)
+DTYPES = {"cat": np.int32, "int": np.int64, "float": np.float64, "opt": np.float64, "time": np.int64}
+CATEGORIES = [name for name, kind in COLUMNS if kind == "cat"]
+
+
+def _to_time(value):
+    if not value:
+        return NO_TIME
+    return (datetime.fromisoformat(value) - EPOCH) // MICROSECOND
+
+
+def _from_time(value):
+    if value == NO_TIME:
+        return None
+    return (EPOCH + int(value) * MICROSECOND).isoformat()
+
+
+def _user_index(users):
+    order = np.argsort(users, kind="stable").astype(np.int64)
+    return {USER_ORDER: order, USER_SORTED: np.asarray(users)[order]}
+
+
+def _save(path, array):
+    """np.save مع fsync: اللقطة (المحفوظة بـ fsync) تشير إلى هذه الملفات"""
+    with open(path, "wb") as f:
+        np.save(f, array)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class TradeArchive:
+    def __init__(self, directory=None, chunk_rows=65536):
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+        self._lock = threading.RLock()
+        self._reset()
+
+    def init_app(self, app):
+        """قبل event_store.init_app: الاستعادة تفتح الأرشيف من اللقطة"""
+        self.directory = app.config.get("TRADE_ARCHIVE_DIR") or os.path.join(app.instance_path, "trade_archive")
+        self.chunk_rows = app.config.get("TRADE_ARCHIVE_CHUNK_ROWS", self.chunk_rows)
+
+    def _reset(self):
+        self._chunks = []    # [{عمود: مصفوفة mmap}]
+        self._buffer = {name: [] for name, _ in COLUMNS}
+        self._tail = None    # نسخة NumPy من الذاكرة المؤقتة (تُبنى عند أول استعلام بعد الإضافة)
+        self._values = {name: [] for name in CATEGORIES}
+        self._codes = {name: {} for name in CATEGORIES}
+
+    # -------------------------
+    # الإضافة
+    # -------------------------
+    def _code(self, column, value):
+        codes = self._codes[column]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self._values[column])
+            self._values[column].append(value)
+        return code
+
+    def append(self, user_id, trade):
+        with self._lock:
+            for name, kind in COLUMNS:
+                value = user_id if name == "user_id" else trade.get(name)
+                if kind == "cat":
+                    value = self._code(name, value)
+                elif kind == "opt":
+                    value = np.nan if value is None else float(value)
+                elif kind == "time":
+                    value = _to_time(value)
+                self._buffer[name].append(value)
+            self._tail = None
+            if len(self._buffer["trade_id"]) >= self.chunk_rows:
+                self._flush_chunk()
+
+    def _flush_chunk(self):
+        chunk = {name: np.array(self._buffer[name], dtype=DTYPES[kind]) for name, kind in COLUMNS}
+        chunk.update(_user_index(chunk["user_id"]))
+        for values in self._buffer.values():
+            values.clear()
+        self._tail = None
+        if self.directory is None:
+            # بدون مجلد (القياسات): القطعة تبقى في الذاكرة
+            self._chunks.append(chunk)
+            return
+        path = os.path.join(self.directory, f"{CHUNK_PREFIX}{len(self._chunks):06d}")
+        self._write_arrays(path, chunk)
+        self._chunks.append(self._open_chunk(path))
+
+    def _write_arrays(self, path, arrays):
+        os.makedirs(path, exist_ok=True)
+        for name, array in arrays.items():
+            _save(os.path.join(path, f"{name}.npy"), array)
+        _fsync_dir(path)
+        _fsync_dir(self.directory)
+
+    @staticmethod
+    def _open_chunk(path, indexed=True):
+        chunk = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name, _ in COLUMNS}
+        if indexed:
+            try:
+                for name in (USER_ORDER, USER_SORTED):
+                    chunk[name] = np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            except FileNotFoundError:
+                # قطعة من قبل الفهرس: يُبنى ويُحفظ مرة واحدة
+                index = _user_index(chunk["user_id"])
+                for name, array in index.items():
+                    _save(os.path.join(path, f"{name}.npy"), array)
+                chunk.update(index)
+        return chunk
+
+    def __len__(self):
+        return len(self._chunks) * self.chunk_rows + len(self._buffer["trade_id"])
+
+    # -------------------------
+    # اللقطات والاستعادة (stream في event_store)
+    # -------------------------
+    def checkpoint(self):
+        """كتابة الذاكرة المؤقتة إلى tail-<rows>/ وإرجاع ما تحتاجه restore() في اللقطة"""
+        return self.write_checkpoint(self.checkpoint_state())
+
+    def checkpoint_state(self):
+        """نسخة من الذاكرة المؤقتة والقواميس (تحت قفل event_store)؛ الكتابة في write_checkpoint"""
+        with self._lock:
+            tail = None
+            if self._buffer["trade_id"]:
+                tail = {name: np.array(self._buffer[name], dtype=DTYPES[kind]) for name, kind in COLUMNS}
+            return {
+                "rows": len(self),
+                "chunk_rows": self.chunk_rows,
+                "values": {name: list(values) for name, values in self._values.items()},
+                "tail": tail,
+            }
+
+    def write_checkpoint(self, state):
+        """كتابة الذيل من checkpoint_state() (بدون قفل الأرشيف) وإرجاع بيانات اللقطة"""
+        rows, tail = state["rows"], state["tail"]
+        if self.directory is not None and tail is not None:
+            self._write_arrays(os.path.join(self.directory, f"{TAIL_PREFIX}{rows:012d}"), tail)
+            # الذيل السابق يبقى حتى تُستبدل اللقطة التي تشير إليه
+            for old in self._listdir(TAIL_PREFIX)[:-2]:
+                shutil.rmtree(os.path.join(self.directory, old), ignore_errors=True)
+        return {"rows": rows, "chunk_rows": state["chunk_rows"], "values": state["values"]}
+
+    def _listdir(self, prefix):
+        if self.directory is None or not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory) if name.startswith(prefix))
+
+    def restore(self, data):
+        """فتح الأرشيف كما كان عند اللقطة (None = أرشيف فارغ)؛ ما بعدها يُعاد من الأحداث"""
+        with self._lock:
+            self._reset()
+            if self.directory is not None:
+                os.makedirs(self.directory, exist_ok=True)
+            rows = 0
+            if data:
+                rows = data["rows"]
+                self.chunk_rows = data["chunk_rows"]
+                for name in CATEGORIES:
+                    self._values[name] = list(data["values"][name])
+                    self._codes[name] = {value: code for code, value in enumerate(self._values[name])}
+
+            full, tail_rows = divmod(rows, self.chunk_rows)
+            keep_chunks = {f"{CHUNK_PREFIX}{n:06d}" for n in range(full)}
+            keep_tail = f"{TAIL_PREFIX}{rows:012d}" if tail_rows else None
+            for name in self._listdir(CHUNK_PREFIX) + self._listdir(TAIL_PREFIX):
+                if name not in keep_chunks and name != keep_tail:
+                    shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+            for n in range(full):
+                self._chunks.append(self._open_chunk(os.path.join(self.directory, f"{CHUNK_PREFIX}{n:06d}")))
+            if keep_tail:
+                tail = self._open_chunk(os.path.join(self.directory, keep_tail), indexed=False)
+                for name, _ in COLUMNS:
+                    self._buffer[name] = tail[name][:tail_rows].tolist()
+
+    # -------------------------
+    # الاستعلامات
+    # -------------------------
+    def _segments(self):
+        """القطع (mmap) ثم الذاكرة المؤقتة كمصفوفات"""
+        if self._tail is None:
+            self._tail = {name: np.array(self._buffer[name], dtype=DTYPES[kind]) for name, kind in COLUMNS}
+        return self._chunks + [self._tail]
+
+    def _scan(self, user_id=None):
+        """
+        (segment، أرقام صفوف المستخدم بالترتيب أو None للكل) لكل قطعة فيها صفوف؛
+        لا شيء إذا لم يُؤرشف للمستخدم أي صفقة
+        """
+        if user_id is None:
+            return [(segment, None) for segment in self._segments()]
+        code = self._codes["user_id"].get(user_id)
+        if code is None:
+            return []
+        # نفس نوع العمود: searchsorted بقيمة من نوع آخر يحوّل العمود كله في كل استدعاء
+        code = DTYPES["cat"](code)
+        scanned = []
+        for segment in self._segments():
+            if USER_ORDER in segment:
+                users = segment[USER_SORTED]
+                rows = segment[USER_ORDER][np.searchsorted(users, code):np.searchsorted(users, code, "right")]
+            else:
+                # الذاكرة المؤقتة (أقل من chunk_rows صف)
+                rows = np.flatnonzero(segment["user_id"] == code)
+            if len(rows):
+                scanned.append((segment, rows))
+        return scanned
+
+    @staticmethod
+    def _column(segment, rows, name):
+        column = segment[name]
+        return column if rows is None else column[rows]
+
+    def _type_code(self, value):
+        return self._codes["type"].get(value, -1)
+
+    def summary(self, user_id=None):
+        with self._lock:
+            buy, sell = self._type_code("buy"), self._type_code("sell")
+            closed = buys = sells = wins = 0
+            profit_loss = 0.0
+            for segment, rows in self._scan(user_id):
+                types = self._column(segment, rows, "type")
+                pnl = self._column(segment, rows, "profit_loss")
+                closed += len(types)
+                buys += int(np.count_nonzero(types == buy))
+                sells += int(np.count_nonzero(types == sell))
+                wins += int(np.count_nonzero(pnl > 0))
+                profit_loss += float(pnl.sum())
+            return {
+                "closed_trades": closed,
+                "buy_trades": buys,
+                "sell_trades": sells,
+                "winning_trades": wins,
+                "win_rate": wins / closed if closed else None,
+                "profit_loss_total": profit_loss,
+            }
+
+    def _group_sum(self, user_id, key, weights):
+        """مجموع weights(segment، rows) لكل قيمة في عمود key؛ ترجع (المجاميع، العدد) بطول القاموس"""
+        size = len(self._values[key])
+        totals, counts = np.zeros(size), np.zeros(size, dtype=np.int64)
+        for segment, rows in self._scan(user_id):
+            codes = self._column(segment, rows, key)
+            totals += np.bincount(codes, weights=weights(segment, rows), minlength=size)
+            counts += np.bincount(codes, minlength=size)
+        return totals, counts
+
+    def _notional(self, segment, rows):
+        return self._column(segment, rows, "amount_usd") * self._column(segment, rows, "leverage")
+
+    def pnl_by_symbol(self, user_id=None):
+        with self._lock:
+            totals, counts = self._group_sum(
+                user_id, "symbol", lambda segment, rows: self._column(segment, rows, "profit_loss"))
+            symbols = self._values["symbol"]
+            return {symbols[i]: {"profit_loss": float(totals[i]), "trades": int(counts[i])}
+                    for i in np.flatnonzero(counts)}
+
+    def volume_by_day(self, user_id=None):
+        """الحجم الاسمي (المبلغ × الرافعة) للصفقات المغلقة في كل يوم (UTC) حسب تاريخ الإغلاق"""
+        with self._lock:
+            days, volumes = [], []
+            for segment, rows in self._scan(user_id):
+                closed_at = self._column(segment, rows, "closed_at")
+                valid = closed_at != NO_TIME
+                days.append(closed_at[valid] // DAY_US)
+                volumes.append(self._notional(segment, rows)[valid])
+            if not days:
+                return {}
+            unique, inverse = np.unique(np.concatenate(days), return_inverse=True)
+            totals = np.bincount(inverse, weights=np.concatenate(volumes), minlength=len(unique))
+            return {(EPOCH + timedelta(days=int(day))).date().isoformat(): float(total)
+                    for day, total in zip(unique, totals)}
+
+    def turnover_by_account(self, top=None):
+        """الحجم الاسمي وعدد الصفقات المغلقة لكل حساب، الأكبر أولًا"""
+        with self._lock:
+            totals, counts = self._group_sum(None, "user_id", self._notional)
+            order = np.argsort(-totals, kind="stable")
+            order = order[counts[order] > 0][:top]
+            users = self._values["user_id"]
+            return [{"user_id": users[i], "turnover": float(totals[i]), "trades": int(counts[i])}
+                    for i in order]
+
+    def trades(self, user_id, limit=None):
+        """الصفقات المغلقة للمستخدم كقواميس (الأحدث آخرًا)؛ limit = آخر limit صفقة فقط"""
+        with self._lock:
+            scanned = self._scan(user_id)
+            if not scanned:
+                return []
+            columns = {name: np.concatenate([self._column(segment, rows, name) for segment, rows in scanned])
+                       for name, _ in COLUMNS}
+            if limit is not None:
+                columns = {name: column[len(column) - min(limit, len(column)):] for name, column in columns.items()}
+            result = []
+            for n in range(len(columns["trade_id"])):
+                trade = {}
+                for name, kind in COLUMNS:
+                    if name == "user_id":
+                        continue
+                    value = columns[name][n]
+                    if kind == "cat":
+                        value = self._values[name][value]
+                    elif kind == "int":
+                        value = int(value)
+                    elif kind == "opt":
+                        value = None if np.isnan(value) else float(value)
+                    elif kind == "time":
+                        value = _from_time(value)
+                    else:
+                        value = float(value)
+                    trade[name] = value
+                trade["status"] = "closed"
+                result.append(trade)
+            return result
+
+    def stats(self):
+        return {
+            "archived_trades": len(self),
+            "chunks": len(self._chunks),
+            "buffered": len(self._buffer["trade_id"]),
+            "chunk_rows": self.chunk_rows,
+            "symbols": len(self._values["symbol"]),
+            "accounts": len(self._values["user_id"]),
+        }
+
+
+trade_archive = TradeArchive()
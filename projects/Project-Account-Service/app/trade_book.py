@@ -0,0 +1,79 @@
+# app/trade_book.py
+
+# =========================
+# دفتر صفقات المستخدم (TradeBook)
+# =========================
+# بدل قائمة واحدة لكل مستخدم: فهرس trade_id → صفقة، ومجموعتان منفصلتان للمفتوحة والمغلقة.
+# البحث والإغلاق وعرض المفتوحة لا تمر على تاريخ الصفقات كله، وأرقام الصفقات من عدّاد
+# لا يرجع للخلف (لا تتكرر حتى لو أُرشفت صفقات قديمة أو حُذفت).
+
+
+class TradeBook:
+    __slots__ = ("trades", "open", "closed", "next_id")
+
+    def __init__(self, next_id=1):
+        self.trades = {}   # كل الصفقات بترتيب الفتح (= ترتيب trade_id)
+        self.open = {}
+        self.closed = {}
+        self.next_id = next_id
+
+    def allocate_id(self):
+        trade_id = self.next_id
+        self.next_id += 1
+        return trade_id
+
+    def add(self, trade):
+        trade_id = trade["trade_id"]
+        self.trades[trade_id] = trade
+        if trade["status"] == "open":
+            self.open[trade_id] = trade
+        else:
+            self.closed[trade_id] = trade
+        # عند الاستعادة من سجل الأحداث يتقدم العدّاد بعد كل رقم مستخدم
+        if trade_id >= self.next_id:
+            self.next_id = trade_id + 1
+        return trade
+
+    def get(self, trade_id):
+        return self.trades.get(trade_id)
+
+    def update(self, trade_id, fields):
+        trade = self.trades[trade_id]
+        was_open = trade["status"] == "open"
+        trade.update(fields)
+        if was_open and trade["status"] != "open":
+            del self.open[trade_id]
+            self.closed[trade_id] = trade
+        return trade
+
+    def remove(self, trade_id):
+        """إخراج صفقة من الدفتر (أرشفة)؛ رقمها لا يُعاد استخدامه"""
+        trade = self.trades.pop(trade_id)
+        self.open.pop(trade_id, None)
+        self.closed.pop(trade_id, None)
+        return trade
+
+    def all(self):
+        return list(self.trades.values())
+
+    def __iter__(self):
+        return iter(self.trades.values())
+
+    def __len__(self):
+        return len(self.trades)
+
+    # -------------------------
+    # الحفظ (سجل الأحداث واللقطات)
+    # -------------------------
+    def to_state(self):
+        return {"next_id": self.next_id, "trades": self.all()}
+
+    @classmethod
+    def from_state(cls, data):
+        """من to_state() أو من قائمة الصفقات القديمة"""
+        if isinstance(data, list):
+            data = {"next_id": 1, "trades": data}
+        book = cls(data["next_id"])
+        for trade in data["trades"]:
+            book.add(trade)
+        return book
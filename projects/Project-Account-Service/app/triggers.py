@@ -0,0 +1,121 @@
+# app/triggers.py
+
+import heapq
+import threading
+
+# =========================
+# محرك أوامر وقف الخسارة وجني الأرباح (SL / TP)
+# =========================
+# لكل رمز كومتان (heap) مرتبتان بالسعر:
+#   up:   مستويات تُفعَّل عندما يصل السعر إليها أو أعلى (TP للشراء، SL للبيع) — أصغر مستوى في القمة
+#   down: مستويات تُفعَّل عندما ينزل السعر إليها أو أقل (SL للشراء، TP للبيع) — أكبر مستوى في القمة
+# مع كل سعر جديد نسحب من القمة ما تجاوزه السعر فقط: O(k log n) لـ k مستوى مُفعَّل بدل المرور
+# على كل الصفقات المفتوحة. الصفقات المغلقة يدويًا تُلغى بعلامة وتُحذف من الكومة عند الوصول إليها.
+
+STOP_LOSS = "stop_loss"
+TAKE_PROFIT = "take_profit"
+# إعادة بناء الكومات عندما تتجاوز المدخلات الملغاة هذا العدد ونصف الإجمالي
+COMPACT_MIN_DEAD = 1024
+
+
+class _SymbolTriggers:
+    __slots__ = ("up", "down")
+
+    def __init__(self):
+        self.up = []
+        self.down = []
+
+
+class TriggerEngine:
+    def __init__(self):
+        self._symbols = {}
+        self._active = {}     # (user_id, trade_id) → عدد مدخلاته في الكومات
+        self._entries = 0
+        self._dead = 0
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._symbols.clear()
+            self._active.clear()
+            self._entries = self._dead = 0
+
+    @staticmethod
+    def _levels(trade):
+        """[(الكومة، المستوى، السبب)] حسب اتجاه الصفقة"""
+        levels = []
+        buy = trade["type"] == "buy"
+        if trade.get("stop_loss") is not None:
+            levels.append(("down" if buy else "up", float(trade["stop_loss"]), STOP_LOSS))
+        if trade.get("take_profit") is not None:
+            levels.append(("up" if buy else "down", float(trade["take_profit"]), TAKE_PROFIT))
+        return levels
+
+    def add(self, user_id, trade):
+        levels = self._levels(trade)
+        if not levels:
+            return
+        key = (user_id, trade["trade_id"])
+        with self._lock:
+            book = self._symbols.get(trade["symbol"].upper())
+            if book is None:
+                book = self._symbols[trade["symbol"].upper()] = _SymbolTriggers()
+            for heap_name, level, reason in levels:
+                if heap_name == "up":
+                    heapq.heappush(book.up, (level, user_id, trade["trade_id"], reason))
+                else:
+                    heapq.heappush(book.down, (-level, user_id, trade["trade_id"], reason))
+            self._active[key] = self._active.get(key, 0) + len(levels)
+            self._entries += len(levels)
+
+    def cancel(self, user_id, trade_id):
+        with self._lock:
+            self._cancel((user_id, trade_id))
+
+    def _cancel(self, key):
+        count = self._active.pop(key, 0)
+        self._dead += count
+        if self._dead >= COMPACT_MIN_DEAD and self._dead * 2 > self._entries:
+            self._compact()
+
+    def _compact(self):
+        for book in self._symbols.values():
+            book.up = [e for e in book.up if (e[1], e[2]) in self._active]
+            book.down = [e for e in book.down if (e[1], e[2]) in self._active]
+            heapq.heapify(book.up)
+            heapq.heapify(book.down)
+        self._entries -= self._dead
+        self._dead = 0
+
+    def on_tick(self, symbol, price):
+        """سحب المستويات التي تجاوزها السعر؛ ترجع [(user_id، trade_id، السبب)] — كل صفقة مرة واحدة"""
+        fired = []
+        with self._lock:
+            book = self._symbols.get(symbol.upper())
+            if book is None:
+                return fired
+            for heap, crossed in ((book.up, lambda e: e[0] <= price), (book.down, lambda e: -e[0] >= price)):
+                while heap and crossed(heap[0]):
+                    _, user_id, trade_id, reason = heapq.heappop(heap)
+                    self._entries -= 1
+                    key = (user_id, trade_id)
+                    if key not in self._active:
+                        # مدخل لصفقة مغلقة أو مُفعَّلة بالفعل
+                        self._dead -= 1
+                        continue
+                    # المستوى الآخر لنفس الصفقة (SL أو TP) يصبح ملغى
+                    self._active[key] -= 1
+                    self._dead += self._active.pop(key)
+                    fired.append((user_id, trade_id, reason))
+        return fired
+
+    def stats(self):
+        return {
+            "symbols": len(self._symbols),
+            "trades": len(self._active),
+            "entries": self._entries,
+            "dead_entries": self._dead,
+        }
+
+    def __len__(self):
+        return len(self._active)
@@ -0,0 +1,160 @@
+# app/user_repository.py
+
+import threading
+from collections import OrderedDict
+
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+
+
+# =========================
+# جدول المستخدمين
+# =========================
+class UserRecord(db.Model):
+    __tablename__ = "auth_users"
+
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(150), unique=True, nullable=False, index=True)
+    password_hash = db.Column(db.String(255), nullable=False)
+    # الدور والمستوى يُنسخان إلى claims التوكن عند تسجيل الدخول
+    role = db.Column(db.String(20), nullable=False, default="user")
+    tier = db.Column(db.String(20), nullable=False, default="standard")
+
+
+class DuplicateUsername(Exception):
+    """اسم المستخدم مسجّل مسبقًا"""
+
+
+# =========================
+# مستودع المستخدمين مع LRU
+# =========================
+class UserRepository:
+    """
+    مستودع المستخدمين: البحث بالمفتاح الأساسي أو باسم المستخدم عبر فهارس قاعدة البيانات،
+    مع ذاكرة LRU محدودة لكائنات User الجاهزة حتى لا يُستعلم عن نفس المستخدم في كل طلب
+    """
+
+    def __init__(self, cache_size=10000):
+        self.cache_size = cache_size
+        self._by_id = OrderedDict()
+        self._id_by_username = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.cache_size = app.config.get("USER_CACHE_SIZE", self.cache_size)
+        self.clear()
+
+    # -------------------------
+    # الذاكرة المؤقتة
+    # -------------------------
+    def _cached(self, user_id):
+        with self._lock:
+            user = self._by_id.get(user_id)
+            if user is not None:
+                self._by_id.move_to_end(user_id)
+            return user
+
+    def _remember(self, user):
+        with self._lock:
+            self._by_id[user.id] = user
+            self._by_id.move_to_end(user.id)
+            self._id_by_username[user.username] = user.id
+            while len(self._by_id) > self.cache_size:
+                _, evicted = self._by_id.popitem(last=False)
+                self._id_by_username.pop(evicted.username, None)
+        return user
+
+    def forget(self, user_id):
+        with self._lock:
+            user = self._by_id.pop(user_id, None)
+            if user is not None:
+                self._id_by_username.pop(user.username, None)
+
+    def clear(self):
+        with self._lock:
+            self._by_id.clear()
+            self._id_by_username.clear()
+
+    @staticmethod
+    def _hydrate(record):
+        from app.routes.auth import User
+        return User(record.id, record.username, record.password_hash, record.role, record.tier)
+
+    # -------------------------
+    # الاستعلامات
+    # -------------------------
+    def get(self, user_id):
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+
+        user = self._cached(user_id)
+        if user is not None:
+            return user
+
+        record = db.session.get(UserRecord, user_id)
+        if record is None:
+            return None
+        return self._remember(self._hydrate(record))
+
+    def get_by_username(self, username):
+        user_id = self._id_by_username.get(username)
+        if user_id is not None:
+            user = self._cached(user_id)
+            if user is not None:
+                return user
+
+        record = db.session.execute(
+            db.select(UserRecord).filter_by(username=username)
+        ).scalar_one_or_none()
+        if record is None:
+            return None
+        return self._remember(self._hydrate(record))
+
+    def add(self, username, password_hash, role="user", tier="standard"):
+        record = UserRecord(username=username, password_hash=password_hash, role=role, tier=tier)
+        db.session.add(record)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            raise DuplicateUsername(username)
+        return self._remember(self._hydrate(record))
+
+    def set_tier(self, user_id, tier):
+        """تغيير المستوى في الجدول والذاكرة؛ يظهر في claims التوكنات التي تصدر بعده"""
+        record = db.session.get(UserRecord, int(user_id))
+        if record is None:
+            return None
+        record.tier = tier
+        db.session.commit()
+        self.forget(record.id)
+        return self._remember(self._hydrate(record))
+
+    def existing_ids(self, user_ids, chunk=500):
+        """أي من هذه المعرفات مسجّل (استعلام واحد لكل chunk بدل استعلام لكل مستخدم)"""
+        ids = set()
+        for user_id in user_ids:
+            try:
+                ids.add(int(user_id))
+            except (TypeError, ValueError):
+                continue
+        found = {user_id for user_id in ids if self._cached(user_id) is not None}
+        missing = list(ids - found)
+        for i in range(0, len(missing), chunk):
+            rows = db.session.execute(
+                db.select(UserRecord.id).where(UserRecord.id.in_(missing[i:i + chunk]))
+            ).scalars()
+            found.update(rows)
+        return {str(user_id) for user_id in found}
+
+    def count(self):
+        return db.session.execute(db.select(db.func.count(UserRecord.id))).scalar()
+
+    def stats(self):
+        return {"cached": len(self._by_id), "cache_size": self.cache_size}
+
+
+user_repository = UserRepository()
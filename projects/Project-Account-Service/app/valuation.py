@@ -0,0 +1,232 @@
+# app/valuation.py
+
+import math
+import threading
+
+import numpy as np
+
+# =========================
+# تقييم الصفقات المفتوحة بسعر السوق (Mark-to-Market)
+# =========================
+# الصفقات المفتوحة في أعمدة NumPy (سعر الدخول، الحجم، الرافعة، الاتجاه، الرمز، المستخدم).
+# مع كل سعر جديد يُعاد حساب الربح/الخسارة غير المحققة لكل الصفقات، ثم مجاميع كل حساب
+# (الهامش، حقوق الملكية، مستوى الهامش) بعمليات على المصفوفات كاملة بدل حلقة Python.
+# فتح وإغلاق صفقة وتغيّر الرصيد تُحدّث مجاميع صاحبها فقط (O(1)).
+#
+# الربح/الخسارة = الاتجاه × (السعر / سعر الدخول − 1) × الحجم × الرافعة
+# حقوق الملكية = الرصيد الحقيقي + الهامش المحجوز + الربح/الخسارة غير المحققة
+# مستوى الهامش = حقوق الملكية / الهامش × 100
+
+INITIAL_CAPACITY = 1024
+
+
+def trade_pnl(trade, price):
+    """الربح/الخسارة لصفقة واحدة بسعر معيّن؛ الخسارة لا تتجاوز الهامش"""
+    entry = trade.get("entry_price")
+    if not entry or price is None:
+        return 0.0
+    direction = 1.0 if trade["type"] == "buy" else -1.0
+    pnl = direction * (price / entry - 1.0) * trade["amount_usd"] * trade["leverage"]
+    # NaN/inf (سعر أو رافعة غير صالحة في بيانات قديمة) لا تصل إلى الدفتر
+    if not math.isfinite(pnl):
+        return 0.0
+    return max(pnl, -trade["amount_usd"])
+
+
+class Valuation:
+    def __init__(self, margin_call_level=100.0):
+        self.margin_call_level = margin_call_level
+        self._lock = threading.RLock()
+        self.clear()
+
+    def init_app(self, app):
+        self.margin_call_level = app.config.get("MARGIN_CALL_LEVEL", self.margin_call_level)
+
+    def clear(self):
+        with self._lock:
+            # الرموز والأسعار
+            self._symbols = {}
+            self._prices = np.zeros(16)
+
+            # مجاميع المستخدمين
+            self._users = {}
+            self._user_ids = []
+            self._balance = np.zeros(INITIAL_CAPACITY)
+            self._margin = np.zeros(INITIAL_CAPACITY)
+            self._unrealized = np.zeros(INITIAL_CAPACITY)
+            self._margin_called = np.zeros(INITIAL_CAPACITY, dtype=bool)
+        self.clear_trades()
+
+    def clear_trades(self):
+        """حذف الصفقات والهوامش مع إبقاء الأرصدة (إعادة بناء الصفقات من سجل الأحداث)"""
+        with self._lock:
+            self._margin[:] = 0.0
+            self._unrealized[:] = 0.0
+            self._margin_called[:] = False
+
+            # أعمدة الصفقات (الصفوف [0, _count) مستخدمة؛ الحذف بنقل آخر صف مكان المحذوف)
+            self._count = 0
+            self._entry = np.zeros(INITIAL_CAPACITY)
+            self._size = np.zeros(INITIAL_CAPACITY)
+            self._leverage = np.zeros(INITIAL_CAPACITY)
+            self._direction = np.zeros(INITIAL_CAPACITY)
+            self._symbol = np.zeros(INITIAL_CAPACITY, dtype=np.int32)
+            self._user = np.zeros(INITIAL_CAPACITY, dtype=np.int32)
+            self._pnl = np.zeros(INITIAL_CAPACITY)
+            self._keys = []
+            self._slots = {}
+
+    # -------------------------
+    # الفهارس والسعة
+    # -------------------------
+    @staticmethod
+    def _grow(array, needed):
+        if needed <= len(array):
+            return array
+        grown = np.zeros(max(needed, len(array) * 2), dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def _user_index(self, user_id):
+        index = self._users.get(user_id)
+        if index is None:
+            index = self._users[user_id] = len(self._user_ids)
+            self._user_ids.append(user_id)
+            needed = index + 1
+            self._balance = self._grow(self._balance, needed)
+            self._margin = self._grow(self._margin, needed)
+            self._unrealized = self._grow(self._unrealized, needed)
+            self._margin_called = self._grow(self._margin_called, needed)
+        return index
+
+    def _symbol_index(self, symbol, fallback_price):
+        symbol = symbol.upper()
+        index = self._symbols.get(symbol)
+        if index is None:
+            index = self._symbols[symbol] = len(self._symbols)
+            self._prices = self._grow(self._prices, index + 1)
+            self._prices[index] = fallback_price
+        return index
+
+    # -------------------------
+    # التحديث التدريجي
+    # -------------------------
+    def add(self, user_id, trade):
+        """صفقة مفتوحة جديدة؛ الصفقات بدون سعر دخول تُحسب في الهامش فقط"""
+        with self._lock:
+            user = self._user_index(user_id)
+            self._margin[user] += trade["amount_usd"]
+            if not trade.get("entry_price"):
+                return
+            slot = self._count
+            self._count += 1
+            for name in ("_entry", "_size", "_leverage", "_direction", "_symbol", "_user", "_pnl"):
+                setattr(self, name, self._grow(getattr(self, name), self._count))
+
+            symbol = self._symbol_index(trade["symbol"], trade["entry_price"])
+            self._entry[slot] = trade["entry_price"]
+            self._size[slot] = trade["amount_usd"]
+            self._leverage[slot] = trade["leverage"]
+            self._direction[slot] = 1.0 if trade["type"] == "buy" else -1.0
+            self._symbol[slot] = symbol
+            self._user[slot] = user
+            self._pnl[slot] = trade_pnl(trade, float(self._prices[symbol]))
+            self._unrealized[user] += self._pnl[slot]
+
+            key = (user_id, trade["trade_id"])
+            self._keys.append(key)
+            self._slots[key] = slot
+
+    def remove(self, user_id, trade):
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is None:
+                return
+            self._margin[user] -= trade["amount_usd"]
+            slot = self._slots.pop((user_id, trade["trade_id"]), None)
+            if slot is None:
+                return
+            self._unrealized[user] -= self._pnl[slot]
+
+            last = self._count - 1
+            if slot != last:
+                for column in (self._entry, self._size, self._leverage, self._direction,
+                               self._symbol, self._user, self._pnl):
+                    column[slot] = column[last]
+                moved = self._keys[last]
+                self._keys[slot] = moved
+                self._slots[moved] = slot
+            self._keys.pop()
+            self._count = last
+
+    def set_balance(self, user_id, balance):
+        with self._lock:
+            # الفهرس أولًا: إضافة مستخدم جديد قد تستبدل مصفوفة الأرصدة بأخرى أكبر
+            user = self._user_index(user_id)
+            self._balance[user] = balance
+
+    # -------------------------
+    # إعادة التقييم عند تغيّر السعر
+    # -------------------------
+    def set_price(self, symbol, price):
+        return self.set_prices({symbol: price})
+
+    def set_prices(self, prices):
+        """
+        تحديث أسعار {symbol: price} ثم إعادة تقييم كل الصفقات مرة واحدة؛ ترجع
+        [(user_id، مستوى الهامش)] للمستخدمين الذين دخلوا حالة نداء الهامش الآن (محسوبة تحت القفل)
+        """
+        with self._lock:
+            for symbol, price in prices.items():
+                index = self._symbol_index(symbol, price)
+                self._prices[index] = price
+            return self._revalue()
+
+    def _revalue(self):
+        n, users = self._count, len(self._user_ids)
+        if n:
+            # الخسارة لا تتجاوز هامش الصفقة (نفس trade_pnl)
+            pnl = self._direction[:n] * (self._prices[self._symbol[:n]] / self._entry[:n] - 1.0) \
+                * self._size[:n] * self._leverage[:n]
+            pnl[~np.isfinite(pnl)] = 0.0
+            np.maximum(pnl, -self._size[:n], out=self._pnl[:n])
+        self._unrealized[:users] = np.bincount(self._user[:n], weights=self._pnl[:n], minlength=users)
+
+        margin = self._margin[:users]
+        equity = self._balance[:users] + margin + self._unrealized[:users]
+        called = (margin > 1e-9) & (equity * 100.0 < self.margin_call_level * margin)
+        newly = np.flatnonzero(called & ~self._margin_called[:users])
+        self._margin_called[:users] = called
+        levels = equity[newly] / margin[newly] * 100.0
+        return [(self._user_ids[i], float(level)) for i, level in zip(newly, levels)]
+
+    # -------------------------
+    # القراءة
+    # -------------------------
+    def account(self, user_id):
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is None:
+                return {"unrealized_pnl": 0.0, "margin_used": 0.0, "equity": None,
+                        "margin_level": None, "margin_call": False}
+            margin = float(self._margin[user])
+            unrealized = float(self._unrealized[user])
+            equity = float(self._balance[user]) + margin + unrealized
+            return {
+                "unrealized_pnl": unrealized,
+                "margin_used": margin,
+                "equity": equity,
+                "margin_level": equity / margin * 100.0 if margin > 1e-9 else None,
+                "margin_call": bool(self._margin_called[user]),
+            }
+
+    def stats(self):
+        return {
+            "valued_trades": self._count,
+            "accounts": len(self._user_ids),
+            "symbols": len(self._symbols),
+            "margin_calls": int(self._margin_called[:len(self._user_ids)].sum()),
+        }
+
+
+valuation = Valuation()
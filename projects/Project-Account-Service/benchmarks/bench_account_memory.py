@@ -0,0 +1,59 @@
+# benchmarks/bench_account_memory.py
+# الذاكرة لكل حساب: قاموس بتسعة مفاتيح (الشكل السابق في get_user_account) مقابل AccountRecord
+#
+# التشغيل من جذر الخدمة:
+#     python -m benchmarks.bench_account_memory [--accounts 1000000]
+
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import datetime
+
+from app.account_record import AccountRecord
+
+
+def old_account(n):
+    return {
+        "real": float(n % 1000),
+        "demo": 10000.0 + n % 7,
+        "account_type": "standard",
+        "status": "active",
+        "currency": "USD",
+        "kyc_verified": False,
+        "daily_withdraw_limit": 5000,
+        "created_at": datetime.utcnow().isoformat()
+    }
+
+
+def new_account(n):
+    return AccountRecord(real=float(n % 1000), demo=10000.0 + n % 7)
+
+
+def measure(label, factory, count):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    accounts = {str(n): factory(n) for n in range(count)}
+    elapsed = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # مفاتيح المستخدمين وجدول التجزئة نفسه متساويان في الحالتين، والفرق كله في قيمة الحساب
+    print(f"{label:<28} {current / count:>8.0f} بايت/حساب   {current / 2**20:>8.1f} MiB   {elapsed:>6.2f}s")
+    del accounts
+    return current / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="قياس ذاكرة سجلات الحسابات")
+    parser.add_argument("--accounts", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"{args.accounts:,} حساب (مع مفتاح المستخدم وقاموس user_accounts)")
+    before = measure("قاموس لكل حساب", old_account, args.accounts)
+    after = measure("AccountRecord (__slots__)", new_account, args.accounts)
+    print(f"\nتوفير {before - after:.0f} بايت/حساب ({(1 - after / before) * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
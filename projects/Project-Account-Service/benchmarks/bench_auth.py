@@ -0,0 +1,158 @@
+# benchmarks/bench_auth.py
+# مجموعة قياس أداء المصادقة: التسجيل، تسجيل الدخول، والطلبات المحمية بـ JWT
+# عبر Flask test client وعبر خادم WSGI حقيقي داخل نفس العملية.
+#
+# التشغيل من جذر الخدمة:
+#     python -m benchmarks.bench_auth                   # قياس ومقارنة بخط الأساس
+#     python -m benchmarks.bench_auth --save-baseline   # حفظ النتائج كخط أساس جديد
+
+import argparse
+import os
+import sys
+import threading
+
+import requests
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from app import create_app
+from benchmarks.common import (
+    compare_to_baseline, isolated_config, print_row, save_baseline, summarize, time_calls,
+)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "auth.json")
+
+
+class BenchConfig(isolated_config()):
+    DEBUG = False
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+
+
+# =========================
+# عميل Flask test client
+# =========================
+class TestClientDriver:
+    name = "test_client"
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def post(self, path, payload, headers=None):
+        return self.client.post(path, json=payload, headers=headers).status_code
+
+    def get(self, path, headers=None):
+        return self.client.get(path, headers=headers).status_code
+
+    def json(self, path, payload):
+        return self.client.post(path, json=payload).get_json()
+
+    def close(self):
+        pass
+
+
+# =========================
+# خادم WSGI داخل العملية (طبقة HTTP حقيقية)
+# =========================
+class QuietRequestHandler(WSGIRequestHandler):
+    # اتصال keep-alive وبدون طباعة سطر لكل طلب
+    protocol_version = "HTTP/1.1"
+
+    def log(self, type, message, *args):
+        pass
+
+
+class WSGIServerDriver:
+    name = "wsgi"
+
+    def __init__(self, app):
+        self.server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietRequestHandler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.session = requests.Session()
+
+    def post(self, path, payload, headers=None):
+        return self.session.post(self.base_url + path, json=payload, headers=headers).status_code
+
+    def get(self, path, headers=None):
+        return self.session.get(self.base_url + path, headers=headers).status_code
+
+    def json(self, path, payload):
+        return self.session.post(self.base_url + path, json=payload).json()
+
+    def close(self):
+        self.session.close()
+        self.server.shutdown()
+
+
+def checked(status, expected):
+    if status != expected:
+        raise RuntimeError(f"حالة غير متوقعة {status} (المتوقع {expected})")
+
+
+def run_driver(driver_cls, counts):
+    app = create_app(BenchConfig)
+    driver = driver_cls(app)
+    results = {}
+    try:
+        prefix = driver.name
+        register_args = [(f"{prefix}_user{i}",) for i in range(counts["register"])]
+        samples = time_calls(
+            lambda username: checked(driver.post("/auth/register", {"username": username, "password": "pw"}), 201),
+            register_args,
+        )
+        results[f"{prefix}/auth/register"] = summarize(samples)
+
+        login_args = [register_args[i % len(register_args)] for i in range(counts["login"])]
+        samples = time_calls(
+            lambda username: checked(driver.post("/auth/login", {"username": username, "password": "pw"}), 200),
+            login_args,
+        )
+        results[f"{prefix}/auth/login"] = summarize(samples)
+
+        # المستخدم الأول يملك المعرف 1 وهو الموجود في بيانات transfer الافتراضية
+        token = driver.json("/auth/login", {"username": register_args[0][0], "password": "pw"})["token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        samples = time_calls(
+            lambda: checked(driver.get("/transfer/wallets?user_id=1", headers=headers), 200),
+            [()] * counts["protected"],
+        )
+        results[f"{prefix}/transfer/wallets"] = summarize(samples)
+
+        samples = time_calls(
+            lambda: checked(driver.get("/dashboard/", headers=headers), 200),
+            [()] * counts["protected"],
+        )
+        results[f"{prefix}/dashboard/"] = summarize(samples)
+    finally:
+        driver.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Authentication throughput benchmarks")
+    parser.add_argument("--register", type=int, default=50)
+    parser.add_argument("--login", type=int, default=50)
+    parser.add_argument("--protected", type=int, default=2000)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    counts = {"register": args.register, "login": args.login, "protected": args.protected}
+    results = {}
+    for driver_cls in (TestClientDriver, WSGIServerDriver):
+        results.update(run_driver(driver_cls, counts))
+
+    print()
+    for name, stats in results.items():
+        print_row(name, stats)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        return 0
+    return 1 if compare_to_baseline(args.baseline, results, args.tolerance) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+# benchmarks/bench_auth_pipeline.py
+# مقارنة زمن الطلب الواحد: login_required + jwt_required المتراكبين (فك التوكن مرتين)
+# مقابل طبقة المصادقة الموحدة في before_request
+#
+# التشغيل من جذر الخدمة:
+#     python -m benchmarks.bench_auth_pipeline
+
+from functools import wraps
+
+import jwt
+from flask import current_app, jsonify, request
+
+from app import create_app
+from app.auth_pipeline import verified_tokens
+from benchmarks.common import isolated_config, time_calls, summarize, print_row
+
+REQUESTS = 3_000
+
+
+class BenchConfig(isolated_config()):
+    DEBUG = False
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+
+
+# =========================
+# النسخة القديمة من الـ Decorators (للمقارنة فقط)
+# =========================
+def legacy_login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        token = None
+        if "Authorization" in request.headers:
+            token_header = request.headers.get("Authorization")
+            if token_header.startswith("Bearer "):
+                token = token_header.split(" ")[1]
+        if not token:
+            return jsonify({"error": "missing"}), 401
+        try:
+            data = jwt.decode(token, current_app.config["SECRET_KEY"], algorithms=["HS256"])
+            request.user_id = str(data.get("user_id"))
+        except Exception:
+            return jsonify({"error": "invalid"}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def legacy_jwt_required(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        auth_header = request.headers.get("Authorization")
+        token = auth_header.split(" ")[1] if auth_header and auth_header.startswith("Bearer ") else None
+        if not token:
+            return jsonify({"error": "missing"}), 401
+        try:
+            jwt.decode(token, current_app.config.get("SECRET_KEY"), algorithms=["HS256"])
+        except jwt.InvalidTokenError:
+            return jsonify({"error": "invalid"}), 401
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def main():
+    app = create_app(BenchConfig)
+
+    @app.route("/legacy-dashboard/")
+    @legacy_login_required
+    @legacy_jwt_required
+    def legacy_dashboard():
+        return jsonify({"dashboard": {}}), 200
+
+    client = app.test_client()
+    client.post("/auth/register", json={"username": "bench", "password": "bench"})
+    token = client.post("/auth/login", json={"username": "bench", "password": "bench"}).json["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    def get(path):
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200, response.status_code
+
+    args = [()] * REQUESTS
+    legacy = time_calls(lambda: get("/legacy-dashboard/"), args)
+    pipeline = time_calls(lambda: get("/dashboard/"), args)
+
+    print("\n== زمن الطلب الكامل عبر test client")
+    print_row("login_required + jwt_required", summarize(legacy))
+    print_row("before_request pipeline", summarize(pipeline))
+    print("token cache:", verified_tokens.stats())
+
+
+if __name__ == "__main__":
+    main()
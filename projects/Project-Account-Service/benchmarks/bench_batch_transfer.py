@@ -0,0 +1,68 @@
+# benchmarks/bench_batch_transfer.py
+# دفعة رواتب: طلب POST /transfer/ لكل مستلم مقابل طلب واحد إلى /transfer/batch (JSON و JSONL)
+#
+# التشغيل من جذر الخدمة:
+#     python -m benchmarks.bench_batch_transfer [--transfers 2000]
+
+import argparse
+import json
+import tempfile
+import time
+
+from app import create_app
+from app.ledger import ledger
+from app.routes.auth import User, issue_tokens
+from app.routes.transfer import wallet_account
+from benchmarks.common import isolated_config
+
+RECIPIENTS = 200
+
+
+def main():
+    parser = argparse.ArgumentParser(description="قياس دفعات التحويل")
+    parser.add_argument("--transfers", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        class BenchConfig(isolated_config(directory)):
+            DEBUG = False
+            SQLALCHEMY_DATABASE_URI = "sqlite://"
+
+        app = create_app(BenchConfig)
+        client = app.test_client()
+        with app.test_request_context():
+            headers = {"Authorization": "Bearer " + issue_tokens(User(1, "bench", ""))["token"]}
+        ledger.post("deposit", "1", [("system:external", -1e9), (wallet_account("1"), 1e9)])
+        for n in range(2, RECIPIENTS + 2):
+            ledger.open_account(wallet_account(str(n)), 0.0, "system:external")
+
+        transfers = [{"to_user_id": 2 + i % RECIPIENTS, "amount": 1} for i in range(args.transfers)]
+
+        def report(label, elapsed):
+            print(f"{label:<26} {args.transfers / elapsed:>10,.0f} تحويل/ث   {elapsed:>7.2f}s")
+
+        start = time.perf_counter()
+        for item in transfers:
+            r = client.post("/transfer/", json={"user_id": "1", **item}, headers=headers)
+            assert r.status_code == 200, r.json
+        report("POST /transfer/ لكل مستلم", time.perf_counter() - start)
+
+        start = time.perf_counter()
+        r = client.post("/transfer/batch", json={"transfers": transfers}, headers=headers)
+        assert r.status_code == 200 and r.json["applied"] == args.transfers, r.json
+        report("/transfer/batch (JSON)", time.perf_counter() - start)
+
+        body = "\n".join(json.dumps(item) for item in transfers)
+        start = time.perf_counter()
+        r = client.post("/transfer/batch", data=body, content_type="application/x-ndjson", headers=headers)
+        assert r.status_code == 200 and r.json["applied"] == args.transfers, r.json
+        report("/transfer/batch (JSONL)", time.perf_counter() - start)
+
+        expected = 3 * args.transfers
+        received = sum(ledger.balance(wallet_account(str(n))) for n in range(2, RECIPIENTS + 2))
+        assert received == expected, (received, expected)
+        ledger.close()
+
+
+if __name__ == "__main__":
+    main()
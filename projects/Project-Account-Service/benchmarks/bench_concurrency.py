@@ -0,0 +1,156 @@
+# benchmarks/bench_concurrency.py
+# اختبار ضغط متزامن لعمليات الأرصدة: تحويلات بين محافظ، إيداع، سحب، فتح وإغلاق صفقات
+# من عدة خيوط على نفس مجموعة المستخدمين، ثم التحقق من حفظ الأرصدة (لا تحديث ضائع)
+# ومقارنة الإنتاجية بين الأقفال المقسّمة وقفل عام واحد (LOCK_STRIPES = 1)
+#
+# التشغيل من جذر الخدمة:
+#     python -m benchmarks.bench_concurrency [--ops 200] [--users 32]
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from app import create_app
+from app.event_store import event_store
+from app.ledger import ledger, user_account
+from app.locks import account_locks
+from app.routes import accounts, trades
+from app.routes.auth import User, issue_tokens
+from app.routes.transfer import wallet_account
+from benchmarks.common import isolated_config
+
+THREADS = (1, 2, 4, 8, 16)
+OPENING_WALLET = 1000.0
+OPENING_REAL = 5000.0
+
+
+def make_app(directory, stripes):
+    # مجلد جديد لكل تشغيل: الدفتر والأحداث والسجلات والأرشيف تبدأ فارغة
+    run_directory = os.path.join(directory, f"run-{stripes}-{time.perf_counter_ns()}")
+
+    class BenchConfig(isolated_config(run_directory)):
+        DEBUG = False
+        SQLALCHEMY_DATABASE_URI = "sqlite://"
+        LEDGER_SYNCHRONOUS = "NORMAL"
+        LOCK_STRIPES = stripes
+
+    for state in (accounts.account_logs, accounts.notifications, trades.trades_logs):
+        state.clear()
+    return create_app(BenchConfig)
+
+
+def prepare_users(app, count):
+    headers = {}
+    with app.test_request_context():
+        for n in range(1, count + 1):
+            user_id = str(n)
+            ledger.open_account(wallet_account(user_id), OPENING_WALLET, "system:external", user_id=user_id)
+            ledger.open_account(user_account(user_id, "real"), OPENING_REAL, "system:external", user_id=user_id)
+            accounts.get_user_account(user_id)
+            event_store.emit("accounts", "update", user_id, {"kyc_verified": True})
+            token = issue_tokens(User(n, f"bench{n}", ""))["token"]
+            headers[user_id] = {"Authorization": f"Bearer {token}"}
+    return headers
+
+
+def worker(app, headers, ops, seed, errors):
+    client = app.test_client()
+    rnd = random.Random(seed)
+    user_ids = list(headers)
+    for _ in range(ops):
+        user_id = rnd.choice(user_ids)
+        h = headers[user_id]
+        op = rnd.random()
+        if op < 0.4:
+            other = rnd.choice(user_ids)
+            if other == user_id:
+                continue
+            r = client.post("/transfer/", json={"user_id": user_id, "to_user_id": other,
+                                                "amount": rnd.randint(1, 50)}, headers=h)
+        elif op < 0.55:
+            r = client.post("/accounts/deposit", json={"type": "real", "amount": rnd.randint(1, 100)}, headers=h)
+        elif op < 0.7:
+            r = client.post("/accounts/withdraw", json={"type": "real", "amount": rnd.randint(1, 100)}, headers=h)
+        elif op < 0.85:
+            r = client.post("/trades/new", json={"symbol": "GOLD", "type": "buy",
+                                                 "amount": rnd.randint(1, 200)}, headers=h)
+        else:
+            # محاولات إغلاق متزامنة لنفس الصفقة: واحدة فقط يجب أن تنجح
+            r = client.post(f"/trades/close/{rnd.randint(1, 5)}", headers=h)
+        if r.status_code >= 500:
+            errors.append(r.status_code)
+
+
+def check_conservation(user_count):
+    """الأرصدة بعد الضغط يجب أن تطابق ما يمكن استنتاجه من العمليات الناجحة"""
+    user_ids = [str(n) for n in range(1, user_count + 1)]
+    problems = []
+
+    wallets = sum(ledger.balance(wallet_account(u)) for u in user_ids)
+    if abs(wallets - OPENING_WALLET * user_count) > 1e-6:
+        problems.append(f"مجموع المحافظ {wallets} != {OPENING_WALLET * user_count}")
+
+    open_margin = sum(t["amount_usd"] for u in user_ids for t in trades.get_user_trades(u) if t["status"] == "open")
+    if abs(ledger.balance("system:trading") - open_margin) > 1e-6:
+        problems.append(f"هامش الصفقات {ledger.balance('system:trading')} != {open_margin}")
+
+    for u in user_ids:
+        ids = [t["trade_id"] for t in trades.get_user_trades(u)]
+        if len(ids) != len(set(ids)):
+            problems.append(f"أرقام صفقات مكررة للمستخدم {u}")
+        if abs(accounts.get_user_account(u)["real"] - ledger.balance(user_account(u, "real"))) > 1e-6:
+            problems.append(f"رصيد الحساب {u} لا يطابق الدفتر")
+        if ledger.balance(user_account(u, "real")) < 0 or ledger.balance(wallet_account(u)) < 0:
+            problems.append(f"رصيد سالب للمستخدم {u}")
+    return problems
+
+
+def run(directory, stripes, threads, ops, user_count):
+    app = make_app(directory, stripes)
+    headers = prepare_users(app, user_count)
+    errors = []
+    workers = [
+        threading.Thread(target=worker, args=(app, headers, ops, seed, errors))
+        for seed in range(threads)
+    ]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    problems = check_conservation(user_count)
+    if errors:
+        problems.append(f"{len(errors)} أخطاء 5xx")
+    return threads * ops / elapsed, account_locks.stats()["contended"], problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="اختبار ضغط الأقفال المقسّمة")
+    parser.add_argument("--ops", type=int, default=200, help="عدد العمليات لكل خيط")
+    parser.add_argument("--users", type=int, default=32)
+    args = parser.parse_args()
+
+    # تبديل الخيوط أكثر من المعتاد حتى تتداخل العمليات في أماكن أكثر
+    sys.setswitchinterval(1e-5)
+    failed = False
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'threads':>8} {'striped ops/s':>14} {'تنافس':>8} {'global ops/s':>14} {'تنافس':>8}")
+        for threads in THREADS:
+            striped, striped_waits, problems = run(directory, 1024, threads, args.ops, args.users)
+            single, single_waits, single_problems = run(directory, 1, threads, args.ops, args.users)
+            print(f"{threads:>8} {striped:>14,.0f} {striped_waits:>8} {single:>14,.0f} {single_waits:>8}")
+            for problem in problems + single_problems:
+                failed = True
+                print(f"    ❌ {problem}")
+
+    print("\n❌ فشل التحقق من حفظ الأرصدة" if failed else "\n✅ الأرصدة محفوظة في كل التشغيلات")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
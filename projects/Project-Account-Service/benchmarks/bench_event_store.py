@@ -0,0 +1,75 @@
+# benchmarks/bench_event_store.py
+# زمن استعادة حالة الحسابات والصفقات عند التشغيل مع تزايد طول التاريخ:
+# إعادة كل الأحداث (بدون لقطات) مقابل آخر لقطة + الأحداث بعدها
+#
+# التشغيل من جذر الخدمة:
+#     python -m benchmarks.bench_event_store [--users 1000] [--snapshot-every 10000]
+
+import argparse
+import os
+import tempfile
+import time
+
+from app.account_record import AccountRecord
+from app.event_store import EventStore
+from app.routes import accounts, trades
+
+HISTORY = (12_500, 125_000, 305_000)
+
+
+def make_store(snapshot_every):
+    store = EventStore(snapshot_every=snapshot_every)
+    store.register("accounts", accounts.apply_account_event, accounts.dump_accounts, accounts.load_accounts)
+    store.register("trades", trades.apply_trade_event, trades.dump_trades, trades.load_trades)
+    return store
+
+
+def fill(store, users, events):
+    """فتح الحسابات ثم تعديلات متكررة عليها وصفقة كل 20 حدث (حجم الحالة يكبر ببطء)"""
+    for n in range(users):
+        store.emit("accounts", "open", str(n), AccountRecord(demo=10000.0).to_row())
+    next_trade = {}
+    for i in range(events - users):
+        user_id = str(i % users)
+        if i % 20 == 0:
+            trade_id = next_trade[user_id] = next_trade.get(user_id, 0) + 1
+            store.emit("trades", "open", user_id, {
+                "trade_id": trade_id, "symbol": "BTC", "amount": 1.0, "amount_usd": 1.0,
+                "leverage": 1.0, "type": "buy", "status": "open"
+            })
+        else:
+            store.emit("accounts", "update", user_id, {"kyc_verified": i % 2 == 0})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="قياس استعادة الحالة من سجل الأحداث")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--snapshot-every", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{'الأحداث':>10} {'بدون لقطات':>14} {'مع لقطات':>14} {'أحداث مُعادة':>14} {'كتابة حدث/ث':>14}")
+    for events in HISTORY:
+        row = []
+        for snapshot_every in (10**12, args.snapshot_every):
+            with tempfile.TemporaryDirectory() as directory:
+                store = make_store(snapshot_every)
+                store.open(os.path.join(directory, "events"))
+                started = time.perf_counter()
+                fill(store, args.users, events)
+                write_rate = events / (time.perf_counter() - started)
+                expected = (dict(accounts.user_accounts), sum(len(t) for t in trades.user_trades.values()))
+                store.close()
+
+                recovered = make_store(snapshot_every)
+                recovered.open(os.path.join(directory, "events"))
+                report = recovered.last_recovery
+                recovered.close()
+                assert (accounts.user_accounts, sum(len(t) for t in trades.user_trades.values())) == expected
+                row.append((report["seconds"], report["replayed"], write_rate))
+
+        (full, _, _), (snap, replayed, write_rate) = row
+        print(f"{events:>10,} {full * 1000:>12.1f}ms {snap * 1000:>12.1f}ms {replayed:>14,} {write_rate:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# benchmarks/bench_history.py
+# زمن صفحة من سجل التحويلات في بداية السجل ونهايته مع تزايد طول السجل،
+# مقارنة بقراءة السجل كاملًا (السلوك السابق لـ /transfer/history)
+#
+# التشغيل من جذر الخدمة:
+#     python -m benchmarks.bench_history [--postings 50000]
+
+import argparse
+import os
+import tempfile
+
+from app.ledger import Ledger, user_account
+from benchmarks.common import print_row, summarize, time_calls
+
+PAGE = 50
+REPEAT = 200
+
+
+def main():
+    parser = argparse.ArgumentParser(description="قياس صفحات سجل التحويلات")
+    parser.add_argument("--postings", type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        ledger = Ledger(synchronous="OFF")
+        ledger.open(os.path.join(directory, "ledger.db"))
+        account = user_account("1", "wallet")
+        ledger.open_account(account, 1e9, "system:external")
+
+        filled = 1
+        for size in (1000, 10000, args.postings):
+            while filled < size:
+                ledger.post("transfer", "1", [(account, -1.0), ("system:external", 1.0)])
+                filled += 1
+
+            # مؤشر يسبق آخر صفحة مباشرة
+            tail = ledger.postings_page(account, 10**9)[-PAGE - 1]["id"]
+
+            print(f"\n{size:,} قيد في السجل")
+            print_row("الصفحة الأولى", summarize(time_calls(
+                ledger.postings_page, [(account, PAGE + 1)] * REPEAT)))
+            print_row("الصفحة الأخيرة (after)", summarize(time_calls(
+                lambda after: ledger.postings_page(account, PAGE + 1, after_id=after), [(tail,)] * REPEAT)))
+            print_row("مع فلتر debit و min/max", summarize(time_calls(
+                lambda after: ledger.postings_page(account, PAGE + 1, after_id=after, direction="debit",
+                                                   min_amount=0.5, max_amount=2), [(tail,)] * REPEAT)))
+            print_row("السجل كاملًا", summarize(time_calls(
+                ledger.postings_page, [(account, 10**9)] * 5)))
+        ledger.close()
+
+
+if __name__ == "__main__":
+    main()
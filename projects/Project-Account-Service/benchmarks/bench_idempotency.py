@@ -0,0 +1,73 @@
+# benchmarks/bench_idempotency.py
+# إعادة المحاولة مع Idempotency-Key: زمن الطلب الأول مقابل الرد المحفوظ،
+# وطلبات مكررة متزامنة لنفس المفتاح يجب أن تُنفَّذ مرة واحدة فقط
+#
+# التشغيل من جذر الخدمة:
+#     python -m benchmarks.bench_idempotency [--requests 2000] [--threads 16]
+
+import argparse
+import sys
+import tempfile
+import threading
+
+from app import create_app
+from app.idempotency import idempotency_cache
+from app.ledger import ledger
+from app.routes.auth import User, issue_tokens
+from app.routes.transfer import wallet_account
+from benchmarks.common import isolated_config, print_row, summarize, time_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="قياس طبقة Idempotency-Key")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        class BenchConfig(isolated_config(directory)):
+            DEBUG = False
+            SQLALCHEMY_DATABASE_URI = "sqlite://"
+
+        app = create_app(BenchConfig)
+        client = app.test_client()
+        with app.test_request_context():
+            headers = {"Authorization": "Bearer " + issue_tokens(User(1, "bench", ""))["token"]}
+        ledger.post("deposit", "1", [("system:external", -1e9), (wallet_account("1"), 1e9)])
+        ledger.open_account(wallet_account("2"), 0.0, "system:external")
+        body = {"user_id": "1", "to_user_id": 2, "amount": 1}
+
+        def send(key):
+            r = client.post("/transfer/", json=body, headers={**headers, "Idempotency-Key": key})
+            assert r.status_code == 200, r.json
+
+        keys = [(f"k{i}",) for i in range(args.requests)]
+        print_row("بدون مفتاح", summarize(time_calls(
+            lambda: client.post("/transfer/", json=body, headers=headers), [()] * args.requests)))
+        print_row("مفتاح جديد (تنفيذ)", summarize(time_calls(send, keys)))
+        print_row("إعادة نفس المفتاح (رد محفوظ)", summarize(time_calls(send, keys)))
+
+        # طلبات متزامنة لنفس المفتاح: تحويل واحد فقط يجب أن يُطبَّق
+        sys.setswitchinterval(1e-5)
+        before = ledger.balance(wallet_account("2"))
+        barrier = threading.Barrier(args.threads)
+
+        def duplicate(round_key):
+            barrier.wait()
+            app.test_client().post("/transfer/", json=body, headers={**headers, "Idempotency-Key": round_key})
+
+        rounds = 50
+        for n in range(rounds):
+            workers = [threading.Thread(target=duplicate, args=(f"race{n}",)) for _ in range(args.threads)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        applied = ledger.balance(wallet_account("2")) - before
+        print(f"\n{rounds} جولة × {args.threads} طلب متزامن لنفس المفتاح → {applied:.0f} تحويل مطبَّق "
+              f"({'صحيح' if applied == rounds else 'تكرار!'})")
+        print(idempotency_cache.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# benchmarks/bench_ledger.py
+# عدد المعاملات المحفوظة على القرص في الثانية مع تزايد الطلبات المتزامنة،
+# مع الـ group commit (دفعة حتى 512) وبدونه (commit لكل معاملة)
+#
+# التشغيل من جذر الخدمة:
+#     python -m benchmarks.bench_ledger [--per-thread 200]
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from app.ledger import Ledger, user_account
+
+THREADS = (1, 4, 16, 64)
+
+
+def run(max_batch, threads, per_thread, directory):
+    path = os.path.join(directory, f"ledger-{max_batch}-{threads}.db")
+    ledger = Ledger(synchronous="FULL", max_batch=max_batch)
+    ledger.open(path)
+
+    def worker(n):
+        account = user_account(n, "real")
+        for _ in range(per_thread):
+            ledger.post("deposit", str(n), [("system:external", -1.0), (account, 1.0)])
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    stats = ledger.stats()
+    ledger.close()
+    # لا معاملة ضائعة: الصندوق الخارجي = سالب مجموع كل الإيداعات
+    assert ledger.balance("system:external") == -threads * per_thread
+    return stats["transactions"] / elapsed, stats["avg_batch"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="قياس الكتابة الدائمة في دفتر الأستاذ")
+    parser.add_argument("--per-thread", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'threads':>8} {'بدون group commit':>22} {'مع group commit':>22} {'متوسط الدفعة':>14}")
+        for threads in THREADS:
+            single, _ = run(1, threads, args.per_thread, directory)
+            grouped, avg_batch = run(512, threads, args.per_thread, directory)
+            print(f"{threads:>8} {single:>18,.0f} tx/s {grouped:>18,.0f} tx/s {avg_batch:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
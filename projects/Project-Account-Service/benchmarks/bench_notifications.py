@@ -0,0 +1,64 @@
+# benchmarks/bench_notifications.py
+# عميل يسأل عن الإشعارات كل فترة: تنزيل القائمة كاملة مقابل since، ثم زمن وصول إشعار عبر long-poll
+#
+# التشغيل من جذر الخدمة:
+#     python -m benchmarks.bench_notifications [--history 1000]
+
+import argparse
+import tempfile
+import threading
+import time
+
+from app import create_app
+from app.routes import accounts
+from app.routes.auth import User, issue_tokens
+from benchmarks.common import isolated_config, print_row, summarize, time_calls
+
+POLLS = 200
+
+
+def main():
+    parser = argparse.ArgumentParser(description="قياس تغذية الإشعارات")
+    parser.add_argument("--history", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        class BenchConfig(isolated_config(directory)):
+            DEBUG = False
+            SQLALCHEMY_DATABASE_URI = "sqlite://"
+
+        app = create_app(BenchConfig)
+        client = app.test_client()
+        with app.test_request_context():
+            headers = {"Authorization": "Bearer " + issue_tokens(User(1, "bench", ""))["token"]}
+        for i in range(args.history):
+            accounts.notify("1", f"إشعار رقم {i}")
+
+        since = client.get("/accounts/notifications?limit=1", headers=headers).json["next_since"]
+        sizes = {}
+
+        def poll(url, key):
+            sizes[key] = len(client.get(url, headers=headers).data)
+
+        print(f"{args.history:,} إشعار سابق، {POLLS} استعلام بدون جديد")
+        print_row(f"القائمة (limit={args.history})", summarize(time_calls(
+            poll, [(f"/accounts/notifications?limit={args.history}", "full")] * POLLS)))
+        print_row("since", summarize(time_calls(
+            poll, [(f"/accounts/notifications?since={since}", "since")] * POLLS)))
+        print(f"حجم الرد: {sizes['full']:,} بايت مقابل {sizes['since']:,} بايت")
+
+        # زمن الوصول: إشعار يصل بعد 50ms من بدء الانتظار
+        delays = []
+        for _ in range(20):
+            timer = threading.Timer(0.05, accounts.notify, args=("1", "جديد"))
+            start = time.perf_counter()
+            timer.start()
+            response = client.get(f"/accounts/notifications?since={since}&wait=5", headers=headers).json
+            delays.append(time.perf_counter() - start - 0.05)
+            since = response["next_since"]
+        delays.sort()
+        print(f"long-poll: الإشعار يصل بعد {delays[len(delays) // 2] * 1e3:.1f} ms (الوسيط) من إضافته")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# benchmarks/bench_positions.py
+# فحص التحوط وحساب التعرّض على رمز واحد: المرور على صفقات المستخدم (السلوك السابق في new_trade)
+# مقابل فهرس المراكز (app/positions.py)
+#
+# التشغيل من جذر الخدمة:
+#     python -m benchmarks.bench_positions
+
+from app.positions import PositionIndex
+from app.trade_book import TradeBook
+from benchmarks.common import print_row, summarize, time_calls
+
+SYMBOLS = ("EURUSD", "GBPUSD", "GOLD", "SILVER")
+CHECKS = 5_000
+
+
+def main():
+    for history, open_count in ((1_000, 50), (10_000, 500), (50_000, 2_000)):
+        book = TradeBook()
+        index = PositionIndex()
+        for n in range(1, history + 1):
+            trade = book.add({
+                "trade_id": n, "symbol": SYMBOLS[n % len(SYMBOLS)], "type": "buy",
+                "amount_usd": 10.0, "leverage": 5.0, "entry_price": 1.0 + n % 3,
+                "status": "open" if n > history - open_count else "closed",
+            })
+            if trade["status"] == "open":
+                index.on_open("1", trade)
+
+        def scan_history(symbol, trade_type):
+            existing = [t for t in book if t["symbol"] == symbol and t["status"] == "open"]
+            return bool(existing) and trade_type != existing[-1]["type"]
+
+        def scan_exposure(symbol):
+            return sum(t["amount_usd"] * t["leverage"] for t in book.open.values() if t["symbol"] == symbol)
+
+        print(f"\n{history:,} صفقة ({open_count:,} مفتوحة)")
+        print_row("تحوط: المرور على كل الصفقات", summarize(time_calls(
+            scan_history, [("GOLD", "sell")] * max(1_000_000 // history, 20))))
+        print_row("تحوط: فهرس المراكز", summarize(time_calls(
+            index.has_opposite, [("1", "GOLD", "sell")] * CHECKS)))
+        print_row("تعرّض: المرور على المفتوحة", summarize(time_calls(
+            scan_exposure, [("GOLD",)] * max(1_000_000 // open_count, 20))))
+        print_row("تعرّض: فهرس المراكز", summarize(time_calls(
+            lambda symbol: index.get("1", symbol).long.exposure, [("GOLD",)] * CHECKS)))
+        assert abs(scan_exposure("GOLD") - index.get("1", "GOLD").long.exposure) < 1e-6
+
+
+if __name__ == "__main__":
+    main()
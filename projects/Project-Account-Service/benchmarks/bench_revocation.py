@@ -0,0 +1,55 @@
+# benchmarks/bench_revocation.py
+# تكلفة فحص الإلغاء في كل طلب مع 100 ألف توكن ملغى
+#
+# التشغيل من جذر الخدمة:
+#     python -m benchmarks.bench_revocation
+
+import time
+import uuid
+
+from app import create_app
+from app.revocation import revocation_store
+from benchmarks.common import isolated_config
+
+REVOKED = 100_000
+CHECKS = 500_000
+
+
+class BenchConfig(isolated_config()):
+    DEBUG = False
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+
+
+def per_check_ns(jtis):
+    is_revoked = revocation_store.is_revoked
+    start = time.perf_counter()
+    for jti in jtis:
+        is_revoked(jti)
+    return (time.perf_counter() - start) / len(jtis) * 1e9
+
+
+def main():
+    app = create_app(BenchConfig)
+    with app.app_context():
+        fresh = [uuid.uuid4().hex for _ in range(CHECKS)]
+        print(f"فارغ:                 {per_check_ns(fresh):7.0f} ns/فحص")
+
+        exp = time.time() + 3600
+        revoked = [uuid.uuid4().hex for _ in range(REVOKED)]
+        for jti in revoked[:1000]:
+            revocation_store.revoke(jti, exp)
+        # باقي الإلغاءات تُحمّل من قاعدة البيانات كما يحدث عند إعادة التشغيل
+        from app import db
+        from app.revocation import RevokedToken
+        db.session.execute(db.insert(RevokedToken), [{"jti": j, "expires_at": exp} for j in revoked[1000:]])
+        db.session.commit()
+        start = time.perf_counter()
+        revocation_store.load()
+        print(f"تحميل {len(revocation_store):,} إلغاء عند البدء: {(time.perf_counter() - start) * 1e3:.0f} ms")
+
+        print(f"توكن غير ملغى:        {per_check_ns(fresh):7.0f} ns/فحص")
+        print(f"توكن ملغى:            {per_check_ns(revoked * (CHECKS // REVOKED)):7.0f} ns/فحص")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+# benchmarks/bench_rolling.py
+# فحص حد السحب اليومي: جمع سجل العمليات في كل طلب مقابل النافذة المتحركة بالفترات
+#
+# التشغيل من جذر الخدمة:
+#     python -m benchmarks.bench_rolling
+
+import time
+
+from app.rolling import RollingWindow
+from benchmarks.common import print_row, summarize, time_calls
+
+CHECKS = 20_000
+
+
+def main():
+    now = time.time()
+    for history in (100, 10_000, 100_000):
+        # سحب كل 30 ثانية تقريبًا، آخرها الآن
+        log = [{"action": "withdraw", "amount": 1.0, "ts": now - (history - i) * 30} for i in range(history)]
+        window = RollingWindow(24 * 3600, 600)
+        for entry in log:
+            window.add("u", entry["amount"], now=entry["ts"])
+
+        def scan(limit_from):
+            return sum(e["amount"] for e in log if e["action"] == "withdraw" and e["ts"] >= limit_from)
+
+        print(f"\n{history:,} عملية في السجل")
+        print_row("جمع السجل", summarize(time_calls(scan, [(now - 86400,)] * min(CHECKS, 2_000_000 // history))))
+        print_row("النافذة المتحركة", summarize(time_calls(window.total, [("u", now)] * CHECKS)))
+        assert abs(window.total("u", now) - scan(window._start(now - 86400))) < 1e-6
+
+
+if __name__ == "__main__":
+    main()
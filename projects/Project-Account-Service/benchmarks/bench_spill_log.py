@@ -0,0 +1,63 @@
+# benchmarks/bench_spill_log.py
+# الذاكرة المستخدمة للإشعارات بعد عدد كبير من العمليات: قوائم بلا حد مقابل الحلقة مع التفريغ للقرص
+#
+# التشغيل من جذر الخدمة:
+#     python -m benchmarks.bench_spill_log [--entries 200000] [--users 500]
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from app.spill_log import SpillingLog
+
+
+def entry(i):
+    return {"message": f"تم فتح صفقة buy على GOLD بمبلغ {i}", "timestamp": datetime.utcnow().isoformat()}
+
+
+def fill_lists(entries, users):
+    store = {}
+    for i in range(entries):
+        store.setdefault(str(i % users), []).append(entry(i))
+    return store
+
+
+def fill_spilling(entries, users, directory):
+    log = SpillingLog("notifications")
+    log.configure(directory)
+    for i in range(entries):
+        log.append(str(i % users), entry(i))
+    return log
+
+
+def measure(label, fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # الزمن هنا يشمل تكلفة tracemalloc نفسها، للمقارنة النسبية فقط
+    print(f"{label:<28} {current / 1e6:>8.1f} MB في الذاكرة   {elapsed:>6.2f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="قياس ذاكرة السجلات")
+    parser.add_argument("--entries", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=500)
+    args = parser.parse_args()
+
+    measure("قوائم بلا حد", fill_lists, args.entries, args.users)
+    with tempfile.TemporaryDirectory() as directory:
+        log = measure("حلقة + تفريغ للقرص", fill_spilling, args.entries, args.users, directory)
+        print(log.memory_report())
+        start = time.perf_counter()
+        old = log.read("0", after=0, limit=100)
+        print(f"قراءة أقدم 100 إدخال من القرص: {(time.perf_counter() - start) * 1e3:.2f} ms (seq {old[0]['seq']}..{old[-1]['seq']})")
+
+
+if __name__ == "__main__":
+    main()
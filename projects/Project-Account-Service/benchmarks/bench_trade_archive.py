@@ -0,0 +1,95 @@
+# benchmarks/bench_trade_archive.py
+# إحصاءات الصفقات المغلقة: المرور على قواميس الصفقات (السلوك السابق في الدفتر)
+# مقابل الأعمدة في الأرشيف (app/trade_archive.py، قطع .npy مفتوحة بـ mmap)
+#
+# التشغيل من جذر الخدمة:
+#     python -m benchmarks.bench_trade_archive [--trades 1000000] [--accounts 10000]
+
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from app.trade_archive import TradeArchive
+from benchmarks.common import print_row, summarize, time_calls
+
+SYMBOLS = ("EURUSD", "GBPUSD", "GOLD", "SILVER", "BTC", "ETH")
+REPEATS = 5
+
+
+def make_trades(count, accounts, rng):
+    start = datetime(2026, 1, 1)
+    for n in range(1, count + 1):
+        opened = start + timedelta(seconds=n * 17)
+        yield str(n % accounts), {
+            "trade_id": n, "symbol": SYMBOLS[n % len(SYMBOLS)], "type": "buy" if n % 2 else "sell",
+            "amount": 10.0 + n % 90, "currency": "USD", "amount_usd": 10.0 + n % 90,
+            "leverage": float(1 + n % 20), "entry_price": 1.0 + n % 7, "stop_loss": None,
+            "take_profit": None, "profit_loss": rng.uniform(-50, 50), "status": "closed",
+            "opened_at": opened.isoformat(), "closed_at": (opened + timedelta(minutes=5)).isoformat(),
+            "close_reason": "manual", "account_type": "standard",
+        }
+
+
+def python_stats(trades):
+    pnl_by_symbol, volume_by_day, turnover = {}, {}, {}
+    wins = 0
+    for user_id, trade in trades:
+        notional = trade["amount_usd"] * trade["leverage"]
+        pnl_by_symbol[trade["symbol"]] = pnl_by_symbol.get(trade["symbol"], 0.0) + trade["profit_loss"]
+        day = trade["closed_at"][:10]
+        volume_by_day[day] = volume_by_day.get(day, 0.0) + notional
+        turnover[user_id] = turnover.get(user_id, 0.0) + notional
+        wins += trade["profit_loss"] > 0
+    return pnl_by_symbol, wins / len(trades), volume_by_day, turnover
+
+
+def archive_stats(archive):
+    return (archive.pnl_by_symbol(), archive.summary()["win_rate"],
+            archive.volume_by_day(), archive.turnover_by_account())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="قياس أرشيف الصفقات المغلقة")
+    parser.add_argument("--trades", type=int, default=1_000_000)
+    parser.add_argument("--accounts", type=int, default=10_000)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    trades = list(make_trades(args.trades, args.accounts, rng))
+
+    with tempfile.TemporaryDirectory() as directory:
+        archive = TradeArchive(directory)
+        archive.restore(None)
+        started = time.perf_counter()
+        for user_id, trade in trades:
+            archive.append(user_id, trade)
+        print(f"{args.trades:,} صفقة مغلقة على {args.accounts:,} حساب: أرشفة "
+              f"{time.perf_counter() - started:.1f}s  {archive.stats()}")
+
+        print()
+        print_row("حلقة Python على القواميس", summarize(time_calls(python_stats, [(trades,)] * REPEATS)))
+        print_row("أعمدة الأرشيف", summarize(time_calls(archive_stats, [(archive,)] * REPEATS)))
+        print_row("ملخص حساب واحد (الأرشيف)", summarize(time_calls(
+            archive.summary, [(str(n),) for n in range(20)])))
+
+        # نفس النتائج
+        pnl_by_symbol, win_rate, volume_by_day, turnover = python_stats(trades)
+        archived = archive_stats(archive)
+        assert all(abs(archived[0][s]["profit_loss"] - pnl) < 1e-6 for s, pnl in pnl_by_symbol.items())
+        assert abs(archived[1] - win_rate) < 1e-12
+        assert all(abs(archived[2][day] - volume) < 1e-6 for day, volume in volume_by_day.items())
+        assert all(abs(row["turnover"] - turnover[row["user_id"]]) < 1e-6 for row in archived[3])
+
+        # الاستعادة من اللقطة تفتح القطع بـ mmap دون قراءة الصفوف
+        state = archive.checkpoint()
+        reopened = TradeArchive(directory)
+        started = time.perf_counter()
+        reopened.restore(state)
+        print(f"\nفتح الأرشيف من اللقطة: {(time.perf_counter() - started) * 1000:.1f}ms")
+        assert reopened.summary() == archive.summary()
+
+
+if __name__ == "__main__":
+    main()
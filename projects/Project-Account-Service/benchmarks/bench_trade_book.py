@@ -0,0 +1,48 @@
+# benchmarks/bench_trade_book.py
+# البحث عن صفقة وعرض المفتوحة لحساب بتاريخ طويل: قائمة واحدة مع next(...) (السلوك السابق)
+# مقابل TradeBook (فهرس trade_id ومجموعتا المفتوحة والمغلقة)
+#
+# التشغيل من جذر الخدمة:
+#     python -m benchmarks.bench_trade_book
+
+import random
+
+from app.trade_book import TradeBook
+from benchmarks.common import print_row, summarize, time_calls
+
+OPEN_TRADES = 20
+LOOKUPS = 5_000
+
+
+def make_trades(history):
+    # تاريخ طويل من الصفقات المغلقة وعدد قليل مفتوح في النهاية
+    return [
+        {"trade_id": n, "symbol": "BTC", "type": "buy", "status": "closed" if n <= history - OPEN_TRADES else "open"}
+        for n in range(1, history + 1)
+    ]
+
+
+def main():
+    rng = random.Random(7)
+    for history in (1_000, 10_000, 50_000):
+        trades = make_trades(history)
+        book = TradeBook.from_state(trades)
+        ids = [(rng.randint(1, history),) for _ in range(LOOKUPS)]
+
+        print(f"\n{history:,} صفقة في تاريخ الحساب ({OPEN_TRADES} مفتوحة)")
+        print_row("بحث: next() على القائمة", summarize(time_calls(
+            lambda trade_id: next(t for t in trades if t["trade_id"] == trade_id), ids[:max(LOOKUPS * 1000 // history, 50)])))
+        print_row("بحث: TradeBook.get", summarize(time_calls(book.get, ids)))
+        print_row("المفتوحة: فلترة القائمة", summarize(time_calls(
+            lambda: [t for t in trades if t["status"] == "open"], [()] * max(200_000 // history, 20))))
+        print_row("المفتوحة: TradeBook.open", summarize(time_calls(
+            lambda: list(book.open.values()), [()] * LOOKUPS)))
+
+        # الرقم التالي بعد أرشفة صفقات قديمة: len()+1 يكرر رقمًا موجودًا، والعدّاد لا
+        for trade_id in range(1, 101):
+            book.remove(trade_id)
+        assert book.get(len(book) + 1) is not None and book.allocate_id() == history + 1
+
+
+if __name__ == "__main__":
+    main()
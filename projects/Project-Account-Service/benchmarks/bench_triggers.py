@@ -0,0 +1,91 @@
+# benchmarks/bench_triggers.py
+# تقييم مستويات SL/TP مع كل سعر جديد: المرور على كل الصفقات المفتوحة مقابل كومات TriggerEngine
+#
+# التشغيل من جذر الخدمة:
+#     python -m benchmarks.bench_triggers [--trades 1000000] [--ticks 2000]
+
+import argparse
+import random
+import time
+
+from app.triggers import TriggerEngine
+from benchmarks.common import print_row, summarize, time_calls
+
+START_PRICE = 100.0
+
+
+def make_trades(count, rng):
+    trades = []
+    for n in range(1, count + 1):
+        trade_type = "buy" if n % 2 else "sell"
+        distance_sl, distance_tp = rng.uniform(0.5, 40), rng.uniform(0.5, 40)
+        if trade_type == "buy":
+            stop_loss, take_profit = START_PRICE - distance_sl, START_PRICE + distance_tp
+        else:
+            stop_loss, take_profit = START_PRICE + distance_sl, START_PRICE - distance_tp
+        trades.append({
+            "trade_id": n, "symbol": "GOLD", "type": trade_type,
+            "stop_loss": stop_loss, "take_profit": take_profit if n % 3 else None,
+        })
+    return trades
+
+
+def scan(open_trades, price):
+    """السلوك البديل: فحص كل صفقة مفتوحة عند كل سعر"""
+    fired = []
+    for key, trade in list(open_trades.items()):
+        buy = trade["type"] == "buy"
+        sl, tp = trade["stop_loss"], trade["take_profit"]
+        if (sl is not None and (price <= sl if buy else price >= sl)) or \
+                (tp is not None and (price >= tp if buy else price <= tp)):
+            fired.append(key)
+            del open_trades[key]
+    return fired
+
+
+def main():
+    parser = argparse.ArgumentParser(description="قياس محرك SL/TP")
+    parser.add_argument("--trades", type=int, default=1_000_000)
+    parser.add_argument("--ticks", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    trades = make_trades(args.trades, rng)
+
+    engine = TriggerEngine()
+    started = time.perf_counter()
+    for trade in trades:
+        engine.add("u", trade)
+    print(f"{args.trades:,} صفقة مفتوحة: إضافة المستويات {time.perf_counter() - started:.2f}s  {engine.stats()}")
+
+    # مسار سعر عشوائي بخطوات صغيرة (معظم الأسعار لا تُفعّل شيئًا أو تُفعّل القليل)
+    prices, price = [], START_PRICE
+    for _ in range(args.ticks):
+        price += rng.gauss(0, 0.05)
+        prices.append((price,))
+
+    fired_total = [0]
+
+    def tick(p):
+        fired_total[0] += len(engine.on_tick("GOLD", p))
+
+    print()
+    print_row("TriggerEngine.on_tick", summarize(time_calls(tick, prices)))
+
+    open_trades = {("u", t["trade_id"]): t for t in trades}
+    print_row("المرور على كل الصفقات", summarize(time_calls(lambda p: scan(open_trades, p), prices[:5])))
+
+    # نفس النتيجة: محرك جديد وفحص كامل على عينة من الصفقات عبر مسار السعر كله
+    subset = trades[:5_000]
+    check, open_trades = TriggerEngine(), {("u", t["trade_id"]): t for t in subset}
+    for trade in subset:
+        check.add("u", trade)
+    fired = sorted(key[1:] for p, in prices for key in ((u, t) for u, t, _ in check.on_tick("GOLD", p)))
+    scanned = sorted(key[1:] for p, in prices for key in scan(open_trades, p))
+    print(f"\nعينة {len(subset):,} صفقة عبر {args.ticks:,} سعر: أُغلقت {len(fired):,} "
+          f"(المحرك في المسار الكامل أغلق {fired_total[0]:,})")
+    assert fired == scanned
+
+
+if __name__ == "__main__":
+    main()
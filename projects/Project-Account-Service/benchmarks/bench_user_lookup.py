@@ -0,0 +1,66 @@
+# benchmarks/bench_user_lookup.py
+# قياس زمن load_user و البحث باسم المستخدم مع نمو عدد المستخدمين
+#
+# التشغيل من جذر الخدمة:
+#     python -m benchmarks.bench_user_lookup
+
+import random
+
+from app import create_app, db, load_user
+from app.routes.auth import User
+from app.user_repository import UserRecord, user_repository
+from benchmarks.common import isolated_config, time_calls, summarize, print_row
+
+USER_COUNTS = (1_000, 10_000, 100_000)
+LOOKUPS = 2_000
+LEGACY_LOOKUPS = 200
+
+
+class BenchConfig(isolated_config()):
+    DEBUG = False
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+    USER_CACHE_SIZE = 5_000
+
+
+def legacy_load_user(users_db, user_id):
+    """نسخة load_user القديمة: مسح خطي لكل المستخدمين"""
+    for user in users_db.values():
+        if user.get_id() == str(user_id):
+            return user
+    return None
+
+
+def run(count):
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.session.execute(
+            db.insert(UserRecord),
+            [{"username": f"user{i}", "password_hash": "x"} for i in range(1, count + 1)],
+        )
+        db.session.commit()
+
+        rng = random.Random(count)
+        hot_ids = [rng.randint(1, min(count, BenchConfig.USER_CACHE_SIZE)) for _ in range(LOOKUPS)]
+        cold_ids = [rng.randint(1, count) for _ in range(LOOKUPS)]
+
+        users_db = {f"user{i}": User(i, f"user{i}", "x") for i in range(1, count + 1)}
+        legacy = time_calls(lambda uid: legacy_load_user(users_db, uid),
+                            [(str(uid),) for uid in cold_ids[:LEGACY_LOOKUPS]])
+
+        user_repository.clear()
+        cold = time_calls(load_user, [(str(uid),) for uid in cold_ids])
+        user_repository.clear()
+        time_calls(load_user, [(str(uid),) for uid in hot_ids])
+        hot = time_calls(load_user, [(str(uid),) for uid in hot_ids])
+        by_name = time_calls(user_repository.get_by_username, [(f"user{uid}",) for uid in hot_ids])
+
+        print(f"\n== {count:,} مستخدم")
+        print_row("legacy load_user (مسح خطي)", summarize(legacy))
+        print_row("load_user (فهرس، ذاكرة باردة)", summarize(cold))
+        print_row("load_user (LRU)", summarize(hot))
+        print_row("get_by_username (LRU)", summarize(by_name))
+
+
+if __name__ == "__main__":
+    for count in USER_COUNTS:
+        run(count)
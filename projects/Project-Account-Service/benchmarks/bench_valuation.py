@@ -0,0 +1,68 @@
+# benchmarks/bench_valuation.py
+# إعادة تقييم كل الصفقات المفتوحة مع كل سعر جديد: أعمدة NumPy (app/valuation.py)
+# مقابل حلقة Python على قواميس الصفقات
+#
+# التشغيل من جذر الخدمة:
+#     python -m benchmarks.bench_valuation [--positions 1000000] [--accounts 100000]
+
+import argparse
+import random
+import time
+
+from app.valuation import Valuation, trade_pnl
+from benchmarks.common import print_row, summarize, time_calls
+
+SYMBOLS = {"EURUSD": 1.12, "GBPUSD": 1.30, "GOLD": 1950.0, "SILVER": 25.0}
+TICKS = 50
+
+
+def main():
+    parser = argparse.ArgumentParser(description="قياس تقييم المراكز بسعر السوق")
+    parser.add_argument("--positions", type=int, default=1_000_000)
+    parser.add_argument("--accounts", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    symbols = list(SYMBOLS)
+    valuation = Valuation()
+    trades = []
+    started = time.perf_counter()
+    for user in range(args.accounts):
+        valuation.set_balance(str(user), 1000.0)
+    for n in range(args.positions):
+        symbol = symbols[n % len(symbols)]
+        trade = {
+            "trade_id": n, "symbol": symbol, "type": "buy" if n % 2 else "sell",
+            "amount_usd": 10.0 + n % 50, "leverage": float(1 + n % 20),
+            "entry_price": SYMBOLS[symbol] * rng.uniform(0.98, 1.02),
+        }
+        user_id = str(n % args.accounts)
+        trades.append((user_id, trade))
+        valuation.add(user_id, trade)
+    print(f"{args.positions:,} صفقة مفتوحة على {args.accounts:,} حساب: تحميل {time.perf_counter() - started:.1f}s")
+
+    ticks = [(symbols[i % len(symbols)], SYMBOLS[symbols[i % len(symbols)]] * rng.uniform(0.97, 1.03))
+             for i in range(TICKS)]
+    prices = dict(SYMBOLS)
+
+    def python_revalue(symbol, price):
+        prices[symbol] = price
+        unrealized = {}
+        for user_id, trade in trades:
+            unrealized[user_id] = unrealized.get(user_id, 0.0) + trade_pnl(trade, prices[trade["symbol"]])
+        return unrealized
+
+    print()
+    print_row("NumPy: سعر جديد → كل الحسابات", summarize(time_calls(valuation.set_price, ticks)))
+    print_row("حلقة Python على القواميس", summarize(time_calls(python_revalue, ticks[-3:])))
+
+    # نفس النتيجة لحسابات عشوائية بعد كل الأسعار
+    prices.update(ticks)
+    expected = python_revalue(*ticks[-1])
+    for user_id in rng.sample(sorted(expected), 20):
+        assert abs(valuation.account(user_id)["unrealized_pnl"] - expected[user_id]) < 1e-6
+    print(f"\n{valuation.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/common.py
+# أدوات مشتركة لسكربتات القياس: قياس زمن الاستدعاءات وحساب النسب المئوية
+
+import json
+import os
+import tempfile
+import time
+
+from app.config import Config
+
+
+def isolated_config(directory=None):
+    """
+    Config بمسارات حالة الخدمة على القرص (الدفتر، سجل الأحداث، السجلات، أرشيف الصفقات) داخل
+    directory (مجلد مؤقت جديد إذا لم يُحدد)، حتى لا تكتب القياسات في instance/ الخاص بالخدمة
+    """
+    directory = directory or tempfile.mkdtemp(prefix="bench-")
+    return type("IsolatedConfig", (Config,), {
+        "LEDGER_PATH": os.path.join(directory, "ledger.db"),
+        "EVENT_STORE_DIR": os.path.join(directory, "events"),
+        "LOG_SPILL_DIR": os.path.join(directory, "logs"),
+        "TRADE_ARCHIVE_DIR": os.path.join(directory, "trade_archive"),
+    })
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def time_calls(fn, args_list):
+    """تشغيل fn مرة لكل عنصر في args_list وإرجاع زمن كل استدعاء بالثواني"""
+    samples = []
+    clock = time.perf_counter
+    for args in args_list:
+        start = clock()
+        fn(*args)
+        samples.append(clock() - start)
+    return samples
+
+
+def summarize(samples):
+    total = sum(samples)
+    return {
+        "ops": len(samples),
+        "ops_per_sec": len(samples) / total if total else 0.0,
+        "p50_us": percentile(samples, 50) * 1e6,
+        "p95_us": percentile(samples, 95) * 1e6,
+        "p99_us": percentile(samples, 99) * 1e6,
+    }
+
+
+def print_row(label, stats):
+    print(
+        f"{label:<36} {stats['ops_per_sec']:>12,.0f} ops/s"
+        f"   p50 {stats['p50_us']:>9.1f}µs"
+        f"   p95 {stats['p95_us']:>9.1f}µs"
+        f"   p99 {stats['p99_us']:>9.1f}µs"
+    )
+
+
+# =========================
+# حفظ ومقارنة خط الأساس (baseline)
+# =========================
+def save_baseline(path, results):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"\nتم حفظ خط الأساس في {path}")
+
+
+def compare_to_baseline(path, results, tolerance=0.25):
+    """
+    مقارنة النتائج بخط أساس محفوظ؛ يعتبر تراجعًا إذا انخفض ops/sec أو ارتفع p95
+    بأكثر من tolerance. يرجع قائمة أسماء السيناريوهات المتراجعة.
+    """
+    if not os.path.exists(path):
+        print(f"\nلا يوجد خط أساس في {path} (استخدم --save-baseline)")
+        return []
+
+    with open(path, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    regressions = []
+    print(f"\n== مقارنة مع {path}")
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        ops_change = stats["ops_per_sec"] / base["ops_per_sec"] - 1 if base["ops_per_sec"] else 0.0
+        p95_change = stats["p95_us"] / base["p95_us"] - 1 if base["p95_us"] else 0.0
+        regressed = ops_change < -tolerance or p95_change > tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<36} ops/s {ops_change:+7.1%}   p95 {p95_change:+7.1%}"
+              f"{'   ⚠️ تراجع' if regressed else ''}")
+    return regressions